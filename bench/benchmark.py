@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+"""
+Scraper throughput benchmarks against the local [MockServer]. Measures games
+per second, requests per second and p50/p99 request latency for:
+    season   SeasonScraper.generate
+    handler  DataHandler.generate
+    today    TodaysGameScraper.obtain
+
+Example:
+    python bench/benchmark.py --latency=0.05 --throttle-rate=0.02 season handler
+Nothing is written to data/: every run uses a temporary directory, and the
+response cache and the raw archive are disabled.
+"""
+import sys, os
+parent_directory = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(parent_directory)
+
+import json
+import time
+import argparse
+import tempfile
+from datetime import datetime
+from bench.mock_server import MockServer
+from scrape.fetch import configure, flight
+from scrape.throttle import limiter
+from scrape.session import PooledSession
+from scrape.scraper import SeasonScraper
+from scrape.data_generator import DataHandler
+from scrape.today_scraper import TodaysGameScraper
+from misc.logger import Logger
+
+class TimedSession(PooledSession):
+    """
+    [PooledSession] that records the latency of every request it sends,
+    retries included.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.latencies = []
+
+    def get(self, url:str, **kwargs):
+        start = time.perf_counter()
+        response = super().get(url, **kwargs)
+        self.latencies.append(time.perf_counter() - start)
+        return response
+
+def percentile(values:list, q:float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+def journal_games(journal) -> int:
+    return sum(commit['rows'] for commit in journal.commits)
+
+def run_season(args, session:PooledSession, directory:str) -> int:
+    scraper = SeasonScraper(args.season, verbose=False, concurrency=args.concurrency, session=session, directory=directory)
+    scraper.generate(args.start, args.end)
+    return journal_games(scraper.journal)
+
+def run_handler(args, session:PooledSession, directory:str) -> int:
+    short = lambda date: datetime.strptime(date, '%m/%d/%Y').strftime('%m/%d/%y')
+    handler = DataHandler(f"{args.season}.csv", verbose=False, session=session, directory=directory)
+    handler.generate(short(args.start), short(args.end))
+    return journal_games(handler.journal)
+
+def run_today(args, session:PooledSession, directory:str) -> int:
+    dest = os.path.join(directory, 'daily.csv')
+    TodaysGameScraper(verbose=False, session=session).obtain(datetime.strptime(args.start, '%m/%d/%Y').strftime('%m/%d/%y'), dest=dest)
+    if not os.path.exists(dest):
+        return 0
+    with open(dest, 'r') as file:
+        return max(0, sum(1 for _ in file) - 1)
+
+SCENARIOS = {
+    'season': run_season,
+    'handler': run_handler,
+    'today': run_today,
+}
+
+def reset_limiter(args) -> None:
+    configure(rate=args.rate, burst=args.burst)
+    limiter.tokens = float(args.burst)
+    limiter.failures = 0
+    limiter.open_until = 0.0
+    limiter.base_delay = args.backoff
+    limiter.max_delay = max(args.backoff, 1.0)
+    limiter.cooldown = args.cooldown
+
+def benchmark(name:str, args, server:MockServer) -> dict:
+    """
+    Runs scenario [name] once, in a fresh session and directory, and returns
+    its measurements.
+    """
+    reset_limiter(args)
+    session = TimedSession()
+    before = server.stats()
+    collapsed = flight.stats()['collapsed']
+    with tempfile.TemporaryDirectory() as directory:
+        start = time.perf_counter()
+        games = SCENARIOS[name](args, session, directory)
+        elapsed = time.perf_counter() - start
+
+    after = server.stats()
+    served = {key: after.get(key, 0) - before.get(key, 0) for key in after}
+    latencies = session.latencies
+    return {
+        'scenario': name,
+        'games': games,
+        'requests': len(latencies),
+        'seconds': elapsed,
+        'games_per_second': games / elapsed if elapsed else 0.0,
+        'requests_per_second': len(latencies) / elapsed if elapsed else 0.0,
+        'p50_ms': percentile(latencies, 0.50) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        'throttled': sum(count for (_, status), count in served.items() if status == 429),
+        'errors': sum(count for (_, status), count in served.items() if status >= 500),
+        'connections_opened': session.stats()['connections_opened'],
+        'collapsed': flight.stats()['collapsed'] - collapsed,
+    }
+
+def report(results:list) -> None:
+    columns = ['scenario', 'games', 'requests', 'seconds', 'games_per_second', 'requests_per_second',
+               'p50_ms', 'p99_ms', 'throttled', 'errors', 'connections_opened', 'collapsed']
+    print(" | ".join(columns))
+    for result in results:
+        print(" | ".join(f"{result[c]:.2f}" if isinstance(result[c], float) else str(result[c]) for c in columns))
+
+def main(argv:list=None) -> list:
+    parser = argparse.ArgumentParser(description="Scraper throughput benchmarks against a local mock server.")
+    parser.add_argument('scenarios', nargs='*', default=None, help=f"any of {', '.join(SCENARIOS)}; all by default")
+    parser.add_argument('--season', default='2023-24')
+    parser.add_argument('--start', default='11/01/2023', help="first date, MM/DD/YYYY")
+    parser.add_argument('--end', default='11/07/2023', help="last date, MM/DD/YYYY")
+    parser.add_argument('--concurrency', type=int, default=8, help="SeasonScraper requests in flight")
+    parser.add_argument('--latency', type=float, default=0.02, help="server latency, seconds")
+    parser.add_argument('--jitter', type=float, default=0.01, help="extra random latency, seconds")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="fraction of requests answered with 500")
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help="fraction of requests answered with 429")
+    parser.add_argument('--retry-after', type=float, default=None, help="Retry-After of 429 responses, seconds")
+    parser.add_argument('--rate', type=float, default=1000.0, help="client rate limit, requests/s")
+    parser.add_argument('--burst', type=int, default=100)
+    parser.add_argument('--backoff', type=float, default=0.05, help="base retry delay, seconds")
+    parser.add_argument('--cooldown', type=float, default=1.0, help="circuit breaker pause, seconds")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default=None, help="also write the results as JSON to this file")
+    args = parser.parse_args(argv)
+    unknown = [name for name in args.scenarios or [] if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenarios {unknown}; choose from {list(SCENARIOS)}")
+    args.scenarios = args.scenarios or list(SCENARIOS)
+
+    logger = Logger("Benchmark")
+    server = MockServer(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                        throttle_rate=args.throttle_rate, retry_after=args.retry_after, seed=args.seed)
+    results = []
+    with server:
+        configure(redirect=server.redirect(), cache_enabled=False, archive_enabled=False, offline=False)
+        for name in args.scenarios:
+            logger.info(f"Running {name}...")
+            results.append(benchmark(name, args, server))
+    configure(redirect={}, cache_enabled=True, archive_enabled=True)
+
+    report(results)
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=2)
+    return results
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,341 @@
+#!/usr/bin/env python
+"""
+Local stand-in for the NBA endpoints the scrapers use, for tests and
+benchmarks. Serves synthetic (or recorded) responses for:
+    stats.nba.com/stats/leaguedashplayerstats
+    stats.nba.com/stats/leaguedashteamstats
+    stats.nba.com/stats/teamplayerdashboard
+    stats.nba.com/stats/boxscoretraditionalv3
+    stats.nba.com/js/data/leaders/00_daily_lineups_<YYYYMMDD>.json
+    core-api.nba.com/cp/api/v1.3/feeds/gamecardfeed
+with configurable latency, server errors and 429 throttling.
+
+Point the scrapers at it with [MockServer.redirect]:
+    with MockServer(latency=0.05) as server:
+        configure(redirect=server.redirect(), cache_enabled=False)
+"""
+import sys, os
+parent_directory = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(parent_directory)
+
+import re
+import gzip
+import json
+import time
+import random
+import threading
+from collections import Counter
+from datetime import datetime, date as Date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qsl
+from parameters.info import id_to_team
+from scrape.cache import ResponseCache, parse_date
+from misc.logger import Logger
+
+HOSTS = ['https://stats.nba.com', 'https://core-api.nba.com']
+
+with open(os.path.join(parent_directory, 'parameters/features.json'), 'r') as file:
+    features = json.load(file)
+
+# the real tables carry many more columns than features.json uses
+PLAYER_HEADERS = features['player_features'] + ['NICKNAME', 'TEAM_ID', 'TEAM_ABBREVIATION', 'AGE', 'W', 'L',
+                  'NBA_FANTASY_PTS', 'DD2', 'TD3', 'WNBA_FANTASY_PTS'] \
+                 + [f"{x}_RANK" for x in features['player_features'][2:]]
+TEAM_HEADERS = features['team_features'] + ['GP', 'W', 'L', 'BLKA', 'PFD'] \
+               + [f"{x}_RANK" for x in features['team_features'][2:]]
+TEAM_HEADERS = list(dict.fromkeys(TEAM_HEADERS))
+DASHBOARD_HEADERS = ['GROUP_SET', 'GROUP_VALUE'] + features['player_features'] + ['NICKNAME']
+
+BOX_SCORE_KEYS = ['fieldGoalsMade', 'fieldGoalsAttempted', 'threePointersMade', 'threePointersAttempted',
+                  'freeThrowsMade', 'freeThrowsAttempted', 'reboundsOffensive', 'reboundsDefensive',
+                  'reboundsTotal', 'assists', 'turnovers', 'steals', 'blocks', 'blocksReceived',
+                  'foulsPersonal', 'foulsDrawn', 'points', 'plusMinusPoints']
+
+STARTER_POSITIONS = ['G', 'G', 'F', 'F', 'C']
+LINEUP_POSITIONS = ['PG', 'SG', 'SF', 'PF', 'C']
+EPOCH = Date(2000, 1, 1)
+
+class League:
+    """
+    Deterministic synthetic league: the 30 teams of [parameters/info.py] with
+    [roster] players each, and a schedule of up to [games_per_day] games a
+    day. The day and slot of a game are encoded in its ID, so any game can be
+    rebuilt from its ID alone. Box scores leave out the statistics keys in
+    [unreported], as the real ones do for blocks received and fouls drawn.
+    """
+    def __init__(self, seed:int=0, roster:int=15, games_per_day:int=10, unreported:tuple=()):
+        self.seed = seed
+        self.unreported = set(unreported)
+        self.roster = roster
+        self.games_per_day = games_per_day
+        self.teams = sorted(id_to_team)
+        self.players = {team_id: [1000000 + t * 100 + k for k in range(roster)] for t, team_id in enumerate(self.teams)}
+
+    def rng(self, *key) -> random.Random:
+        return random.Random(':'.join(str(x) for x in (self.seed,) + key))
+
+    def games(self, day:datetime) -> list:
+        """
+        Returns the (game ID, home team ID, road team ID) of every game on
+        [day].
+        """
+        index = (day.date() - EPOCH).days
+        rng = self.rng('schedule', index)
+        teams = self.teams[:]
+        rng.shuffle(teams)
+        count = rng.randint(0, self.games_per_day)
+        return [(f"002{index % 100000:05d}{k:02d}", teams[2 * k], teams[2 * k + 1]) for k in range(count)]
+
+    def game(self, game_id:str) -> tuple:
+        """
+        Returns the (home team ID, road team ID) of [game_id].
+        """
+        index, slot = int(game_id[3:8]), int(game_id[8:])
+        day = datetime.fromordinal(EPOCH.toordinal() + index)
+        _, home, road = self.games(day)[slot]
+        return home, road
+
+    def player_name(self, player_id:int) -> str:
+        return f"Player {player_id}"
+
+    def value(self, rng:random.Random, header:str):
+        if header.endswith('_RANK') or header in ('GP', 'W', 'L', 'AGE', 'DD2', 'TD3'):
+            return rng.randint(1, 60)
+        if header.endswith('_PCT'):
+            return round(rng.random(), 3)
+        return round(rng.uniform(0, 30), 1)
+
+    def table(self, name:str, headers:list, entities:list, rng:random.Random) -> dict:
+        """
+        Builds a result set with [headers], one row per entity of [entities],
+        a dictionary of known values; every other column is random.
+        """
+        rows = [[entity[h] if h in entity else self.value(rng, h) for h in headers] for entity in entities]
+        return {'name': name, 'headers': headers, 'rowSet': rows}
+
+    def player_entity(self, team_id:int, player_id:int) -> dict:
+        return {'PLAYER_ID': player_id, 'PLAYER_NAME': self.player_name(player_id), 'NICKNAME': str(player_id),
+                'TEAM_ID': team_id, 'TEAM_ABBREVIATION': id_to_team[team_id][:3].upper()}
+
+    def league_players(self, params:dict) -> dict:
+        rng = self.rng('players', sorted(params.items()))
+        entities = [self.player_entity(team_id, p) for team_id in self.teams for p in self.players[team_id]]
+        return {'resource': 'leaguedashplayerstats', 'parameters': params,
+                'resultSets': [self.table('LeagueDashPlayerStats', PLAYER_HEADERS, entities, rng)]}
+
+    def league_teams(self, params:dict) -> dict:
+        rng = self.rng('teams', sorted(params.items()))
+        entities = [{'TEAM_ID': team_id, 'TEAM_NAME': id_to_team[team_id]} for team_id in self.teams]
+        return {'resource': 'leaguedashteamstats', 'parameters': params,
+                'resultSets': [self.table('LeagueDashTeamStats', TEAM_HEADERS, entities, rng)]}
+
+    def dashboard(self, params:dict) -> dict:
+        rng = self.rng('dashboard', sorted(params.items()))
+        team_id = int(params.get('TeamID', self.teams[0]))
+        team = {'GROUP_SET': 'Team', 'GROUP_VALUE': id_to_team.get(team_id, ''), 'TEAM_ID': team_id,
+                'TEAM_NAME': id_to_team.get(team_id, '')}
+        players = [{'GROUP_SET': 'Players', 'GROUP_VALUE': '', **self.player_entity(team_id, p)}
+                   for p in self.players.get(team_id, [])]
+        return {'resource': 'teamplayerdashboard', 'parameters': params,
+                'resultSets': [self.table('OverallTeamDashboard', ['GROUP_SET', 'GROUP_VALUE'] + TEAM_HEADERS, [team], rng),
+                               self.table('PlayersSeasonTotals', DASHBOARD_HEADERS, players, rng)]}
+
+    def box_score(self, params:dict) -> dict:
+        game_id = params.get('GameID', '')
+        home, road = self.game(game_id)
+        rng = self.rng('box', game_id)
+
+        keys = [key for key in BOX_SCORE_KEYS if key not in self.unreported]
+
+        def team_json(team_id:int) -> dict:
+            players = []
+            for k, player_id in enumerate(self.players[team_id]):
+                played = k < 10
+                statistics = {key: rng.randint(0, 12) for key in keys}
+                statistics['minutes'] = f"{rng.randint(10, 40)}:{rng.randint(0, 59):02d}" if played else ''
+                players.append({'personId': player_id, 'firstName': 'Player', 'familyName': str(player_id),
+                                'position': STARTER_POSITIONS[k] if k < 5 else '', 'statistics': statistics})
+            statistics = {key: rng.randint(0, 60) for key in keys}
+            statistics['points'] = rng.randint(90, 135)
+            statistics['minutes'] = '240:00'
+            city, name = id_to_team[team_id].rsplit(' ', 1)
+            return {'teamId': team_id, 'teamCity': city, 'teamName': name, 'statistics': statistics, 'players': players}
+
+        return {'meta': {}, 'boxScoreTraditional': {'gameId': game_id, 'homeTeam': team_json(home), 'awayTeam': team_json(road)}}
+
+    def game_cards(self, params:dict) -> dict:
+        day = parse_date(params.get('gamedate', ''))
+        games = self.games(day) if day else []
+        if not games:
+            return {'modules': []}
+        cards = [{'cardData': {'gameId': game_id, 'homeTeam': {'teamId': home}, 'awayTeam': {'teamId': road}}}
+                 for game_id, home, road in games]
+        return {'modules': [{'cards': cards}]}
+
+    def lineups(self, day:str) -> dict:
+        games = []
+        for game_id, home, road in self.games(datetime.strptime(day, '%Y%m%d')):
+            def team_json(team_id:int) -> dict:
+                return {'teamId': team_id, 'players': [{'personId': p, 'position': LINEUP_POSITIONS[k]}
+                                                       for k, p in enumerate(self.players[team_id][:5])]}
+            games.append({'gameId': game_id, 'homeTeam': team_json(home), 'awayTeam': team_json(road)})
+        return {'date': day, 'games': games}
+
+class MockServer:
+    """
+    Threaded HTTP server answering the NBA endpoints from a synthetic
+    [League], or from [recordings] (a [ResponseCache], such as the scrapers'
+    own cache) when it holds the same request.
+
+    Every request waits [latency] seconds, plus up to [jitter]. A fraction
+    [throttle_rate] of requests is answered with 429 and a Retry-After of
+    [retry_after] seconds (no header if None), and a fraction [error_rate]
+    with 500. [port] 0 picks a free port.
+    """
+    def __init__(self, port:int=0, latency:float=0.0, jitter:float=0.0, error_rate:float=0.0,
+                 throttle_rate:float=0.0, retry_after:float=None, seed:int=0, recordings:ResponseCache=None,
+                 league:League=None, verbose:bool=False):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.recordings = recordings
+        self.league = league or League(seed)
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.counts = Counter() # (endpoint, status) -> requests
+        self.logger = Logger("MockServer", enabled=verbose, indent=1)
+
+        server = self
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1' # keep-alive, like the real endpoints
+
+            def do_GET(self):
+                server.handle(self)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address
+        return f"http://{host}:{port}"
+
+    def redirect(self) -> dict:
+        """
+        Returns the [scrape.fetch.configure] redirect sending every NBA host to
+        this server.
+        """
+        return {host: self.url for host in HOSTS}
+
+    def start(self) -> 'MockServer':
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        self.logger.info(f"Serving on {self.url}")
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self) -> 'MockServer':
+        return self.start()
+
+    def __exit__(self, *args) -> None:
+        self.stop()
+
+    def fault(self) -> int:
+        """
+        Returns the injected status for the next request, or None.
+        """
+        with self.lock:
+            roll = self.random.random()
+            delay = self.latency + self.random.random() * self.jitter
+        time.sleep(delay)
+        if roll < self.throttle_rate:
+            return 429
+        if roll < self.throttle_rate + self.error_rate:
+            return 500
+        return None
+
+    def route(self, path:str, params:dict) -> tuple:
+        """
+        Returns the (endpoint, body) for a request, or (endpoint, None) if the
+        request is unknown.
+        """
+        lineup = re.search(r'00_daily_lineups_(\d{8})\.json$', path)
+        if lineup:
+            return 'lineups', self.league.lineups(lineup.group(1))
+        endpoint = path.rstrip('/').rsplit('/', 1)[-1]
+        handlers = {
+            'leaguedashplayerstats': self.league.league_players,
+            'leaguedashteamstats': self.league.league_teams,
+            'teamplayerdashboard': self.league.dashboard,
+            'boxscoretraditionalv3': self.league.box_score,
+            'gamecardfeed': self.league.game_cards,
+        }
+        if endpoint not in handlers:
+            return endpoint, None
+        try:
+            return endpoint, handlers[endpoint](params)
+        except (KeyError, IndexError, ValueError): # e.g. a game ID the league does not have
+            return endpoint, None
+
+    def recorded(self, path:str, params:dict) -> bytes:
+        if self.recordings is None:
+            return None
+        host = HOSTS[1] if path.startswith('/cp/') else HOSTS[0]
+        response = self.recordings.get(host + path, params)
+        return response.content if response is not None and response.status_code == 200 else None
+
+    def handle(self, request:BaseHTTPRequestHandler) -> None:
+        parsed = urlparse(request.path)
+        params = dict(parse_qsl(parsed.query, keep_blank_values=True))
+        status = self.fault()
+
+        endpoint, body = parsed.path.rsplit('/', 1)[-1], None
+        headers = {'Content-Type': 'application/json'}
+        if status is None:
+            body = self.recorded(parsed.path, params)
+            if body is None:
+                endpoint, payload = self.route(parsed.path, params)
+                body = None if payload is None else json.dumps(payload).encode('utf-8')
+            status = 200 if body is not None else 404
+        if status == 429 and self.retry_after is not None:
+            headers['Retry-After'] = str(self.retry_after)
+        if body is None:
+            body = json.dumps({'error': status}).encode('utf-8')
+        if 'gzip' in request.headers.get('Accept-Encoding', ''):
+            body = gzip.compress(body, compresslevel=1)
+            headers['Content-Encoding'] = 'gzip'
+
+        with self.lock:
+            self.counts[(endpoint, status)] += 1
+
+        request.send_response(status)
+        for key, value in headers.items():
+            request.send_header(key, value)
+        request.send_header('Content-Length', str(len(body)))
+        request.end_headers()
+        request.wfile.write(body)
+
+    def stats(self) -> dict:
+        """
+        Returns the number of requests served per endpoint and status.
+        """
+        with self.lock:
+            return dict(self.counts)
+
+if __name__ == '__main__':
+    server = MockServer(verbose=True, latency=0.05)
+    server.start()
+    print(f"Redirect: {server.redirect()}")
+    try:
+        server.thread.join()
+    except KeyboardInterrupt:
+        server.stop()
@@ -0,0 +1,207 @@
+#!/usr/bin/env python
+"""
+Date and GAME_ID indexes over stored season files, so that a query reads only
+the parts of a file holding the games it asks for.
+"""
+import os
+import io
+import csv
+import json
+import bisect
+import tempfile
+from main.config import data_directory
+from data.lib import locate, ParquetBackend, CSV_DTYPES, _stem, _tail_hash, season_files, pq
+from scrape.cache import parse_date, season_of
+import pandas as pd
+
+def _iso(date) -> str:
+    parsed = parse_date(str(date))
+    return parsed.strftime('%Y-%m-%d') if parsed else None
+
+INDEX_VERSION = 2 # bump whenever the index layout or its keys change, to rebuild the indexes
+
+def _game_key(game_id) -> str:
+    return str(game_id).strip()
+
+class SeasonIndex:
+    """
+    Index of the season file [file] in [directory], stored next to it as
+    <file>.index.json. The file is split into blocks: a run of rows with the
+    same date for a CSV (a byte range), a row group for Parquet. The index
+    holds every (date, GAME_ID, block) sorted by date, and a GAME_ID -> blocks
+    map, so a date-range or GAME_ID query only reads the blocks it needs.
+
+    The index is brought up to date when opened: rows appended since it was
+    written are indexed on their own; any other change rebuilds it.
+    """
+    def __init__(self, file:str, directory:str=data_directory):
+        self.backend, self.path = locate(file, directory)
+        self.index_path = os.path.join(directory, _stem(file) + '.index.json')
+        self.parquet = isinstance(self.backend, ParquetBackend)
+        self._load()
+
+    def _load(self) -> None:
+        index = None
+        if os.path.exists(self.index_path):
+            with open(self.index_path, 'r') as file:
+                index = json.load(file)
+        if index is not None and index.get('version') != INDEX_VERSION:
+            index = None
+        if index is not None and index['state'] == self.backend.state(self.path):
+            self.index = index
+        else:
+            self.index = self._update(index)
+            self._save()
+        entries = self.index['entries']
+        self.dates = [entry[0] for entry in entries]
+        self.games = {}
+        for _, game, block in entries:
+            self.games.setdefault(game, []).append(block)
+
+    def _save(self) -> None:
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(self.index_path), suffix='.tmp')
+        with os.fdopen(fd, 'w') as file:
+            json.dump(self.index, file)
+        os.replace(tmp, self.index_path)
+
+    def _update(self, index:dict) -> dict:
+        """
+        Returns the index of the current file, reusing [index] if the file
+        was only appended to since.
+        """
+        if index is None or index['format'] != ('parquet' if self.parquet else 'csv'):
+            index = None
+        if self.parquet:
+            parts = self.backend.parts(self.path)
+            if index is not None and parts[:len(index['parts'])] != index['parts']:
+                index = None
+            index = index or {'version': INDEX_VERSION, 'format': 'parquet', 'columns': None, 'parts': [], 'blocks': [], 'entries': []}
+            self._index_parquet(index, parts)
+        else:
+            if index is not None and (index['bytes'] > os.path.getsize(self.path)
+                                      or _tail_hash(self.path, index['bytes']) != index['hash']):
+                index = None
+            index = index or {'version': INDEX_VERSION, 'format': 'csv', 'columns': None, 'bytes': 0, 'hash': None,
+                              'blocks': [], 'entries': []}
+            self._index_csv(index)
+        index['entries'].sort(key=lambda entry: entry[0] or '') # stable: file order within a date
+        index['state'] = self.backend.state(self.path)
+        return index
+
+    def _index_csv(self, index:dict) -> None:
+        with open(self.path, 'rb') as file:
+            header = file.readline()
+            index['columns'] = next(csv.reader([header.decode('utf-8')]))
+            game_col, date_col = index['columns'].index('GAME_ID'), index['columns'].index('DATE')
+            offset = max(index['bytes'], len(header))
+            file.seek(offset)
+            last_date = None
+            for line in file:
+                if not line.endswith(b'\n'): # a row still being written is left for next time
+                    break
+                row = next(csv.reader([line.decode('utf-8')]))
+                date = _iso(row[date_col])
+                if date != last_date:
+                    index['blocks'].append([offset, 0])
+                    last_date = date
+                index['blocks'][-1][1] += len(line)
+                index['entries'].append([date, _game_key(row[game_col]), len(index['blocks']) - 1])
+                offset += len(line)
+        index['bytes'] = offset
+        index['hash'] = _tail_hash(self.path, offset)
+
+    def _index_parquet(self, index:dict, parts:list) -> None:
+        for part in parts[len(index['parts']):]:
+            source = pq.ParquetFile(self._part_path(part))
+            index['columns'] = index['columns'] or source.schema_arrow.names
+            for group in range(source.num_row_groups):
+                table = source.read_row_group(group, columns=['GAME_ID', 'DATE'])
+                index['blocks'].append([part, group])
+                block = len(index['blocks']) - 1
+                for game, date in zip(table.column('GAME_ID').to_pylist(), table.column('DATE').to_pylist()):
+                    index['entries'].append([_iso(date), _game_key(game), block])
+        index['parts'] = parts
+
+    def _part_path(self, part:str) -> str:
+        return self.path if os.path.isfile(self.path) else os.path.join(self.path, part)
+
+    def _read_blocks(self, blocks:list) -> pd.DataFrame:
+        """
+        Reads [blocks] of the file, in file order. Adjacent CSV blocks are
+        read as one range.
+        """
+        blocks = sorted(set(blocks))
+        columns = self.index['columns']
+        if not blocks:
+            return pd.DataFrame(columns=columns)
+        if self.parquet:
+            frames = []
+            for part in dict.fromkeys(self.index['blocks'][block][0] for block in blocks):
+                groups = [self.index['blocks'][block][1] for block in blocks if self.index['blocks'][block][0] == part]
+                frames.append(pq.ParquetFile(self._part_path(part)).read_row_groups(groups).to_pandas())
+            return pd.concat(frames, ignore_index=True)
+
+        ranges = []
+        for block in blocks:
+            offset, length = self.index['blocks'][block]
+            if ranges and ranges[-1][0] + ranges[-1][1] == offset:
+                ranges[-1][1] += length
+            else:
+                ranges.append([offset, length])
+        with open(self.path, 'rb') as file:
+            header = file.readline()
+            body = []
+            for offset, length in ranges:
+                file.seek(offset)
+                body.append(file.read(length))
+        return pd.read_csv(io.BytesIO(header + b''.join(body)), dtype=CSV_DTYPES)
+
+    def query(self, start_date:str=None, end_date:str=None, game_ids:list=None) -> pd.DataFrame:
+        """
+        Returns the rows dated from [start_date] to [end_date], inclusive
+        (either may be None for an open end), and, if [game_ids] is given,
+        only those games. Dates may be in any format the scrapers use.
+        """
+        start = _iso(start_date) if start_date else None
+        end = _iso(end_date) if end_date else None
+        keys = {_game_key(game) for game in game_ids} if game_ids is not None else None
+        if keys is not None and not (start or end):
+            blocks = [block for key in keys for block in self.games.get(key, [])]
+        else:
+            lo = bisect.bisect_left(self.dates, start) if start else 0
+            hi = bisect.bisect_right(self.dates, end) if end else len(self.dates)
+            blocks = [block for _, game, block in self.index['entries'][lo:hi] if keys is None or game in keys]
+        df = self._read_blocks(blocks)
+
+        # blocks may hold rows outside the query
+        mask = pd.Series(True, index=df.index)
+        if start or end:
+            dates = df['DATE'].map(_iso).fillna('')
+            if start:
+                mask &= dates >= start
+            if end:
+                mask &= dates <= end
+        if keys is not None:
+            mask &= df['GAME_ID'].map(_game_key).isin(keys)
+        return df[mask].reset_index(drop=True)
+
+    def __len__(self) -> int:
+        return len(self.index['entries'])
+
+def retrieve(start_date:str=None, end_date:str=None, game_ids:list=None, files:list=None) -> pd.DataFrame:
+    """
+    Returns the games dated from [start_date] to [end_date] and, if given,
+    only [game_ids], across the season files [files] in data/. By default
+    every generated season that can overlap the dates is queried; the others
+    are not opened.
+    """
+    start = _iso(start_date) if start_date else None
+    end = _iso(end_date) if end_date else None
+    if files is None:
+        first = season_of(start) if start else None
+        last = season_of(end) if end else None
+        files = [season for season in season_files()
+                 if (first is None or season[:4] >= first[:4]) and (last is None or season[:4] <= last[:4])]
+    frames = [SeasonIndex(file).query(start, end, game_ids) for file in files]
+    frames = [frame for frame in frames if len(frame)]
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
@@ -3,17 +3,181 @@
 Libraries supporting commonly used functions
 """
 import os
+import io
+import re
+import json
+import shutil
+import hashlib
+import tempfile
 from main.config import data_directory
+from parameters.info import seasons
+from data import schema
 import pandas as pd
 import numpy as np
 
+try:
+    import pyarrow.parquet as pq # enables the Parquet backend
+except ImportError:
+    pq = None
+
+# columns read from text as strings, so that e.g. the leading zeros of GAME_IDs are kept
+CSV_DTYPES = {column: str for column in schema.STRING_IDS}
+
+class CSVBackend:
+    """
+    Plain text storage. Always available; used for exports.
+    """
+    extension = '.csv'
+
+    def read(self, path:str, columns:list=None) -> pd.DataFrame:
+        df = pd.read_csv(path, usecols=columns, dtype=CSV_DTYPES)
+        return df[columns] if columns else df
+
+    def write(self, df:pd.DataFrame, path:str) -> None:
+        df.to_csv(path, index=False)
+
+    def append(self, df:pd.DataFrame, path:str) -> None:
+        df.to_csv(path, mode='a', header=not os.path.exists(path), index=False)
+
+    def state(self, path:str) -> list:
+        return ['csv', os.path.getsize(path), os.stat(path).st_mtime_ns]
+
+class ParquetBackend:
+    """
+    Columnar, compressed and typed storage. Reading a subset of [columns] only
+    decodes those columns. A file is a directory of parts, so rows can be
+    appended without rewriting it.
+    """
+    extension = '.parquet'
+
+    def read(self, path:str, columns:list=None) -> pd.DataFrame:
+        return pd.read_parquet(path, columns=columns)
+
+    def read_numpy(self, path:str, columns:list=None) -> np.ndarray:
+        table = pq.read_table(path, columns=columns)
+        return np.column_stack([column.to_numpy() for column in table.columns]) if table.num_columns else np.empty((table.num_rows, 0))
+
+    def parts(self, path:str) -> list:
+        if os.path.isfile(path): # written before parts were introduced
+            return [os.path.basename(path)]
+        return sorted(name for name in os.listdir(path) if name.endswith('.parquet'))
+
+    def write(self, df:pd.DataFrame, path:str) -> None:
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        elif os.path.exists(path):
+            os.remove(path)
+        self.append(df, path)
+
+    def append(self, df:pd.DataFrame, path:str) -> None:
+        if os.path.isfile(path): # convert to parts first
+            existing = pd.read_parquet(path)
+            os.remove(path)
+            self.append(existing, path)
+        os.makedirs(path, exist_ok=True)
+        parts = self.parts(path)
+        if parts: # keep every part on one schema, whatever types the new rows were parsed as
+            schema = pq.read_schema(os.path.join(path, parts[0]))
+            df = df.astype({field.name: self._dtype(field, df[field.name]) for field in schema
+                            if field.name in df.columns})
+        part = os.path.join(path, f"part-{len(parts):05d}.parquet")
+        df.to_parquet(part, index=False, compression='zstd')
+
+    def _dtype(self, field, column:pd.Series):
+        """
+        The pandas dtype that writes [column] as the Arrow type of [field]:
+        its nullable counterpart (e.g. Int16) for an integer column with
+        missing values, which would otherwise arrive as floats.
+        """
+        dtype = np.dtype(field.type.to_pandas_dtype())
+        if dtype.kind in 'iu' and column.isna().any():
+            return dtype.name.replace('uint', 'UInt') if dtype.kind == 'u' else dtype.name.replace('int', 'Int')
+        return dtype
+
+    def state(self, path:str) -> list:
+        return ['parquet'] + self.parts(path)
+
+backends = {'csv': CSVBackend()}
+if pq is not None:
+    backends['parquet'] = ParquetBackend()
+default_backend = backends['parquet'] if pq is not None else backends['csv']
+
+def _stem(file:str) -> str:
+    for backend in backends.values():
+        if file.endswith(backend.extension):
+            return file[:-len(backend.extension)]
+    return file
+
+def locate(file:str, directory:str=data_directory) -> tuple:
+    """
+    Returns the (backend, path) holding [file] in [directory], with or
+    without extension. If it is stored in several formats, the most recently
+    written one wins, so a CSV appended to after a migration is still read.
+    """
+    stem = os.path.join(directory, _stem(file))
+    found = [(os.path.getmtime(stem + backend.extension), backend) for backend in backends.values()
+             if os.path.exists(stem + backend.extension)]
+    if not found:
+        raise FileNotFoundError(f"{_stem(file)} not found in {directory}")
+    backend = max(found, key=lambda x: x[0])[1]
+    return backend, stem + backend.extension
+
+def load(file:str, columns:list=None, compact:bool=False) -> pd.DataFrame:
+    """
+    Reads [file] from data/, in whichever format it is stored. If [columns]
+    is given, only those columns are read. If [compact], the columns are
+    cast to the dtypes of [data/schema.py], with IDs as categoricals and
+    without names (see [names]).
+    """
+    backend, path = locate(file)
+    df = backend.read(path, columns)
+    return schema.apply(df)[0] if compact else df
+
+def save(df:pd.DataFrame, file:str, backend=None) -> None:
+    """
+    Saves [df] as [file] in data/, in [backend] (Parquet if available by
+    default, otherwise CSV).
+    """
+    backend = backend or default_backend
+    backend.write(df, os.path.join(data_directory, _stem(file) + backend.extension))
+
+def append(df:pd.DataFrame, file:str) -> None:
+    """
+    Appends the rows of [df] to [file] in data/, in the format it is stored
+    in, or the default one for a new file.
+    """
+    try:
+        backend, path = locate(file)
+    except FileNotFoundError:
+        backend = default_backend
+        path = os.path.join(data_directory, _stem(file) + backend.extension)
+    backend.append(df, path)
+
+def state(file:str) -> list:
+    """
+    Cheap signature of [file] in data/ that changes whenever it is written,
+    or None if it does not exist.
+    """
+    try:
+        backend, path = locate(file)
+    except FileNotFoundError:
+        return None
+    return backend.state(path)
+
+def names() -> pd.Series:
+    """
+    Returns the player and team names by ID, from the side table the
+    aggregate keeps them in.
+    """
+    df = load("names")
+    return df.drop_duplicates('ID', keep='last').set_index('ID')['NAME']
+
 def csv_to_dataframe(file:str) -> pd.DataFrame:
     """
-    Given a file name in data/, return the csv file.
+    Given a file name in data/, return the file, in whichever format it is
+    stored.
     """
-    if not file.endswith('.csv'):
-        file += '.csv'
-    return pd.read_csv(os.path.join(data_directory, file))
+    return load(file)
 
 
 def dataframe_to_csv(df:pd.DataFrame, dest:str) -> None:
@@ -23,26 +187,289 @@ def dataframe_to_csv(df:pd.DataFrame, dest:str) -> None:
     dest = os.path.join(data_directory, dest)
     df.to_csv(dest, index=False)
 
+def export_csv(file:str) -> None:
+    """
+    Writes a CSV copy of [file] in data/.
+    """
+    dataframe_to_csv(load(file), _stem(file) + '.csv')
 
-def aggregate_files() -> None:
+def migrate(remove:bool=False) -> list:
     """
-    Aggregates all year csv's into one, in chronological order.
+    Converts every CSV in data/ to the default backend. The CSVs are kept
+    unless [remove]. Returns the converted file names.
     """
-    combined_files = ["2020-2021", "2021-2022", "2022-2023", "2023-2024"]
-    aggregate_df = pd.DataFrame()
+    if default_backend is backends['csv']:
+        print("pyarrow is not installed; nothing to migrate to.")
+        return []
+    converted = []
+    for name in sorted(os.listdir(data_directory)):
+        if not name.endswith('.csv'):
+            continue
+        path = os.path.join(data_directory, name)
+        save(pd.read_csv(path, dtype=CSV_DTYPES), name)
+        converted.append(name)
+        if remove:
+            os.remove(path)
+    return converted
 
-    for file in combined_files:
-        location = os.path.join(data_directory, f'{file}.csv')
-        df = pd.read_csv(location)
-        aggregate_df = pd.concat([aggregate_df, df])
 
-    dataframe_to_csv(aggregate_df, "aggregate.csv")
+MATRIX_DTYPE = np.float32
+MATRIX_VERSION = 2 # bump whenever the layout below changes, to rebuild the matrices
+INDEX_COLUMNS = ['GAME_ID', 'DATE']
 
-def aggregate_to_features() -> None:
+def _matrix_paths(name:str) -> tuple:
+    stem = os.path.join(data_directory, name)
+    return stem + '.f32', stem + '.json', stem + '.index.csv'
+
+def matrix_schema(name:str) -> dict:
     """
-    Generates [xTr] and [yTr]. 
+    Returns the sidecar of matrix [name]: {'version', 'dtype', 'rows',
+    'columns', 'index_bytes'}, or None if there is none.
     """
-    df = csv_to_dataframe("aggregate.csv")
+    _, schema_path, _ = _matrix_paths(name)
+    if not os.path.exists(schema_path):
+        return None
+    with open(schema_path, 'r') as file:
+        return json.load(file)
+
+def _append_bytes(path:str, size:int, data:bytes) -> None:
+    """
+    Truncates [path] to [size] bytes, dropping anything an interrupted write
+    left past it, and appends [data].
+    """
+    with open(path, 'ab') as file:
+        file.truncate(size)
+        file.write(data)
+        file.flush()
+        os.fsync(file.fileno())
+
+def write_matrix(name:str, df:pd.DataFrame, index:pd.DataFrame=None, append:bool=False) -> None:
+    """
+    Writes [df] as the contiguous float32 matrix data/<name>.f32, row-major,
+    with the sidecar data/<name>.json naming its columns, and the GAME_ID and
+    DATE of each row (from [index]) in data/<name>.index.csv. If [append],
+    the rows are added to the existing matrix and index, writing only the
+    new rows. The sidecar is written last and its row and byte counts are
+    authoritative, so bytes past them (from an interrupted write) are
+    ignored.
+    """
+    matrix_path, schema_path, index_path = _matrix_paths(name)
+    schema = matrix_schema(name) if append else None
+    if schema is not None and (schema.get('version') != MATRIX_VERSION or schema['columns'] != list(df.columns)):
+        raise ValueError(f"Layout of {name} changed; rebuild it instead of appending.")
+    if schema is None:
+        schema = {'version': MATRIX_VERSION, 'dtype': np.dtype(MATRIX_DTYPE).name, 'rows': 0,
+                  'columns': list(df.columns), 'index_bytes': 0}
+        for path in [matrix_path, index_path]:
+            if os.path.exists(path):
+                os.remove(path)
+
+    values = np.ascontiguousarray(df.to_numpy(dtype=MATRIX_DTYPE))
+    _append_bytes(matrix_path, schema['rows'] * len(schema['columns']) * values.itemsize, values.tobytes())
+
+    ids = pd.DataFrame({column: index[column].astype(str).to_numpy() if index is not None and column in index else None
+                        for column in INDEX_COLUMNS}, index=range(len(df)))
+    lines = ids.to_csv(index=False, header=schema['index_bytes'] == 0).encode('utf-8')
+    _append_bytes(index_path, schema['index_bytes'], lines)
+
+    schema['rows'] += len(df)
+    schema['index_bytes'] += len(lines)
+    fd, tmp = tempfile.mkstemp(dir=data_directory, suffix='.tmp')
+    with os.fdopen(fd, 'w') as file:
+        json.dump(schema, file)
+    os.replace(tmp, schema_path)
+
+def load_matrix(name:str) -> tuple:
+    """
+    Memory-maps matrix [name] without reading it, and returns (matrix,
+    sidecar). The map is copy-on-write, so it can be wrapped by
+    [torch.from_numpy] without a copy; writes never reach the file.
+    """
+    matrix_path, _, _ = _matrix_paths(name)
+    schema = matrix_schema(name)
+    if schema is None:
+        raise FileNotFoundError(f"No matrix {name} in {data_directory}. Run features first.")
+    shape = (schema['rows'], len(schema['columns']))
+    if schema['rows'] == 0:
+        return np.empty(shape, dtype=schema['dtype']), schema
+    return np.memmap(matrix_path, dtype=schema['dtype'], mode='c', shape=shape), schema
+
+def matrix_index(name:str) -> pd.DataFrame:
+    """
+    Returns the GAME_ID and DATE of every row of matrix [name], as strings.
+    """
+    _, _, index_path = _matrix_paths(name)
+    schema = matrix_schema(name)
+    if schema is None:
+        raise FileNotFoundError(f"No matrix {name} in {data_directory}. Run features first.")
+    with open(index_path, 'rb') as file:
+        lines = file.read(schema['index_bytes'])
+    return pd.read_csv(io.BytesIO(lines), dtype=str) if lines else pd.DataFrame(columns=INDEX_COLUMNS)
+
+watermark_path = os.path.join(data_directory, 'watermarks.json')
+HASH_BLOCK = 1 << 16
+
+def _tail_hash(path:str, end:int) -> str:
+    """
+    Hash of the [HASH_BLOCK] bytes of [path] before offset [end].
+    """
+    with open(path, 'rb') as file:
+        start = max(0, end - HASH_BLOCK)
+        file.seek(start)
+        return hashlib.sha256(file.read(end - start)).hexdigest()
+
+def read_new_rows(file:str, mark:dict) -> tuple:
+    """
+    Reads the rows of [file] in data/ added since watermark [mark] (None to
+    read everything). Returns (new rows or None, new watermark, reset), where
+    [reset] means the file changed in other ways than appends since [mark],
+    so everything was read.
+
+    A CSV watermark holds the byte offset consumed and a hash of the bytes
+    just before it; a Parquet watermark holds the parts consumed. Either way,
+    only the new rows are read.
+    """
+    backend, path = locate(file)
+    reset = False
+    if isinstance(backend, ParquetBackend):
+        parts = backend.parts(path)
+        seen = mark['parts'] if mark and mark.get('format') == 'parquet' else None
+        if seen is None or parts[:len(seen)] != seen:
+            reset, seen = mark is not None, []
+        new = parts[len(seen):]
+        if os.path.isfile(path):
+            df = pd.read_parquet(path) if new else None
+        else:
+            df = pd.concat([pd.read_parquet(os.path.join(path, part)) for part in new], ignore_index=True) if new else None
+        new_mark = {'format': 'parquet', 'parts': parts}
+    else:
+        size = os.path.getsize(path)
+        start = mark['bytes'] if mark and mark.get('format') == 'csv' else None
+        if start is None or start > size or _tail_hash(path, start) != mark['hash']:
+            reset, start = mark is not None, 0
+        with open(path, 'rb') as source:
+            header = source.readline()
+            source.seek(max(start, len(header)))
+            body = source.read()
+        body = body[:body.rfind(b'\n') + 1] # a row still being written is left for next time
+        end = max(start, len(header)) + len(body)
+        df = pd.read_csv(io.BytesIO(header + body), dtype=CSV_DTYPES) if body else None
+        new_mark = {'format': 'csv', 'bytes': end, 'hash': _tail_hash(path, end)}
+
+    rows = (mark or {}).get('rows', 0) if not reset else 0
+    new_mark['rows'] = rows + (len(df) if df is not None else 0)
+    new_mark['last'] = (mark or {}).get('last') if not reset else None
+    if df is not None and len(df) and {'DATE', 'GAME_ID'} <= set(df.columns):
+        new_mark['last'] = [str(df['DATE'].iloc[-1]), str(df['GAME_ID'].iloc[-1])]
+    return df, new_mark, reset
+
+def _read_watermarks() -> dict:
+    if not os.path.exists(watermark_path):
+        return {}
+    with open(watermark_path, 'r') as file:
+        return json.load(file)
+
+def _write_watermarks(marks:dict) -> None:
+    fd, tmp = tempfile.mkstemp(dir=data_directory, suffix='.tmp')
+    with os.fdopen(fd, 'w') as file:
+        json.dump(marks, file, indent=2)
+    os.replace(tmp, watermark_path)
+
+def season_names(season:str) -> list:
+    """
+    File names [season] (e.g. '2023-24', as keyed in [parameters/info.py])
+    may be stored under: the key itself, or the 'YYYY-YYYY' form of older
+    files (e.g. '2023-2024').
+    """
+    return [season, f"{season[:4]}-{int(season[:4]) + 1}"]
+
+def season_files() -> list:
+    """
+    Season files in data/, in chronological order, for every season in
+    [parameters/info.py] that has been generated, under either name of
+    [season_names]. Warns about files named like a season that is not in
+    [parameters/info.py], as those are left out.
+    """
+    files = []
+    for season in seasons:
+        found = [name for name in season_names(season) if state(name) is not None]
+        if len(found) > 1:
+            print(f"Warning: both {found[0]} and {found[1]} exist; only {found[0]} is used.")
+        files += found[:1]
+    known = {name for season in seasons for name in season_names(season)}
+    for file in sorted(os.listdir(data_directory)) if os.path.isdir(data_directory) else []:
+        if re.fullmatch(r"\d{4}-\d{2}(\d{2})?", _stem(file)) and _stem(file) not in known:
+            print(f"Warning: {file} is not a season of parameters/info.py and is left out.")
+    return files
+
+def aggregate_files(full:bool=False) -> int:
+    """
+    Aggregates all season files into one, in chronological order. Only rows
+    added to a season since the last run are read and appended; if nothing
+    changed this is a no-op. A season file that changed in other ways than
+    appends, or an aggregate changed by someone else, triggers a full
+    rebuild, as does [full] or a change of [schema.SCHEMA_VERSION]. Rows are
+    stored with the compact dtypes of [data/schema.py], their names moved to
+    the 'names' side table. Returns the number of rows appended.
+    """
+    marks = _read_watermarks()
+    sources = marks.get('sources', {})
+    files = season_files()
+    if state("aggregate") != marks.get('aggregate_state') or set(sources) - set(files) \
+            or marks.get('schema') != schema.SCHEMA_VERSION:
+        full = True
+
+    frames, new_sources = [], {}
+    for file in files:
+        df, mark, reset = read_new_rows(file, None if full else sources.get(file))
+        if reset:
+            return aggregate_files(full=True)
+        new_sources[file] = mark
+        if df is not None:
+            frames.append(df)
+
+    if not frames and not full:
+        print("Aggregate is up to date.")
+        return 0
+
+    new_rows = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+    new_rows, new_names = schema.apply(new_rows, categorical=False)
+    if full:
+        save(new_rows, "aggregate")
+        save(new_names, "names")
+        marks['generation'] = marks.get('generation', 0) + 1
+    else:
+        append(new_rows, "aggregate")
+        append(new_names, "names")
+    marks['schema'] = schema.SCHEMA_VERSION
+    marks['sources'] = new_sources
+    marks['aggregate_state'] = state("aggregate")
+    _write_watermarks(marks)
+    print(f"Aggregate: {'rebuilt with' if full else 'appended'} {len(new_rows)} rows.")
+    return len(new_rows)
+
+def aggregate_to_features(full:bool=False) -> int:
+    """
+    Generates [xTr] and [yTr]. Only the aggregate rows added since the last
+    run are processed and appended, unless the aggregate was rebuilt or
+    [full]. Returns the number of rows processed.
+    """
+    marks = _read_watermarks()
+    derived = marks.get('features', {})
+    if derived.get('generation') != marks.get('generation') \
+            or [state('features'), state('scores')] != derived.get('state') \
+            or [(matrix_schema(name) or {}).get('rows') for name in ['features', 'scores']] != derived.get('matrix_rows') \
+            or any((matrix_schema(name) or {}).get('version') != MATRIX_VERSION for name in ['features', 'scores']):
+        full = True
+
+    df, mark, reset = read_new_rows("aggregate", None if full else derived.get('aggregate'))
+    if reset:
+        return aggregate_to_features(full=True)
+    if df is None and not full:
+        print("Features are up to date.")
+        return 0
+    df = schema.apply(df)[0] if df is not None else load("aggregate", compact=True)
+    index = df[[column for column in INDEX_COLUMNS if column in df.columns]]
 
     # Remove categorical features
     suffixes_to_remove = ['_ID', '_NAME']
@@ -54,14 +481,24 @@ def aggregate_to_features() -> None:
     df_features = df.drop(columns=['HOME_SCORE', 'ROAD_SCORE'])
     df_scores = df[['HOME_SCORE', 'ROAD_SCORE']]
 
-    dataframe_to_csv(df_features, dest='features.csv')
-    dataframe_to_csv(df_scores, dest='scores.csv')
+    write = save if full else append
+    write(df_features, 'features')
+    write(df_scores, 'scores')
+    write_matrix('features', df_features, index, append=not full)
+    write_matrix('scores', df_scores, index, append=not full)
+
+    marks['features'] = {'generation': marks.get('generation'), 'aggregate': mark,
+                         'state': [state('features'), state('scores')],
+                         'matrix_rows': [matrix_schema(name)['rows'] for name in ['features', 'scores']]}
+    _write_watermarks(marks)
+    return len(df)
 
 def daily_to_features() -> None:
     """
     Generates [xTr] and [yTr]. 
     """
-    df = csv_to_dataframe("daily.csv")
+    df = load("daily", compact=True)
+    index = df[[column for column in INDEX_COLUMNS if column in df.columns]]
 
     # Remove categorical features
     suffixes_to_remove = ['_ID', '_NAME']
@@ -69,15 +506,21 @@ def daily_to_features() -> None:
     columns_to_remove = [col for col in df.columns if any(col.endswith(suffix) for suffix in suffixes_to_remove) or col in cols_to_remove]
     df = df.drop(columns=columns_to_remove)
 
-    dataframe_to_csv(df, dest='daily_features.csv')
+    save(df, 'daily_features')
+    write_matrix('daily_features', df, index)
 
-def to_numpy(*args:str) -> np.ndarray:
+def to_numpy(*args:str, columns:list=None) -> np.ndarray:
     """
-    Wrapper that extracts all features in a dataframe as a numpy array.
+    Wrapper that extracts all features in a dataframe as a numpy array. If
+    [columns] is given, only those columns are read. Parquet files are read
+    straight into arrays, without going through text.
     """
     outputs = []
     for file in args:
-        df = csv_to_dataframe(file)
-        outputs.append(df.values) # appends ndarray
+        backend, path = locate(file)
+        if isinstance(backend, ParquetBackend):
+            outputs.append(backend.read_numpy(path, columns))
+        else:
+            outputs.append(backend.read(path, columns).values) # appends ndarray
     
-    return tuple(outputs)
\ No newline at end of file
+    return tuple(outputs)
@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+"""
+Compact dtypes for the feature columns built from [parameters/features.json].
+"""
+import os
+import json
+from functools import lru_cache
+from main.config import parent_directory
+import pandas as pd
+import numpy as np
+
+SCHEMA_VERSION = 2 # bump whenever the dtypes below change, to rebuild what was written with the old ones
+
+INTEGER_FEATURES = {'GP'} # whole numbers even as per-game stats
+STRING_IDS = {'GAME_ID'} # IDs with leading zeros (e.g. '0022300061'), never stored as numbers
+
+@lru_cache(maxsize=None)
+def _features() -> tuple:
+    with open(os.path.join(parent_directory, 'parameters/features.json'), 'r') as file:
+        data = json.load(file)
+    return tuple(sorted(set(data['player_features']) | set(data['team_features']), key=len, reverse=True))
+
+def _base(column:str, features:tuple) -> str:
+    """
+    The [features.json] column a season file column is built from (e.g.
+    'hp3_FG_PCT' -> 'FG_PCT'), or [column] itself.
+    """
+    return next((feature for feature in features if column.endswith(feature)), column)
+
+def dtype_of(column:str, features:tuple=None) -> str:
+    """
+    Returns the dtype of [column]: 'category' for IDs and dates, 'name' for
+    names (kept in a side table), 'int16' for counts and scores and
+    'float32' for everything else (percentages and per-game averages).
+    """
+    base = _base(column, features if features is not None else _features())
+    if column == 'DATE' or base.endswith('_ID'):
+        return 'category'
+    if base.endswith('_NAME'):
+        return 'name'
+    if base in INTEGER_FEATURES or column.endswith('SCORE'):
+        return 'int16'
+    return 'float32'
+
+def bounds(column:str, features:tuple=None) -> tuple:
+    """
+    Returns the (low, high) range of valid values of numeric [column]:
+    fractions for percentages, non-negative stats (except PLUS_MINUS),
+    minutes up to a long overtime game and positive IDs.
+    """
+    base = _base(column, features if features is not None else _features())
+    if base.endswith('_PCT'):
+        return 0.0, 1.0
+    if base == 'PLUS_MINUS':
+        return -np.inf, np.inf
+    if base == 'MIN':
+        return 0.0, 70.0
+    if base.endswith('_ID'):
+        return 1.0, np.inf
+    if column.endswith('SCORE'):
+        return 0.0, 250.0
+    return 0.0, np.inf
+
+def schema(columns:list) -> dict:
+    """
+    Returns {column: dtype} of [columns], see [dtype_of].
+    """
+    features = _features()
+    return {column: dtype_of(column, features) for column in columns}
+
+def _cast(series:pd.Series, dtype:str, categorical:bool, text:bool=False) -> pd.Series:
+    if text:
+        series = series.where(series.isna(), series.astype(str))
+        return series.astype('category') if categorical else series
+    if dtype == 'category' and categorical:
+        return series.astype('category')
+    numeric = pd.to_numeric(series, errors='coerce')
+    if numeric.isna().sum() > series.isna().sum(): # not numbers (e.g. dates): left as they are
+        return series
+    if dtype == 'category': # stored as plain values
+        dtype = 'int32'
+    if dtype.startswith('int') and numeric.isna().any():
+        dtype = 'float32'
+    return numeric.astype(dtype)
+
+def apply(df:pd.DataFrame, categorical:bool=True) -> tuple:
+    """
+    Casts the columns of [df] to their compact dtypes and moves the names to
+    a side table. IDs become dictionary-encoded categoricals if
+    [categorical], or int32 (for storage) otherwise; [STRING_IDS] stay
+    strings either way. Returns (df, names), where [names] has one row per
+    ID: ['ID', 'NAME'].
+    """
+    dtypes = schema(df.columns)
+    pairs = []
+    for column, dtype in dtypes.items():
+        if dtype == 'name':
+            id_column = column[:-len('NAME')] + 'ID'
+            if id_column in df.columns:
+                pairs.append(pd.DataFrame({'ID': df[id_column].to_numpy(), 'NAME': df[column].to_numpy()}))
+    names = pd.concat(pairs, ignore_index=True).drop_duplicates('ID') if pairs else pd.DataFrame(columns=['ID', 'NAME'])
+
+    df = df.drop(columns=[column for column, dtype in dtypes.items() if dtype == 'name'])
+    df = pd.DataFrame({column: _cast(df[column], dtypes[column], categorical, column in STRING_IDS) for column in df.columns})
+    return df, names.reset_index(drop=True)
+
+def scrape_dtypes(features:list) -> dict:
+    """
+    NumPy dtypes of the [features.json] columns [features] as decoded at
+    scrape time: {column: dtype}, or None to keep the decoded dtype. Only
+    the lossless casts apply there (IDs to int32, counts to int16): IDs are
+    matched rather than encoded, names are still written out, and floats
+    stay as received so the season files keep the exact values.
+    """
+    features_all = _features()
+    lossless = {'category': np.int32, 'int16': np.int16}
+    return {feature: lossless.get(dtype_of(feature, features_all)) for feature in features}
@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+"""
+Batch validation of generated rows against the schema derived from
+[parameters/features.json].
+"""
+import re
+from collections import Counter
+from data import schema
+from data.lib import load
+from scrape.cache import parse_date
+import pandas as pd
+import numpy as np
+
+ERROR = 'error' # the row is not kept
+WARNING = 'warning' # the row is kept, but looks wrong
+
+class Report:
+    """
+    Problems found by [validate]: one {'row', 'game', 'column', 'problem',
+    'severity'} per problem, where [row] is the position of the row in the
+    batch. [valid] is False for the rows with an error.
+    """
+    def __init__(self, n:int, header:list=None):
+        self.valid = np.ones(n, dtype=bool)
+        self.header = header or [] # problems with the columns themselves
+        self.problems = []
+
+    def add(self, rows:np.ndarray, games:list, column:str, problem:str, severity:str=ERROR) -> None:
+        for row in rows:
+            self.problems.append({'row': int(row), 'game': games[row], 'column': column,
+                                  'problem': problem, 'severity': severity})
+        if severity == ERROR:
+            self.valid[rows] = False
+
+    def keep(self, rows:list) -> list:
+        """
+        Returns the [rows] without errors.
+        """
+        return [row for row, valid in zip(rows, self.valid) if valid]
+
+    def __bool__(self) -> bool:
+        return not (self.problems or self.header)
+
+    def log(self, logger, limit:int=5) -> None:
+        """
+        Logs a summary of the problems to [logger], with up to [limit]
+        examples of each kind.
+        """
+        for problem in self.header:
+            logger.fail(problem)
+        counts = Counter((p['severity'], p['problem']) for p in self.problems)
+        for (severity, problem), count in counts.items():
+            examples = [f"{p['game']}:{p['column']}" for p in self.problems
+                        if p['problem'] == problem and p['severity'] == severity][:limit]
+            message = f"{count} x {problem}: {', '.join(examples)}{' ...' if count > limit else ''}"
+            (logger.fail if severity == ERROR else logger.warn)(message)
+        dropped = int((~self.valid).sum())
+        if dropped:
+            logger.fail(f"{dropped} of {len(self.valid)} rows dropped.")
+
+def _check_header(report:Report, columns:list, expected:list) -> None:
+    if expected is not None and list(columns) != list(expected):
+        differences = [column for column, wanted in zip(columns, expected) if column != wanted][:3]
+        report.header.append(f"Columns do not match the schema ({len(columns)} vs {len(expected)}; first differences: {differences}).")
+
+def _check(df:pd.DataFrame, positions:np.ndarray, games:list, report:Report, optional:list=None) -> None:
+    """
+    Checks the rows of [df], which are rows [positions] of the batch. Empty
+    values of the [optional] columns are only warned about.
+    """
+    numeric_positions = [i for i, column in enumerate(df.columns)
+                         if column != 'DATE' and schema.dtype_of(column) != 'name']
+    numeric = [df.columns[i] for i in numeric_positions]
+    raw = df.iloc[:, numeric_positions] # by position: a layout may repeat a column name
+    values = raw.apply(pd.to_numeric, errors='coerce')
+    nulls = raw.isna().to_numpy()
+    unreported = nulls & np.isin(numeric, list(optional or []))
+    nulls &= ~unreported
+    not_numeric = values.isna().to_numpy() & ~(nulls | unreported)
+    bounds = np.array([schema.bounds(column) for column in numeric]).reshape(-1, 2).T
+    array = values.to_numpy(dtype=np.float64)
+    with np.errstate(invalid='ignore'):
+        out_of_range = (array < bounds[0]) | (array > bounds[1])
+
+    for mask, problem, severity in [(nulls, "missing value", ERROR), (unreported, "not reported by the source", WARNING),
+                                    (not_numeric, "not a number", ERROR), (out_of_range, "out of range", WARNING)]:
+        rows_hit, columns_hit = np.nonzero(mask)
+        for j in np.unique(columns_hit):
+            report.add(positions[rows_hit[columns_hit == j]], games, numeric[j], problem, severity)
+
+    if 'DATE' in df.columns:
+        bad_dates = df['DATE'].map(lambda d: parse_date(str(d)) is None).to_numpy()
+        report.add(positions[bad_dates], games, 'DATE', "unparseable date")
+    if 'GAME_ID' in values.columns:
+        duplicates = values['GAME_ID'].duplicated(keep='first').to_numpy() & values['GAME_ID'].notna().to_numpy()
+        report.add(positions[duplicates], games, 'GAME_ID', "duplicate game")
+
+    # the starters of a team, e.g. hp0_PLAYER_ID..hp4_PLAYER_ID
+    teams = {}
+    for column in numeric:
+        if column.endswith('PLAYER_ID'):
+            teams.setdefault(re.sub(r'\d', '', column), []).append(column)
+    for group, starters in teams.items():
+        if len(starters) < 2:
+            continue
+        ids = np.sort(values[starters].to_numpy(dtype=np.float64), axis=1)
+        repeated = (np.diff(ids, axis=1) == 0).any(axis=1)
+        report.add(positions[repeated], games, group, "same starter twice")
+
+def validate(rows:list, columns:list, expected:list=None, optional:list=None) -> Report:
+    """
+    Checks a batch of [rows] laid out as [columns], all at once: row length,
+    that [columns] match [expected] if given, numeric values where numbers
+    are expected, nulls, value ranges (see [schema.bounds]), dates, duplicate
+    games and the same starter twice on a team. Nulls in the [optional]
+    columns, which the source cannot supply, are warnings rather than errors.
+    Returns the [Report].
+    """
+    report = Report(len(rows))
+    _check_header(report, columns, expected)
+    if not rows:
+        return report
+
+    lengths = np.fromiter((len(row) for row in rows), dtype=np.int64, count=len(rows))
+    game_col = columns.index('GAME_ID') if 'GAME_ID' in columns else None
+    games = [row[game_col] if game_col is not None and game_col < len(row) else None for row in rows]
+    report.add(np.flatnonzero(lengths != len(columns)), games, '*', f"wrong number of values (expected {len(columns)})")
+
+    positions = np.flatnonzero(lengths == len(columns))
+    if len(positions):
+        _check(pd.DataFrame([rows[i] for i in positions], columns=columns), positions, games, report, optional)
+    return report
+
+def validate_file(file:str, expected:list=None, optional:list=None) -> Report:
+    """
+    Validates every row of [file] in data/ the same way.
+    """
+    df = load(file)
+    report = Report(len(df))
+    _check_header(report, list(df.columns), expected)
+    games = df['GAME_ID'].tolist() if 'GAME_ID' in df.columns else [None] * len(df)
+    _check(df, np.arange(len(df)), games, report, optional)
+    return report
@@ -1,9 +1,13 @@
 #!/usr/bin/env python
 import sys, os, config
 
-from data.lib import aggregate_files, aggregate_to_features, daily_to_features
+from data.lib import aggregate_files, aggregate_to_features, daily_to_features, migrate as migrate_files, export_csv, dataframe_to_csv
+from data.index import retrieve as retrieve_games
+from data.validate import validate_file
+from misc.logger import Logger
 from scrape.data_generator import DataHandler
 from scrape.today_scraper import TodaysGameScraper
+from scrape.fetch import configure
 from parameters.info import seasons
 from datetime import datetime
 
@@ -15,18 +19,57 @@ def generate(season:str):
 def update(season:str):
     file = season + '.csv'
     data_handler = DataHandler(file)
-    if season == '2023-2024': # update up to today's value
+    if season == '2023-24': # update up to today's value
         end_date = datetime.today().strftime("%m/%d/%y")
     else:
         end_date = seasons[season]['endDate']
     data_handler.update(end_date=end_date)
 
+def compact(season:str):
+    data_handler = DataHandler(season + '.csv')
+    data_handler.compact()
+
+def rebuild(season:str):
+    """
+    Regenerates a season's CSV (or every season's, for 'all') from the raw
+    archive, without any request.
+    """
+    for key in (seasons if season == 'all' else [season]):
+        data_handler = DataHandler(key + '.csv')
+        data_handler.rebuild(key)
+
 def aggregate():
     aggregate_files()
 
 def features():
     aggregate_to_features()
 
+def migrate():
+    converted = migrate_files()
+    if converted:
+        print(f"Converted: {', '.join(converted)}")
+
+def export(file:str):
+    export_csv(file)
+
+def retrieve(start:str, end:str):
+    """
+    Writes the games of every season from [start] to [end] to retrieved.csv.
+    """
+    df = retrieve_games(start, end)
+    dataframe_to_csv(df, 'retrieved.csv')
+    print(f"Retrieved {len(df)} games.")
+
+def validate(file:str):
+    """
+    Checks every row of [file] in data/ against the features.json schema.
+    """
+    report = validate_file(file)
+    if report:
+        print(f"{file}: no problems found.")
+    else:
+        report.log(Logger("Validate"))
+
 def default_function():
     print("No valid function specified.")
 
@@ -39,20 +82,48 @@ def daily():
 function_mapping = {
     'generate': generate,
     'update': update,
+    'compact': compact,
+    'rebuild': rebuild,
     'aggregate': aggregate,
     'features': features,
+    'migrate': migrate,
+    'export': export,
+    'retrieve': retrieve,
+    'validate': validate,
     'daily': daily
 }
 
 function_help = {
-    'generate': 'generate <YYYY-YYYY>',
-    'update': 'update <YYYY-YYYY>',
+    'generate': 'generate <YYYY-YY>',
+    'update': 'update <YYYY-YY>',
+    'compact': 'compact <YYYY-YY>',
+    'rebuild': 'rebuild <YYYY-YY|all>',
     'aggregate': 'aggregate',
     'features': 'features',
+    'migrate': 'migrate',
+    'export': 'export <file>',
+    'retrieve': 'retrieve <MM/DD/YY> <MM/DD/YY>',
+    'validate': 'validate <file>',
     'daily': 'daily'
 }
 
+def parse_flags(argv:list) -> None:
+    """
+    Applies command line flags:
+    --offline               serve every request from the response cache only
+    --cache-ttl=<seconds>   lifetime of cached responses for today's data
+    --rate=<requests/s>     maximum request rate to the NBA endpoints
+    """
+    for arg in argv:
+        if arg == '--offline':
+            configure(offline=True)
+        elif arg.startswith('--cache-ttl='):
+            configure(ttl=float(arg.split('=', 1)[1]))
+        elif arg.startswith('--rate='):
+            configure(rate=float(arg.split('=', 1)[1]))
+
 def main():
+    parse_flags(sys.argv[1:])
     while True:
         user_input = input("Enter command: ").split()
         first_argument = user_input[0] if user_input else None
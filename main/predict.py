@@ -4,24 +4,25 @@ parent_directory = os.path.abspath(os.path.join(os.path.dirname(__file__), '..')
 sys.path.append(parent_directory)
 
 import torch
-import torch.nn as nn
-import torch.optim as optim
 import numpy as np
 import pickle
-from scrape.today_scraper import TodaysGameScraper
 from sklearn.model_selection import train_test_split
-from models.nn import StandardNN, train_model
-from data.lib import to_numpy, csv_to_dataframe
+from models.ensemble import train_ensemble, predict_ensemble
+from models.registry import ModelRegistry
+from models.incremental import fine_tune_ensemble
+from data.lib import load_matrix, csv_to_dataframe
 
 file_directory = os.path.dirname(__file__)
 data_directory = os.path.join(file_directory, '../data/')
 
-# Data Loading
-xTr, yTr, xTe = to_numpy('features.csv', 'scores.csv', 'daily_features.csv')
+# Data Loading: the float32 matrices are memory-mapped and wrapped without a copy
+xTr, _ = load_matrix('features')
+yTr, _ = load_matrix('scores')
+xTe, _ = load_matrix('daily_features')
 yTr = (yTr[:,0] - yTr[:,1]).reshape((-1, 1))
-xTr = torch.from_numpy(xTr).float()
-yTr = torch.from_numpy(yTr).float()
-xTe = torch.from_numpy(xTe).float()
+xTr = torch.from_numpy(xTr)
+yTr = torch.from_numpy(yTr)
+xTe = torch.from_numpy(xTe)
 
 data = csv_to_dataframe("daily.csv")
 
@@ -32,11 +33,6 @@ for i, coef in enumerate(hidden_sizes):
     hidden_sizes[i] = int(coef * input_size)
 output_size = len(yTr[0])
 
-# Model Selection
-model = StandardNN(input_size, hidden_sizes, output_size)
-criterion = nn.MSELoss() 
-optimizer = optim.Adam(model.parameters(), lr=0.001)
-
 # Model Training
 def round_num(num:float) -> int:
     if 0 < num and num < 1:
@@ -45,29 +41,35 @@ def round_num(num:float) -> int:
         return -1
     return round(num)
 
-games = [[] for _ in range(len(xTe))]
-
-USE_PARAMS = False
-for _ in range(20):
-    if USE_PARAMS:
-        model = torch.load('model.pth')
-    else:
-        model = StandardNN(input_size, hidden_sizes, output_size)
-        criterion = nn.MSELoss() 
-        optimizer = optim.Adam(model.parameters(), lr=0.001)
-        train_model(model, criterion, optimizer, xTr, yTr, num_epochs=3000, save_dest='model2.pth')
-
-    # Obtaining today's games
-    todays_games = TodaysGameScraper(verbose=True)
+# Architecture and hyperparameters; a model is only retrained when these, the
+# training data or the model code change
+config = {
+    'kind': 'ensemble',
+    'members': 20,
+    'input_size': input_size,
+    'hidden_sizes': hidden_sizes,
+    'output_size': output_size,
+    'lr': 0.001,
+    'num_epochs': 3000,
+    'batch_size': 256,
+    'seed': 0,
+}
 
-    # Predicting models
-    with torch.no_grad():
-        y_predict = model(xTe)
+# all members train in the same batched forward/backward pass
+registry = ModelRegistry()
+ensemble = registry.get_or_train(config, lambda model: train_ensemble(model, xTr, yTr, num_epochs=config['num_epochs'],
+                                                                      lr=config['lr'], batch_size=config['batch_size'],
+                                                                      seed=config['seed']), xTr, yTr,
+                                 # after an update, continue the last model on the new games instead
+                                 fine_tune=lambda model, state, lineage, rows: fine_tune_ensemble(model, state, config, lineage,
+                                                                                                  xTr, yTr, rows))
 
-    y_predict = y_predict.numpy()
+# Predicting models
+members, mean = predict_ensemble(ensemble, xTe)
+members, mean = members.numpy(), mean.numpy()
 
-    print()
-    for i in range(len(y_predict)):
-        games[i].append(round_num(y_predict[i][0]))
-        print(games[i])
-    print()
\ No newline at end of file
+print()
+for i in range(len(xTe)):
+    games = [round_num(prediction) for prediction in members[:, i, 0]]
+    print(games, f"mean: {mean[i][0]:.2f}")
+print()
@@ -0,0 +1,48 @@
+#!/usr/bin/env python
+import threading
+from collections import OrderedDict
+
+class LRUCache:
+    """
+    Thread-safe least-recently-used cache bounded by the total size of its
+    values. [sizeof] returns the size in bytes of a value; the least recently
+    used entries are evicted until the total fits in [max_bytes].
+    """
+    def __init__(self, max_bytes:int, sizeof=lambda value: 1):
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.entries = OrderedDict() # key -> (value, size)
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, key, default=None):
+        with self.lock:
+            if key not in self.entries:
+                self.misses += 1
+                return default
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return self.entries[key][0]
+
+    def put(self, key, value) -> None:
+        size = self.sizeof(value)
+        with self.lock:
+            if key in self.entries:
+                self.size -= self.entries.pop(key)[1]
+            if size > self.max_bytes: # would evict everything and still not fit
+                return
+            self.entries[key] = (value, size)
+            self.size += size
+            while self.size > self.max_bytes:
+                _, (_, evicted) = self.entries.popitem(last=False)
+                self.size -= evicted
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+import sys, os
+parent_directory = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(parent_directory)
+
+import math
+import time
+import torch
+import torch.nn as nn
+from models.nn import StandardNN, BatchLoader, _prepare, num_threads
+
+class BatchedLinear(nn.Module):
+    """
+    [members] independent linear layers applied at once with one batched
+    matmul. Input and output are (members, rows, features).
+    """
+    def __init__(self, members:int, in_features:int, out_features:int):
+        super(BatchedLinear, self).__init__()
+        self.weight = nn.Parameter(torch.empty(members, in_features, out_features))
+        self.bias = nn.Parameter(torch.empty(members, 1, out_features))
+        bound = 1 / math.sqrt(in_features) # the default initialization of nn.Linear, per member
+        nn.init.uniform_(self.weight, -bound, bound)
+        nn.init.uniform_(self.bias, -bound, bound)
+
+    def forward(self, x):
+        return torch.baddbmm(self.bias, x, self.weight)
+
+class EnsembleNN(nn.Module):
+    """
+    [members] replicas of [StandardNN], each with its own weights, stacked
+    into batched tensors so that every member runs in the same forward and
+    backward pass.
+    """
+    def __init__(self, members:int, input_size, hidden_sizes, output_size):
+        super(EnsembleNN, self).__init__()
+        self.members = members
+        self.sizes = [input_size] + list(hidden_sizes) + [output_size]
+
+        layers = []
+        for i in range(len(self.sizes) - 1):
+            layers.append(BatchedLinear(members, self.sizes[i], self.sizes[i + 1]))
+            layers.append(nn.ReLU())
+
+        # Remove the last ReLU layer
+        layers.pop()
+
+        self.network = nn.Sequential(*layers)
+
+    def forward(self, x):
+        """
+        [x] is either (rows, features), shared by every member, or
+        (members, rows, features). Returns (members, rows, outputs).
+        """
+        if x.dim() == 2:
+            x = x.unsqueeze(0).expand(self.members, -1, -1)
+        return self.network(x)
+
+    def member(self, i:int) -> StandardNN:
+        """
+        Returns a copy of member [i] as a standalone [StandardNN].
+        """
+        model = StandardNN(self.sizes[0], self.sizes[1:-1], self.sizes[-1])
+        linears = [layer for layer in model.network if isinstance(layer, nn.Linear)]
+        batched = [layer for layer in self.network if isinstance(layer, BatchedLinear)]
+        with torch.no_grad():
+            for linear, layer in zip(linears, batched):
+                linear.weight.copy_(layer.weight[i].T)
+                linear.bias.copy_(layer.bias[i, 0])
+        return model
+
+def _clip_per_member(model:EnsembleNN, max_norm:float) -> torch.Tensor:
+    """
+    Clips the gradient of each member to [max_norm] on its own, as
+    [clip_grad_norm_] does for a single model. Returns the norms.
+    """
+    grads = [p.grad for p in model.parameters() if p.grad is not None]
+    norms = torch.sqrt(sum(g.pow(2).reshape(model.members, -1).sum(dim=1) for g in grads))
+    scale = (max_norm / (norms + 1e-6)).clamp(max=1.0)
+    for g in grads:
+        g.mul_(scale.view(-1, *([1] * (g.dim() - 1))))
+    return norms
+
+def train_ensemble(model:EnsembleNN, xTr, yTr, num_epochs:int, lr:float=0.001, save_dest:str=None,
+                   batch_size:int=256, threads:int=None, log_every:int=100, seed:int=None,
+                   optimizer:torch.optim.Optimizer=None) -> dict:
+    """
+    Trains every member of [model] at once, as [train_model] would train
+    each of them: Adam at [lr], mini-batches of [batch_size] (None for full
+    batches) drawn from a shuffle of its own per member, and gradients
+    clipped per member. The losses are only read every [log_every] epochs;
+    training stops once every member stayed under the threshold 10 times in
+    a row. [threads] sets the intra-op threads of torch for the run.
+    [optimizer] continues an earlier run (e.g. restored from its
+    state_dict) instead of starting a new one. If [save_dest] is specified,
+    saves the ensemble. Returns {'epochs', 'seconds', 'loss', 'optimizer'},
+    [loss] holding each member's.
+    """
+    with num_threads(threads):
+        return _train_ensemble(model, xTr, yTr, num_epochs, lr, save_dest, batch_size, log_every, seed, optimizer)
+
+def _train_ensemble(model:EnsembleNN, xTr, yTr, num_epochs:int, lr:float, save_dest:str, batch_size:int,
+                    log_every:int, seed:int, optimizer:torch.optim.Optimizer) -> dict:
+    error_threshold = 5
+    device = next(model.parameters()).device
+    xTr, yTr = _prepare(xTr, device), _prepare(yTr, device)
+    n, members = len(xTr), model.members
+    batch_size = min(batch_size or n, n)
+    generator = torch.Generator()
+    if seed is not None:
+        generator.manual_seed(seed)
+    optimizer = optimizer or torch.optim.Adam(model.parameters(), lr=lr)
+    error_count = torch.zeros(members, dtype=torch.long, device=device)
+    loader = BatchLoader((xTr, yTr), members * batch_size if batch_size < n else 0, device)
+    full = loader.all() if batch_size == n else None # copied once
+
+    start = time.perf_counter()
+    epoch, loss = 0, [float('nan')] * members
+    model.train()
+    for epoch in range(1, num_epochs + 1):
+        orders = torch.argsort(torch.rand(members, n, generator=generator), dim=1) if batch_size < n else None
+        total = torch.zeros(members, device=device)
+        for first in range(0, n, batch_size):
+            if orders is None:
+                inputs, targets = full[0], full[1].unsqueeze(0).expand(members, -1, -1)
+            else:
+                inputs, targets = loader.gather(orders[:, first:first + batch_size].contiguous())
+
+            outputs = model(inputs)
+            # the members are independent: the sum of their losses gives each its own gradient
+            member_loss = ((outputs - targets) ** 2).mean(dim=(1, 2))
+
+            optimizer.zero_grad(set_to_none=True)
+            member_loss.sum().backward()
+            _clip_per_member(model, 1.0)
+            optimizer.step()
+            total += member_loss.detach() * targets.shape[1]
+
+        if epoch % log_every == 0 or epoch == num_epochs:
+            member_mean = total / n
+            loss = member_mean.tolist()
+            error_count = torch.where(member_mean < error_threshold, error_count + 1, torch.zeros_like(error_count))
+            print(f'Epoch [{epoch}/{num_epochs}], Loss: {member_mean.mean().item():.4f} '
+                  f'(min {min(loss):.4f}, max {max(loss):.4f}) [{int(error_count.min())}]')
+            if bool((error_count >= 10).all()):
+                print("Exiting.")
+                break
+
+    seconds = time.perf_counter() - start
+    print(f"Trained {members} members for {epoch} epochs in {seconds:.1f}s ({seconds / max(epoch, 1) * 1000:.1f} ms/epoch).")
+
+    # save if specified
+    if save_dest:
+        torch.save(model, save_dest)
+    return {'epochs': epoch, 'seconds': seconds, 'loss': loss, 'optimizer': optimizer}
+
+def predict_ensemble(model:EnsembleNN, x:torch.Tensor) -> tuple:
+    """
+    Returns (per-member predictions of shape (members, rows, outputs), their
+    mean over the members) for [x].
+    """
+    model.eval()
+    with torch.no_grad():
+        device = next(model.parameters()).device
+        predictions = model(_prepare(x, device).to(device, non_blocking=True))
+    return predictions, predictions.mean(dim=0)
@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+import sys, os
+parent_directory = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(parent_directory)
+
+import torch
+from models.ensemble import EnsembleNN, train_ensemble, predict_ensemble
+
+# defaults of the fine-tuning keys of a model config
+FINE_TUNE_DEFAULTS = {
+    'fine_tune_epochs': 50, # epoch budget of a fine-tune
+    'replay': 4, # older rows replayed per new row
+    'min_replay': 512,
+    'max_fine_tunes': 30, # fine-tunes in a row before a full retrain
+    'max_new_fraction': 0.25, # rows added since the last full retrain, relative to its rows
+    'max_loss_ratio': 2.0, # loss on the new rows relative to the replayed rows
+    'max_feature_shift': 0.5, # mean shift of the new rows' features, in standard deviations
+}
+
+def _setting(config:dict, name:str):
+    return config.get(name, FINE_TUNE_DEFAULTS[name])
+
+def _loss(model:EnsembleNN, x:torch.Tensor, y:torch.Tensor) -> float:
+    members, _ = predict_ensemble(model, x)
+    return ((members - y.float().to(members.device)) ** 2).mean().item()
+
+def drift(model:EnsembleNN, xTr:torch.Tensor, yTr:torch.Tensor, rows:int, replay:torch.Tensor) -> dict:
+    """
+    Measures how far the rows of [xTr]/[yTr] after the first [rows], which
+    [model] has not seen, are from those it was trained on:
+        loss_new        mean squared error of [model] on the new rows
+        loss_old        the same on the [replay] sample of the older rows
+        loss_ratio      loss_new / loss_old
+        feature_shift   mean over features of |new mean - old mean| / old std
+    """
+    old, new = xTr[:rows].float(), xTr[rows:].float()
+    loss_new = _loss(model, new, yTr[rows:])
+    loss_old = _loss(model, old[replay], yTr[:rows][replay])
+    std = old.std(dim=0).clamp(min=1e-6)
+    shift = ((new.mean(dim=0) - old.mean(dim=0)).abs() / std).mean().item()
+    return {'loss_new': loss_new, 'loss_old': loss_old, 'loss_ratio': loss_new / max(loss_old, 1e-12),
+            'feature_shift': shift}
+
+def retrain_reason(config:dict, metrics:dict, lineage:dict, n:int) -> str:
+    """
+    Returns why a full retrain is needed instead of a fine-tune, given the
+    [drift] [metrics] and the [lineage] of the model ({'full_rows',
+    'fine_tunes'}) for [n] rows, or None.
+    """
+    new_fraction = (n - lineage['full_rows']) / max(lineage['full_rows'], 1)
+    if lineage['fine_tunes'] >= _setting(config, 'max_fine_tunes'):
+        return f"{lineage['fine_tunes']} fine-tunes since the last full retrain"
+    if new_fraction > _setting(config, 'max_new_fraction'):
+        return f"{new_fraction:.0%} new rows since the last full retrain"
+    if metrics['loss_ratio'] > _setting(config, 'max_loss_ratio'):
+        return f"loss on the new rows is {metrics['loss_ratio']:.2f}x the loss on older rows"
+    if metrics['feature_shift'] > _setting(config, 'max_feature_shift'):
+        return f"features shifted by {metrics['feature_shift']:.2f} standard deviations"
+    return None
+
+def fine_tune_ensemble(model:EnsembleNN, optimizer_state:dict, config:dict, lineage:dict,
+                       xTr:torch.Tensor, yTr:torch.Tensor, rows:int) -> dict:
+    """
+    Continues training [model], last trained on the first [rows] rows, with
+    its restored [optimizer_state]: [config]['fine_tune_epochs'] epochs over
+    the new rows and a replay sample of [config]['replay'] older rows per
+    new row. Returns the training result with the [drift] metrics under
+    'drift', or None if they call for a full retrain (see [retrain_reason]),
+    in which case [model] is left untouched.
+    """
+    n = len(xTr)
+    generator = torch.Generator().manual_seed(config.get('seed') or 0)
+    count = min(rows, max(_setting(config, 'replay') * (n - rows), _setting(config, 'min_replay')))
+    replay = torch.randperm(rows, generator=generator)[:count]
+
+    metrics = drift(model, xTr, yTr, rows, replay)
+    reason = retrain_reason(config, metrics, lineage, n)
+    if reason is not None:
+        print(f"Full retrain needed: {reason}.")
+        return None
+
+    optimizer = torch.optim.Adam(model.parameters(), lr=config['lr'])
+    if optimizer_state is not None:
+        optimizer.load_state_dict(optimizer_state)
+    subset = torch.cat([torch.arange(rows, n), replay])
+    result = train_ensemble(model, xTr[subset], yTr[subset], num_epochs=_setting(config, 'fine_tune_epochs'),
+                            lr=config['lr'], batch_size=config.get('batch_size', 256), seed=config.get('seed'),
+                            log_every=_setting(config, 'fine_tune_epochs'), optimizer=optimizer)
+    result['drift'] = metrics
+    return result
@@ -3,15 +3,17 @@ import sys, os
 parent_directory = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 sys.path.append(parent_directory)
 
+import time
+from contextlib import contextmanager
 import torch
 import torch.nn as nn
 import torch.optim as optim
 import numpy as np
-import pickle
 from sklearn.model_selection import train_test_split
 import matplotlib.pylab as plt
 from scrape.today_scraper import TodaysGameScraper
 from torch.nn.utils import clip_grad_norm_
+from data.lib import load_matrix
 
 file_directory = os.path.dirname(__file__)
 data_directory = os.path.join(file_directory, '../data/')
@@ -35,37 +37,150 @@ class StandardNN(nn.Module):
     def forward(self, x):
         return self.network(x)
 
-def train_model(model:nn.Module, criterion:nn.Module, optimizer:optim, xTr, yTr, num_epochs:int, save_dest:str=None) -> None:
+def _prepare(tensor:torch.Tensor, device:torch.device=None) -> torch.Tensor:
+    """
+    Returns [tensor] as contiguous float32, pinned when batches will be
+    copied to [device], a GPU. Tensors that already are (e.g. mapped from
+    the feature matrices) are not copied.
+    """
+    tensor = tensor.float().contiguous()
+    return tensor.pin_memory() if device is not None and device.type == 'cuda' else tensor
+
+class BatchLoader:
+    """
+    Gathers rows of [tensors] (float32 rows, see [_prepare]) into reused
+    buffers of up to [capacity] rows and hands them to [device]. For a GPU
+    the buffers are pinned and copied without blocking; there are two of
+    them, used in turn, so one batch is gathered while the other is still
+    being copied, and a buffer is only refilled once its copy completed.
+    """
+    def __init__(self, tensors:tuple, capacity:int, device:torch.device):
+        self.tensors = tensors
+        self.device = device
+        self.cuda = device.type == 'cuda'
+        self.buffers = [[_prepare(torch.empty((capacity,) + tuple(tensor.shape[1:]), dtype=tensor.dtype), device)
+                         for tensor in tensors] for _ in range(2 if self.cuda else 1)]
+        self.copied = [None] * len(self.buffers) # CUDA event of each buffer's last copy
+        self.turn = 0
+
+    def all(self) -> list:
+        """
+        Returns every row of [tensors] on [device].
+        """
+        return [tensor.to(self.device, non_blocking=True) for tensor in self.tensors]
+
+    def gather(self, rows:torch.Tensor) -> list:
+        """
+        Returns the rows [rows] of every tensor on [device], shaped as
+        [rows] (e.g. (members, batch) for an ensemble) followed by the row
+        shape.
+        """
+        k, self.turn = self.turn, (self.turn + 1) % len(self.buffers)
+        if self.copied[k] is not None:
+            self.copied[k].synchronize()
+        flat = rows.reshape(-1)
+        batches = [torch.index_select(tensor, 0, flat, out=buffer[:len(flat)]).view(tuple(rows.shape) + tuple(tensor.shape[1:]))
+                   for tensor, buffer in zip(self.tensors, self.buffers[k])]
+        if self.cuda:
+            batches = [batch.to(self.device, non_blocking=True) for batch in batches]
+            self.copied[k] = torch.cuda.Event()
+            self.copied[k].record()
+        return batches
+
+@contextmanager
+def num_threads(threads:int):
+    """
+    Sets the intra-op threads of torch to [threads] (if given) and restores
+    the previous setting afterwards.
+    """
+    previous = torch.get_num_threads()
+    if threads:
+        torch.set_num_threads(threads)
+    try:
+        yield
+    finally:
+        torch.set_num_threads(previous)
+
+def train_model(model:nn.Module, criterion:nn.Module, optimizer:optim, xTr, yTr, num_epochs:int, save_dest:str=None,
+                batch_size:int=256, threads:int=None, log_every:int=100, seed:int=None,
+                callback=None, verbose:bool=True) -> dict:
     """
     Trains [model] with the specified parameters. if [save_dest] is specified,
     saves the weights.
+
+    Every epoch walks a fresh shuffle of the rows in mini-batches of
+    [batch_size] (None for full batches), gathered into reused buffers and
+    copied to the model's device (see [BatchLoader]).
+    [threads] sets the intra-op threads of torch for the run (its default
+    otherwise) and [seed] the shuffle. The loss is only read back every [log_every] epochs,
+    where training stops once it stayed under the threshold 10 times in a
+    row, or when [callback(epoch, loss)] returns True. Returns {'epochs',
+    'seconds', 'loss', 'stopped'}, [stopped] telling whether [callback]
+    stopped it.
     """
+    with num_threads(threads):
+        return _train_model(model, criterion, optimizer, xTr, yTr, num_epochs, save_dest,
+                            batch_size, log_every, seed, callback, verbose)
+
+def _train_model(model:nn.Module, criterion:nn.Module, optimizer:optim, xTr, yTr, num_epochs:int, save_dest:str,
+                 batch_size:int, log_every:int, seed:int, callback, verbose:bool) -> dict:
     error_threshold = 5
     error_count = 0
-    
-    for epoch in range(num_epochs):
+    device = next(model.parameters()).device
+    xTr, yTr = _prepare(xTr, device), _prepare(yTr, device)
+    n = len(xTr)
+    batch_size = min(batch_size or n, n)
+    generator = torch.Generator()
+    if seed is not None:
+        generator.manual_seed(seed)
+    loader = BatchLoader((xTr, yTr), batch_size if batch_size < n else 0, device)
+    full = loader.all() if batch_size == n else None # copied once
+
+    start = time.perf_counter()
+    epoch, loss, stopped = 0, float('nan'), False
+    model.train()
+    for epoch in range(1, num_epochs + 1):
+        order = torch.randperm(n, generator=generator) if batch_size < n else None
+        total = torch.zeros((), device=device)
+        for first in range(0, n, batch_size):
+            if order is None:
+                inputs, targets = full
+            else:
+                inputs, targets = loader.gather(order[first:first + batch_size])
 
-        outputs = model(xTr)
-        loss = criterion(outputs, yTr)
+            outputs = model(inputs)
+            batch_loss = criterion(outputs, targets)
 
-        optimizer.zero_grad()
-        loss.backward()
-        clip_grad_norm_(model.parameters(), 1.0) # gradient clipping
-        optimizer.step()
+            optimizer.zero_grad(set_to_none=True)
+            batch_loss.backward()
+            clip_grad_norm_(model.parameters(), 1.0) # gradient clipping
+            optimizer.step()
+            total += batch_loss.detach() * len(inputs)
 
-        if (epoch+1) % 100 == 0:
-            if loss.item() < error_threshold:
+        if epoch % log_every == 0 or epoch == num_epochs:
+            loss = (total / n).item()
+            if loss < error_threshold:
                 error_count += 1
                 if error_count == 10:
-                    print("Exiting.")
+                    if verbose:
+                        print("Exiting.")
                     break
             else:
                 error_count = 0
-            print(f'Epoch [{epoch+1}/{num_epochs}], Loss: {loss.item():.4f} [{error_count}]')
+            if verbose:
+                print(f'Epoch [{epoch}/{num_epochs}], Loss: {loss:.4f} [{error_count}]')
+            if callback is not None and callback(epoch, loss):
+                stopped = True
+                break
+
+    seconds = time.perf_counter() - start
+    if verbose:
+        print(f"Trained {epoch} epochs in {seconds:.1f}s ({seconds / max(epoch, 1) * 1000:.1f} ms/epoch), loss {loss:.4f}.")
     
     # save if specified
     if save_dest:
         torch.save(model, save_dest)
+    return {'epochs': epoch, 'seconds': seconds, 'loss': loss, 'stopped': stopped}
     
 def validate_model(model:nn.Module, xTe:torch.Tensor, yTe:torch.Tensor, threshold:int, verbose:bool=False) -> None:
     """
@@ -121,11 +236,8 @@ def validate_model(model:nn.Module, xTe:torch.Tensor, yTe:torch.Tensor, threshol
 
 if __name__ == '__main__':
 
-    with open(os.path.join(data_directory, 'xTr.pkl'), 'rb') as file:
-        xTr = pickle.load(file)
-
-    with open(os.path.join(data_directory, 'yTr.pkl'), 'rb') as file:
-        yTr = pickle.load(file)
+    xTr, _ = load_matrix('features')
+    yTr, _ = load_matrix('scores')
 
     yTr = yTr[:,0] - yTr[:,1]
     yTr = yTr.reshape(-1, 1)
@@ -137,14 +249,12 @@ if __name__ == '__main__':
     
     if days_past > 0:
         xTr, yTr = xTr[:-days_past], yTr[:-days_past]
-    xTr = torch.from_numpy(xTr).float()
-    yTr = torch.from_numpy(yTr).float()
+    xTr = torch.from_numpy(xTr)
+    yTr = torch.from_numpy(yTr)
 
     if n > 0:
         xTe, yTe = xTr[-n:], yTr[-n:]
         xTr, yTr = xTr[:-n], yTr[:-n]
-        xTe = torch.from_numpy(xTe).float()
-        yTe = torch.from_numpy(yTe).float()
     # Convert into PyTorch tensors
 
     todays_games = TodaysGameScraper(verbose=True)
@@ -0,0 +1,226 @@
+#!/usr/bin/env python
+import sys, os
+parent_directory = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(parent_directory)
+
+import json
+import time
+import hashlib
+import tempfile
+import numpy as np
+import torch
+import torch.nn as nn
+from models.nn import StandardNN
+from models.ensemble import EnsembleNN
+from misc.logger import Logger
+
+file_directory = os.path.dirname(__file__)
+registry_directory = os.path.join(file_directory, '../data/models/')
+
+# the code a trained model depends on: a change to any of them retrains
+CODE_FILES = [os.path.join(file_directory, name) for name in ['nn.py', 'ensemble.py', 'incremental.py']]
+
+def build(config:dict) -> nn.Module:
+    """
+    Builds the untrained model described by [config]: {'kind': 'standard'
+    or 'ensemble', 'input_size', 'hidden_sizes', 'output_size', and
+    'members' for an ensemble}.
+    """
+    if config['kind'] == 'ensemble':
+        return EnsembleNN(config['members'], config['input_size'], config['hidden_sizes'], config['output_size'])
+    return StandardNN(config['input_size'], config['hidden_sizes'], config['output_size'])
+
+def _hash_arrays(*arrays) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    for array in arrays:
+        array = np.ascontiguousarray(array.numpy() if isinstance(array, torch.Tensor) else array)
+        digest.update(str((array.dtype.str, array.shape)).encode('utf-8'))
+        digest.update(memoryview(array).cast('B'))
+    return digest.hexdigest()
+
+def _hash_code() -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    for path in CODE_FILES:
+        with open(path, 'rb') as file:
+            digest.update(file.read())
+    return digest.hexdigest()
+
+class ModelRegistry:
+    """
+    Trained models stored as their state_dict, optimizer state and the
+    config they were built and trained with, under data/models/<key>.pt.
+    The key hashes the training data, the config (architecture and
+    hyperparameters) and the model code, so a model is only retrained when
+    one of them changes. Each model has a sidecar data/models/<key>.json
+    with those hashes, its number of training rows and its lineage: the rows
+    of its last full retrain and the fine-tunes since. A sidecar is only
+    ever written by the process storing its model, so concurrent callers
+    (e.g. a search next to predict) never overwrite each other's entries.
+
+    A fine-tuned model replaces the model it was fine-tuned from, and only
+    the newest [keep] models of each config are kept.
+    """
+    def __init__(self, directory:str=registry_directory, verbose:bool=True, keep:int=3):
+        self.directory = directory
+        self.keep = keep
+        self.logger = Logger("ModelRegistry", enabled=verbose)
+
+    def _components(self, config:dict, *data) -> dict:
+        return {'data': _hash_arrays(*data), 'config': json.dumps(config, sort_keys=True), 'code': _hash_code()}
+
+    def key(self, config:dict, *data) -> str:
+        """
+        Returns the key of a model trained with [config] on the arrays
+        [data].
+        """
+        return self._key(self._components(config, *data))
+
+    def _key(self, components:dict) -> str:
+        return hashlib.blake2b(json.dumps(components, sort_keys=True).encode('utf-8'), digest_size=16).hexdigest()
+
+    def path(self, key:str) -> str:
+        return os.path.join(self.directory, f"{key}.pt")
+
+    def sidecar(self, key:str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def entries(self) -> dict:
+        """
+        Returns {key: {'config', 'created', 'metrics', 'data', 'code',
+        'rows', 'lineage', 'base'}} of the stored models.
+        """
+        if not os.path.isdir(self.directory):
+            return {}
+        entries = {}
+        for name in sorted(os.listdir(self.directory)):
+            if not name.endswith('.pt'):
+                continue
+            key = name[:-len('.pt')]
+            try:
+                with open(self.sidecar(key), 'r') as file:
+                    entries[key] = json.load(file)
+            except FileNotFoundError: # being stored, or removed, by another process
+                continue
+        return entries
+
+    def load(self, key:str, optimizer:bool=False):
+        """
+        Returns the model stored under [key], or None if there is none. If
+        [optimizer], returns (model, optimizer state_dict or None).
+        """
+        try:
+            entry = torch.load(self.path(key), map_location='cpu', weights_only=True)
+        except FileNotFoundError: # never stored, or removed by [prune]
+            return (None, None) if optimizer else None
+        model = build(entry['config'])
+        model.load_state_dict(entry['state_dict'])
+        model.eval()
+        return (model, entry.get('optimizer')) if optimizer else model
+
+    def save(self, key:str, model:nn.Module, config:dict, metrics:dict=None, optimizer=None,
+             components:dict=None, rows:int=None, lineage:dict=None, base:str=None) -> None:
+        """
+        Stores [model] under [key] with its [config], training [metrics] and
+        [optimizer] state, and indexes it with its hash [components], [rows],
+        [lineage] and [base] (the model it was fine-tuned from).
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        entry = {'config': config, 'created': time.strftime('%Y-%m-%d %H:%M:%S'), 'metrics': metrics or {},
+                 'data': (components or {}).get('data'), 'code': (components or {}).get('code'),
+                 'rows': rows, 'lineage': lineage, 'base': base}
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as file:
+            json.dump(entry, file, indent=2)
+        os.replace(tmp, self.sidecar(key))
+
+        # the model is written last: [entries] only lists a key once both exist
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        os.close(fd)
+        torch.save({'state_dict': model.state_dict(), 'config': config,
+                    'optimizer': optimizer.state_dict() if optimizer is not None else None}, tmp)
+        os.replace(tmp, self.path(key))
+
+    def remove(self, key:str) -> None:
+        """
+        Removes the model stored under [key] and its sidecar.
+        """
+        for path in [self.path(key), self.sidecar(key)]: # the model first, so [entries] drops it at once
+            if os.path.exists(path):
+                os.remove(path)
+
+    def prune(self, config:dict) -> list:
+        """
+        Removes all but the newest [keep] models stored with [config].
+        Returns the removed keys.
+        """
+        stored = [(entry.get('created') or '', entry.get('rows') or 0, key) for key, entry in self.entries().items()
+                  if entry.get('config') == config]
+        removed = [key for _, _, key in sorted(stored, reverse=True)[self.keep:]]
+        for key in removed:
+            self.remove(key)
+        if removed:
+            self.logger.info(f"Removed {len(removed)} older models of this config.")
+        return removed
+
+    def base(self, config:dict, *data) -> tuple:
+        """
+        Returns (key, entry) of the newest stored model with [config] and
+        the current code that was trained on a prefix of [data] (the same
+        rows, before new ones were appended), or (None, None).
+        """
+        n, code = len(data[0]), _hash_code()
+        candidates = [(key, entry) for key, entry in self.entries().items()
+                      if entry.get('config') == config and entry.get('code') == code
+                      and entry.get('rows') and entry['rows'] < n and entry.get('lineage')]
+        for key, entry in sorted(candidates, key=lambda item: item[1]['rows'], reverse=True):
+            if _hash_arrays(*(array[:entry['rows']] for array in data)) == entry['data'] and os.path.exists(self.path(key)):
+                return key, entry
+        return None, None
+
+    def get_or_train(self, config:dict, train, *data, fine_tune=None) -> nn.Module:
+        """
+        Returns the model stored for [config] and [data]. Otherwise, if
+        [fine_tune] is given and a model was stored for an earlier prefix of
+        [data], continues it with [fine_tune(model, optimizer_state,
+        lineage, rows)], which returns its training result or None to ask
+        for a full retrain. Otherwise builds a model, trains it with
+        [train(model)] and stores it. Either training result may hold the
+        'optimizer' to store; the rest is kept as metrics. A fine-tune
+        replaces its base model, and older models of [config] are pruned.
+        [config]['seed'], if set, seeds the initialization.
+        """
+        components = self._components(config, *data)
+        key = self._key(components)
+        n = len(data[0])
+        start = time.perf_counter()
+        model = self.load(key)
+        if model is not None:
+            self.logger.info(f"Loaded model {key} in {(time.perf_counter() - start) * 1000:.0f} ms.")
+            return model
+
+        if fine_tune is not None:
+            base_key, entry = self.base(config, *data)
+            if base_key is not None:
+                self.logger.info(f"Fine-tuning model {base_key} on {n - entry['rows']} new rows...")
+                model, optimizer_state = self.load(base_key, optimizer=True)
+                result = fine_tune(model, optimizer_state, entry['lineage'], entry['rows']) if model is not None else None
+                if result is not None:
+                    optimizer = result.pop('optimizer', None)
+                    lineage = {'full_rows': entry['lineage']['full_rows'], 'fine_tunes': entry['lineage']['fine_tunes'] + 1}
+                    self.save(key, model, config, result, optimizer, components, n, lineage, base_key)
+                    self.remove(base_key) # superseded by its fine-tune
+                    self.prune(config)
+                    self.logger.info(f"Drift: {json.dumps(result.get('drift', {}))}")
+                    model.eval()
+                    return model
+
+        self.logger.info(f"No model for the current data and config ({key}). Training...")
+        if config.get('seed') is not None:
+            torch.manual_seed(config['seed'])
+        model = build(config)
+        result = train(model) or {}
+        optimizer = result.pop('optimizer', None)
+        self.save(key, model, config, result, optimizer, components, n, {'full_rows': n, 'fine_tunes': 0})
+        self.prune(config)
+        model.eval()
+        return model
@@ -0,0 +1,207 @@
+#!/usr/bin/env python
+"""
+Hyperparameter search for [StandardNN] across a process pool. Every trial
+(hidden size coefficients, learning rate, epochs, batch size) trains on the
+same feature matrix, copied once into shared memory. Trials whose validation
+loss is worse than the median of the others at the same epoch are pruned.
+Finished trials are appended to a leaderboard.
+
+Example:
+    python models/search.py --hidden 2,1,0.5 2,2,1,1,0.5 --lr 0.001 0.0005 --epochs 3000
+The validation set is the most recent [--val-fraction] of the games.
+"""
+import sys, os
+parent_directory = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(parent_directory)
+
+import csv
+import time
+import random
+import argparse
+import itertools
+from multiprocessing import Manager, shared_memory, resource_tracker
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+import torch
+import torch.nn as nn
+import torch.optim as optim
+from models.nn import StandardNN, train_model
+from data.lib import load_matrix
+from misc.logger import Logger
+
+file_directory = os.path.dirname(__file__)
+leaderboard_path = os.path.join(file_directory, '../data/leaderboard.csv')
+
+LEADERBOARD_COLUMNS = ['trial', 'hidden', 'lr', 'epochs', 'batch_size', 'epochs_run', 'train_loss',
+                       'val_loss', 'pruned', 'seconds', 'finished']
+
+_search_worker = {} # the shared matrix and pruning state of a search worker process
+
+def _attach(name:str) -> shared_memory.SharedMemory:
+    """
+    Attaches to the shared memory block [name] without letting this process
+    unlink it on exit.
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError: # before Python 3.13
+        block = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(block._name, 'shared_memory')
+        return block
+
+def _shared_arrays(block:shared_memory.SharedMemory, rows:int, features:int) -> tuple:
+    """
+    The (features, targets) arrays laid out back to back in [block], each
+    contiguous, so that row slices of them are too.
+    """
+    x = np.ndarray((rows, features), dtype=np.float32, buffer=block.buf)
+    y = np.ndarray((rows, 1), dtype=np.float32, buffer=block.buf, offset=x.nbytes)
+    return x, y
+
+def _search_init(name:str, rows:int, features:int, split:int, checkpoints, lock, min_peers:int) -> None:
+    torch.set_num_threads(1) # one trial per core
+    block = _attach(name)
+    x, y = (torch.from_numpy(array) for array in _shared_arrays(block, rows, features))
+    _search_worker.update({
+        'block': block, # keeps the mapping alive
+        'xTr': x[:split], 'yTr': y[:split], 'xVa': x[split:], 'yVa': y[split:],
+        'checkpoints': checkpoints, 'lock': lock, 'min_peers': min_peers,
+    })
+
+def _prune(epoch:int, val_loss:float) -> bool:
+    """
+    Records [val_loss] at [epoch] and returns whether it is worse than the
+    median of the other trials that reached [epoch].
+    """
+    checkpoints, lock = _search_worker['checkpoints'], _search_worker['lock']
+    with lock:
+        peers = checkpoints.get(epoch, [])
+        checkpoints[epoch] = peers + [val_loss]
+    return len(peers) >= _search_worker['min_peers'] and val_loss > float(np.median(peers))
+
+def _search_trial(trial:dict) -> dict:
+    """
+    Trains one trial in a worker and returns its leaderboard row.
+    """
+    xTr, yTr = _search_worker['xTr'], _search_worker['yTr']
+    xVa, yVa = _search_worker['xVa'], _search_worker['yVa']
+    torch.manual_seed(trial['trial'])
+
+    input_size = xTr.shape[1]
+    hidden_sizes = [int(coef * input_size) for coef in trial['hidden']]
+    model = StandardNN(input_size, hidden_sizes, yTr.shape[1])
+    criterion = nn.MSELoss()
+    optimizer = optim.Adam(model.parameters(), lr=trial['lr'])
+    val_loss = [float('nan')]
+
+    def checkpoint(epoch:int, loss:float) -> bool:
+        model.eval()
+        with torch.no_grad():
+            val_loss[0] = criterion(model(xVa), yVa).item()
+        model.train()
+        return _prune(epoch, val_loss[0])
+
+    result = train_model(model, criterion, optimizer, xTr, yTr, num_epochs=trial['epochs'],
+                         batch_size=trial['batch_size'], log_every=trial['log_every'], seed=trial['trial'],
+                         callback=checkpoint, verbose=False)
+    return {'trial': trial['trial'], 'hidden': ' '.join(str(coef) for coef in trial['hidden']),
+            'lr': trial['lr'], 'epochs': trial['epochs'], 'batch_size': trial['batch_size'],
+            'epochs_run': result['epochs'], 'train_loss': result['loss'], 'val_loss': val_loss[0],
+            'pruned': result['stopped'], 'seconds': result['seconds'],
+            'finished': time.strftime('%Y-%m-%d %H:%M:%S')}
+
+def training_matrix() -> tuple:
+    """
+    Returns the (features, targets) training matrices: the features and
+    the home score differential, as float32.
+    """
+    xTr, _ = load_matrix('features')
+    scores, _ = load_matrix('scores')
+    return xTr, (scores[:, 0] - scores[:, 1]).reshape(-1, 1)
+
+def trials(args) -> list:
+    """
+    Returns the trials of the grid in [args], or a random [args.trials] of
+    them.
+    """
+    grid = list(itertools.product(args.hidden, args.lr, args.epochs, args.batch_size))
+    if args.trials and args.trials < len(grid):
+        grid = random.Random(args.seed).sample(grid, args.trials)
+    return [{'trial': i, 'hidden': hidden, 'lr': lr, 'epochs': epochs, 'batch_size': batch_size,
+             'log_every': args.log_every} for i, (hidden, lr, epochs, batch_size) in enumerate(grid)]
+
+def append_leaderboard(row:dict, path:str) -> None:
+    new = not os.path.exists(path)
+    with open(path, 'a', newline='') as file:
+        writer = csv.DictWriter(file, fieldnames=LEADERBOARD_COLUMNS, lineterminator='\n')
+        if new:
+            writer.writeheader()
+        writer.writerow(row)
+
+def search(args) -> list:
+    """
+    Runs every trial of [args] on [args.workers] processes and returns their
+    rows, best validation loss first.
+    """
+    logger = Logger("Search")
+    xTr, yTr = training_matrix()
+    rows, features = xTr.shape
+    split = rows - max(1, int(rows * args.val_fraction))
+    block = shared_memory.SharedMemory(create=True, size=(rows * (features + 1)) * np.dtype(np.float32).itemsize)
+    x, y = _shared_arrays(block, rows, features)
+    x[:], y[:] = xTr, yTr # the only copy; every worker maps it
+    del x, y
+
+    queue = trials(args)
+    logger.info(f"Running {len(queue)} trials on {args.workers or os.cpu_count()} processes "
+                f"({split} training and {rows - split} validation games)...")
+    results = []
+    try:
+        with Manager() as manager, \
+             ProcessPoolExecutor(max_workers=args.workers, initializer=_search_init,
+                                 initargs=(block.name, rows, features, split,
+                                           manager.dict(), manager.Lock(), args.min_peers)) as executor:
+            futures = [executor.submit(_search_trial, trial) for trial in queue]
+            for future in as_completed(futures):
+                row = future.result()
+                append_leaderboard(row, args.leaderboard)
+                results.append(row)
+                status = "pruned" if row['pruned'] else "done"
+                logger.info(f"Trial {row['trial']} {status} after {row['epochs_run']} epochs: "
+                            f"hidden [{row['hidden']}], lr {row['lr']}, validation loss {row['val_loss']:.4f}")
+    finally:
+        block.close()
+        block.unlink()
+
+    results.sort(key=lambda row: (row['pruned'], row['val_loss']))
+    return results
+
+def report(results:list, top:int=10) -> None:
+    columns = ['trial', 'hidden', 'lr', 'epochs', 'batch_size', 'epochs_run', 'val_loss', 'pruned']
+    print(" | ".join(columns))
+    for row in results[:top]:
+        print(" | ".join(f"{row[c]:.4f}" if isinstance(row[c], float) else str(row[c]) for c in columns))
+
+def main(argv:list=None) -> list:
+    parser = argparse.ArgumentParser(description="Hyperparameter search for StandardNN across a process pool.")
+    parser.add_argument('--hidden', nargs='+', default=['2,1,0.5', '2,2,1,1,0.5'],
+                        type=lambda value: [float(coef) for coef in value.split(',')],
+                        help="hidden size coefficients of the input size, comma separated")
+    parser.add_argument('--lr', nargs='+', type=float, default=[0.001, 0.0005])
+    parser.add_argument('--epochs', nargs='+', type=int, default=[3000])
+    parser.add_argument('--batch-size', nargs='+', type=int, default=[256])
+    parser.add_argument('--trials', type=int, default=None, help="random subset of the grid to run")
+    parser.add_argument('--workers', type=int, default=None, help="processes, one per CPU by default")
+    parser.add_argument('--val-fraction', type=float, default=0.1, help="most recent games held out")
+    parser.add_argument('--log-every', type=int, default=100, help="epochs between validation checks")
+    parser.add_argument('--min-peers', type=int, default=3, help="trials needed at a checkpoint before pruning")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--leaderboard', default=leaderboard_path)
+    args = parser.parse_args(argv)
+
+    results = search(args)
+    report(results)
+    return results
+
+if __name__ == '__main__':
+    main()
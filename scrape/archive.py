@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+import sys, os
+parent_directory = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(parent_directory)
+
+import gzip
+import json
+import threading
+from scrape.cache import ResponseCache, CachedResponse, season_of
+
+file_directory = os.path.dirname(__file__)
+archive_directory = os.path.join(file_directory, '../data/archive/')
+
+UNDATED = 'undated'
+
+class Archive:
+    """
+    Permanent archive of every raw response, partitioned by season and date:
+    data/archive/<season>/<YYYY-MM-DD>.gz holds the responses about that date,
+    each a separate gzip member, and <YYYY-MM-DD>.idx indexes them, one JSON
+    line per response with its key, offset and length. Responses without a
+    date go to data/archive/undated/.
+
+    Reading a response decompresses only its own member. The index of a
+    partition is read once per process. Unlike [ResponseCache], nothing
+    expires: the latest response stored for a request wins.
+    """
+    def __init__(self, directory:str=archive_directory, keys:ResponseCache=None):
+        self.directory = directory
+        self.keys = keys or ResponseCache() # only used to canonicalize requests and find their date
+        self.indexes = {} # partition -> {key: (offset, length)}
+        self.lock = threading.Lock()
+
+    def partition(self, url:str, params:dict, as_of:str=None) -> str:
+        """
+        Returns the partition path of a request, without extension.
+        """
+        date = self.keys.request_date(url, params, as_of)
+        if date is None:
+            return os.path.join(self.directory, UNDATED, UNDATED)
+        return os.path.join(self.directory, season_of(date), date.strftime('%Y-%m-%d'))
+
+    def _index(self, partition:str) -> dict:
+        if partition not in self.indexes:
+            index = {}
+            if os.path.exists(partition + '.idx'):
+                with open(partition + '.idx', 'r') as file:
+                    for line in file:
+                        try:
+                            entry = json.loads(line)
+                        except json.JSONDecodeError: # torn final record
+                            break
+                        index[entry['key']] = (entry['offset'], entry['length'])
+            self.indexes[partition] = index
+        return self.indexes[partition]
+
+    def get(self, url:str, params:dict, as_of:str=None) -> CachedResponse:
+        """
+        Returns the archived response for [url] and [params], or None.
+        """
+        partition = self.partition(url, params, as_of)
+        key = self.keys.key(url, params)
+        with self.lock:
+            entry = self._index(partition).get(key)
+        if entry is None:
+            return None
+
+        offset, length = entry
+        with open(partition + '.gz', 'rb') as file:
+            file.seek(offset)
+            member = gzip.decompress(file.read(length))
+        meta, content = member.split(b'\n', 1)
+        meta = json.loads(meta)
+        return CachedResponse(meta['status_code'], content, meta['url'], from_cache=True)
+
+    def put(self, url:str, params:dict, response:CachedResponse, as_of:str=None) -> None:
+        """
+        Appends [response] to its partition. The data is written before its
+        index line, so a crash leaves at worst an unindexed member behind.
+        """
+        partition = self.partition(url, params, as_of)
+        key = self.keys.key(url, params)
+        meta = {'url': url, 'params': json.loads(self.keys.canonical(url, params))['params'],
+                'status_code': response.status_code}
+        member = gzip.compress(json.dumps(meta).encode('utf-8') + b'\n' + response.content)
+
+        with self.lock:
+            os.makedirs(os.path.dirname(partition), exist_ok=True)
+            with open(partition + '.gz', 'ab') as file:
+                offset = file.tell()
+                file.write(member)
+            with open(partition + '.idx', 'a') as file:
+                file.write(json.dumps({'key': key, 'offset': offset, 'length': len(member)}) + '\n')
+            self._index(partition)[key] = (offset, len(member))
+
+    def dates(self, season:str) -> list:
+        """
+        Returns the archived dates of [season], as sorted YYYY-MM-DD strings.
+        """
+        directory = os.path.join(self.directory, season)
+        if not os.path.isdir(directory):
+            return []
+        return sorted(name[:-len('.idx')] for name in os.listdir(directory) if name.endswith('.idx'))
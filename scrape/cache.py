@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+import sys, os
+parent_directory = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(parent_directory)
+
+import re
+import gzip
+import json
+import time
+import hashlib
+import tempfile
+from datetime import datetime
+
+file_directory = os.path.dirname(__file__)
+cache_directory = os.path.join(file_directory, '../data/cache/')
+
+DATE_KEYS = ['DateTo', 'gamedate']
+DATE_FORMATS = ["%m/%d/%Y", "%m/%d/%y", "%Y%m%d", "%Y-%m-%d"]
+
+class CacheMiss(Exception):
+    """
+    Raised in offline mode when a request has no usable cache entry.
+    """
+
+class CachedResponse:
+    """
+    Minimal stand-in for [requests.Response], used for both cached and freshly
+    fetched responses. The body is parsed at most once.
+    """
+    def __init__(self, status_code:int, content:bytes, url:str="", from_cache:bool=False):
+        self.status_code = status_code
+        self.content = content
+        self.url = url
+        self.from_cache = from_cache
+        self._json = None
+
+    @property
+    def text(self) -> str:
+        return self.content.decode('utf-8', errors='replace')
+
+    def json(self):
+        if self._json is None:
+            self._json = json.loads(self.content)
+        return self._json
+
+def parse_date(date:str) -> datetime:
+    """
+    Parses [date] in any of the formats used across the scrapers. Returns None
+    if [date] is empty or not recognized.
+    """
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(date, date_format)
+        except (ValueError, TypeError):
+            pass
+    return None
+
+def season_of(date) -> str:
+    """
+    Returns the season key in [parameters/info.py] format (e.g. '2023-24') of
+    [date], a string in any format [parse_date] accepts or a datetime.
+    """
+    date_object = date if isinstance(date, datetime) else parse_date(date)
+    year = date_object.year if date_object.month > 8 else date_object.year - 1
+    return f"{year}-{str(year + 1)[2:]}"
+
+class ResponseCache:
+    """
+    Gzip-compressed on-disk cache of HTTP responses, keyed by the URL and the
+    canonicalized payload. Responses about a date before today never expire;
+    everything else expires after [ttl] seconds.
+    """
+    def __init__(self, directory:str=cache_directory, ttl:float=3600):
+        self.directory = directory
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    def canonical(self, url:str, params:dict) -> str:
+        """
+        Returns a canonical string for [url] and [params]: keys sorted and
+        every value stringified, so equal requests always map to the same key.
+        """
+        params = {key: [str(v) for v in value] if isinstance(value, (list, tuple)) else str(value)
+                  for key, value in (params or {}).items()}
+        return json.dumps({'url': url, 'params': params}, sort_keys=True)
+
+    def key(self, url:str, params:dict) -> str:
+        return hashlib.sha256(self.canonical(url, params).encode('utf-8')).hexdigest()
+
+    def path(self, key:str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.json.gz")
+
+    def request_date(self, url:str, params:dict, as_of:str=None) -> datetime:
+        """
+        Returns the date a request is about: [as_of] if given, otherwise the
+        first date-like payload value, otherwise a YYYYMMDD date in the URL.
+        """
+        if as_of:
+            return parse_date(as_of)
+        for key in DATE_KEYS:
+            if params and params.get(key):
+                return parse_date(params[key])
+        match = re.search(r'(\d{8})\.json$', url)
+        if match:
+            return parse_date(match.group(1))
+        return None
+
+    def is_permanent(self, url:str, params:dict, as_of:str=None) -> bool:
+        """
+        Whether the response can never change: its date is strictly in the
+        past.
+        """
+        date = self.request_date(url, params, as_of)
+        if date is None:
+            return False
+        today = datetime.today().replace(hour=0, minute=0, second=0, microsecond=0)
+        return date < today
+
+    def get(self, url:str, params:dict, as_of:str=None, count:bool=True) -> CachedResponse:
+        """
+        Returns the cached response for [url] and [params], or None if there is
+        no entry or it has expired. Unless [count] is False (e.g. re-checking
+        a lookup that was already counted), the hit or miss is counted.
+        """
+        path = self.path(self.key(url, params))
+        if not os.path.exists(path):
+            self.misses += count
+            return None
+
+        with gzip.open(path, 'rb') as file:
+            meta = json.loads(file.readline())
+            content = file.read()
+
+        if not meta['permanent'] and time.time() - meta['fetched'] > self.ttl:
+            self.misses += count
+            return None
+
+        self.hits += count
+        return CachedResponse(meta['status_code'], content, meta['url'], from_cache=True)
+
+    def put(self, url:str, params:dict, response:CachedResponse, as_of:str=None) -> None:
+        """
+        Stores [response]. The file is written atomically, so a crash never
+        leaves a truncated entry behind.
+        """
+        path = self.path(self.key(url, params))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        meta = {
+            'url': url,
+            'params': json.loads(self.canonical(url, params))['params'],
+            'status_code': response.status_code,
+            'fetched': time.time(),
+            'permanent': self.is_permanent(url, params, as_of),
+        }
+
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as raw, gzip.GzipFile(fileobj=raw, mode='wb') as file:
+                file.write(json.dumps(meta).encode('utf-8') + b'\n')
+                file.write(response.content)
+            os.replace(tmp, path)
+        except BaseException:
+            os.remove(tmp)
+            raise
@@ -3,166 +3,178 @@ import sys, os
 parent_directory = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 sys.path.append(parent_directory)
 
-from collections import defaultdict
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 
-from scrape.time_scraper import TimeScraper
 from scrape.game_scraper import GameScraper
 from scrape.stats_scraper import StatsScraper
 from parameters.info import seasons
 from misc.logger import Logger
+from scrape.session import PooledSession, get_session
+from scrape.fetch import flight, archive, configure
+from scrape.cache import CacheMiss, parse_date
+from scrape.journal import Journal, read_header
+from scrape.schedule import Schedule, season_of
+from data.index import SeasonIndex
+from data.validate import validate
 
+import csv
 import time
 import json
+import tempfile
 import pickle
-from datetime import datetime, timedelta
+from datetime import datetime
 import pandas as pd
 
 file_directory = os.path.dirname(__file__)
 data_directory = os.path.join(file_directory, '../data/')
 
+_rebuild_worker = {} # the DataHandler of a [DataHandler.rebuild] worker process
+
+def _rebuild_init(target:str, directory:str) -> None:
+    configure(offline=True, cache_enabled=False) # archive only
+    _rebuild_worker['handler'] = DataHandler(target, verbose=False, directory=directory, workers=1)
+
+def _rebuild_date(d:str) -> tuple:
+    """
+    Returns (date, rows) of [d] from the archive, or (date, None) if part of it
+    is missing.
+    """
+    handler = _rebuild_worker['handler']
+    try:
+        games = handler.schedule(d).games_on(d)
+        rows = [handler.game_row(d, id) for id in games]
+    except CacheMiss:
+        return d, None
+    return d, [row for row in rows if row is not None]
+
 class DataHandler():
     """
     Handles all webscraping functions, retrieving inputs and labels.
     """
-    def __init__(self, target:str, verbose:bool=True):
-        self.time_scraper = TimeScraper(verbose=verbose)
-        self.game_scraper = GameScraper(verbose=verbose)
-        self.stats_scraper = StatsScraper(verbose=verbose)
+    def __init__(self, target:str, verbose:bool=True, session:PooledSession=None, directory:str=data_directory,
+                 workers:int=8, lookahead:int=2):
+        self.session = session or get_session()
+        self.game_scraper = GameScraper(verbose=verbose, session=self.session)
+        self.stats_scraper = StatsScraper(verbose=verbose, session=self.session)
 
         self.log = Logger("DataHandler", enabled=verbose)
 
-        # Check if the pickled file exists
-        self.data = None
         self.target = target
-
-        dir = os.path.join(data_directory, self.target)
-        if os.path.exists(dir):
-            self.log.info("Target file located and loaded.")
-            self.data = pd.read_csv(dir, dtype={'GAME_ID':str})
-            self.log.info(self.data)
-                
-
+        self.verbose = verbose
+        self.workers = workers # threads scraping games
+        self.lookahead = lookahead # dates scraped ahead of the one being committed
+        self.directory = directory # [target], its journal and the schedules are stored here
+        self.schedules = {} # season -> Schedule
+        self.journal = Journal(target, directory=directory, verbose=verbose)
+        if read_header(self.journal.target) is not None:
+            self.log.info("Target file located.")
         else:
             self.log.info("Target file not found.")
         print()
         
-    def _generate_dates(self, start_date:str, end_date:str):
+    def _parse(self, date:str) -> datetime:
+        return datetime.strptime(date, "%m/%d/%y")
+
+    def schedule(self, date:str) -> Schedule:
         """
-        Helper class that generates dates from start_date to end_date, inclusive.
+        Returns the schedule index of the season [date] belongs to.
         """
-        date_format = "%m/%d/%y"  # Updated date format
-        start = datetime.strptime(start_date, date_format)
-        end = datetime.strptime(end_date, date_format)
-
-        current_date = start
-        date_list = []
-
-        while current_date <= end:
-            date_list.append(current_date.strftime(date_format))
-            current_date += timedelta(days=1)
+        season = season_of(date)
+        if season not in self.schedules:
+            self.schedules[season] = Schedule(season, verbose=self.verbose, session=self.session,
+                                              directory=os.path.join(self.directory, 'schedule/'))
+        return self.schedules[season]
 
-        return date_list
+    def _game_days(self, start_date:str, end_date:str) -> list:
+        """
+        Returns the days from [start_date] to [end_date], inclusive, on which
+        games were played.
+        """
+        return self.schedule(start_date).game_days(start_date, end_date, date_format="%m/%d/%y")
 
-    def append_games(self, d:str, id:str, lst:list) -> None:
+    def game_row(self, d:str, id:str) -> list:
         """
-        Given a game id, extract all values and append them to the features and
-        labels list.
+        Given a game id, extracts all values and returns the row of features
+        and labels, or None if the game could not be obtained. Safe to call
+        from several threads at once.
         """
         try:
             # Game Scraping: get home/road teams ID and starting player ID/position
-            stats, score = self.game_scraper.unpack_teams(id)
+            stats, score = self.game_scraper.unpack_teams(id, date=d)
 
             if not stats or not score:
-                 return
+                 return None
 
             # Obtain stats:
             home_players, home_team = self.stats_scraper.get_stats(stats['homeTeam'], player_ids=stats['homeTeamStarters'], date=d, location='Home')
             road_players, road_team = self.stats_scraper.get_stats(stats['roadTeam'], player_ids=stats['roadTeamStarters'], date=d, location='Road')
-            
-            home_players = home_players.stack().to_frame().T
-            road_players = road_players.stack().to_frame().T
 
-            # Append all features, labels, record the date
-            row_data = pd.concat([home_team, home_players, road_team, road_players], axis=1)
-            data = row_data.iloc[0].tolist()
+            # one long row: each team's stats followed by its players' stats, player by player
+            data = home_team.iloc[0].tolist() + home_players.to_numpy(dtype=object).ravel().tolist() \
+                   + road_team.iloc[0].tolist() + road_players.to_numpy(dtype=object).ravel().tolist()
             data = [str(id), d] + data + [score['homeScore'], score['roadScore']]
-            if lst:
-                assert(len(lst[-1]) == len(data))
-            else:
-                print(self.log.info(f"Features found: {len(data)}"))            
-            lst.append(data)
-            # print(lst)
 
             self.log.info("Saved game!")
+            return data
             
         except KeyError:
             self.log.fail(f"Could not obtain game {id}.")
-        pass
+            return None
 
     def generate(self, start_date:str, end_date:str) -> None:
         """
         Generates all data from scratch, from the [startTime] to [endTime].
-        Data stored in [self.data].
+        Each date is checkpointed to the journal as soon as it completes; an
+        interrupted run picks up after the last committed date.
         """
+        if read_header(self.journal.target) is not None:
+            self.log.fail(f"{self.target} already exists. Use update to resume it.")
+            return
+
+        # generate list of game days from start to end, inclusive
+        datespan = self._game_days(start_date, end_date)
+        last_date = self.journal.last_date()
+        if last_date is not None:
+            datespan = [d for d in datespan if self._parse(d) > self._parse(last_date)]
+            self.log.info(f"Resuming after last committed date {last_date}...")
         self.log.info(f"Generating data {start_date} to {end_date} from scratch...")
 
-        # generate list of dates from start to end, inclusive
-        datespan = self._generate_dates(start_date, end_date)
+        self._run(datespan, self.feature_columns())
 
+    def feature_columns(self) -> list:
+        """
+        Columns of a season file generated from [parameters/features.json].
+        """
         # Jank method of fixing all columns, because dataframe concatenation is finnicky
         with open(os.path.join(parent_directory, 'parameters/features.json'), 'r') as file:
             data = json.load(file)
         player_features = data['player_features']
         team_features = data['team_features']
         
-        feature_cols = ["GAME_ID", "DATE"] + [f"ht_{col}" for col in team_features] \
-                        + [f"hp{i}_{col}" for i in range(5) for col in player_features] \
-                        + [f"rt_{col}" for col in team_features] \
-                        + [f"rp{i}_{col}" for i in range(5) for col in player_features] \
-                        + ["HOME_SCORE", "ROAD_SCORE"]
-
-        # list of features and labels (can be thought of as a NumPy array)
-        features = []
-        try:
-            for d in datespan:
-                self.log.info(f"Extracting games on {d}...")
-                # Time Scraping
-                games = self.time_scraper.game_ids(d)
-                # for each game, extract each home/road team/player feature
-                for id in games:
-                    self.append_games(d, id, features)
-                    assert(len(features[-1]) == len(feature_cols)) # RAHHH
-                self.log.info(f"All games {d} has been saved.")
-                pass
-        
-        # Ignore all exceptions (i.e. KeyboardInterrupt still supports quicksaving)
-        except KeyboardInterrupt:
-            pass
+        return ["GAME_ID", "DATE"] + [f"ht_{col}" for col in team_features] \
+                + [f"hp{i}_{col}" for i in range(5) for col in player_features] \
+                + [f"rt_{col}" for col in team_features] \
+                + [f"rp{i}_{col}" for i in range(5) for col in player_features] \
+                + ["HOME_SCORE", "ROAD_SCORE"]
+
+    def checked(self, rows:list, feature_cols:list) -> list:
+        """
+        Validates the [rows] of a date at once and returns those without
+        errors, logging the problems found.
+        """
+        report = validate(rows, feature_cols)
+        if not report:
+            report.log(self.log)
+        return report.keep(rows)
 
-        # Give user choice to save values
-        finally:
-            try: # always prompt whether to save currently stored values
-                inp = input("\nInterrupted. Save current values? [y/N]")
-                save = True if inp == 'y' else False
-            except:
-                save = False
-                print()
-            # save to data folder
-                
-            if save:
-                df = pd.DataFrame(features, columns=feature_cols)
-                print(df)
-                df.to_csv(os.path.join(data_directory, self.target), index=False)
-                self.log.info(f"Saved to file {self.target}!")
-            else:
-                self.log.info("Discarding changes - exiting")
-        
     def update(self, end_date:str="") -> None:
         """
         Resumes data collection. Requires that data has been generated and
-        exists.
+        exists, either in the season file or in the journal.
         """
-        if self.data is None:
+        last_date, last_id = self.journal.last_position()
+        if last_date is None:
             self.log.fail("Data does not exist. Cannot update.")
             return
         
@@ -171,64 +183,126 @@ class DataHandler():
             today = True
             end_date = datetime.now().strftime("%m/%d/%y")
         
-        # obtain the last previous date
-        last_date = self.data['DATE'].iloc[-1]
-        last_id = self.data['GAME_ID'].iloc[-1]
         self.log.info(f"Last game date: {last_date}, last game ID: {last_id}")
 
-        datespan = self._generate_dates(last_date, end_date)
+        # a committed date is complete; otherwise resume within the last saved date
+        committed = self.journal.last_date() if self.journal.last_commit() else None
+        datespan = self._game_days(committed or last_date, end_date)
+        if committed:
+            datespan = [d for d in datespan if self._parse(d) > self._parse(committed)]
         if today:
-            datespan.pop() # we don't want today
+            datespan = [d for d in datespan if d != end_date] # we don't want today
+        if not datespan:
+            self.log.info("Already up to date.")
+            return
         self.log.info(f"Resuming data generation from {datespan[0]} to {datespan[-1]}...")
 
-        features = []
-        feature_cols = self.data.columns # reobtain the columns
+        feature_cols = read_header(self.journal.rows_path) or read_header(self.journal.target) # reobtain the columns
+        self._run(datespan, feature_cols, skip_through=None if committed else (last_date, last_id))
+
+    def _run(self, datespan:list, feature_cols:list, skip_through:tuple=None) -> None:
+        """
+        Scrapes every date in [datespan] and commits its rows to the journal.
+        [skip_through] is an optional (date, game ID) whose games up to and
+        including that game were already saved.
+
+        Games run on [self.workers] threads, across dates: up to
+        [self.lookahead] dates are in flight while the oldest one completes.
+        Dates are committed in order, and rows within a date in game-ID order.
+        """
+        executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="DataHandler")
+        pending = deque() # (date, [(game ID, future)]), oldest first
+
+        def commit_oldest() -> None:
+            d, futures = pending.popleft()
+            features = [row for row in (future.result() for _, future in futures) if row is not None]
+            self.journal.commit(d, self.checked(features, feature_cols), feature_cols)
+            self.log.info(f"All games {d} has been saved.")
+
         try:
             for d in datespan:
-                    
                 self.log.info(f"Extracting games on {d}...")
-                # Time Scraping
-                games = self.time_scraper.game_ids(d)
+                games = self.schedule(d).games_on(d)
 
-                if d == last_date:
-                    idx = games.index(last_id)
+                if skip_through and d == skip_through[0]:
+                    idx = games.index(skip_through[1])
                     games = games[idx+1:]
                     self.log.info(f"Resuming last processed game and date. Games: {games}")
 
                 # for each game, extract each home/road team/player feature
-                for id in games:
-                    self.append_games(d, id, features)
-                    if features:
-                        assert(len(features[-1]) == len(feature_cols)) # RAHHH
-                self.log.info(f"All games {d} has been saved.")
-                pass
+                pending.append((d, [(id, executor.submit(self.game_row, d, id)) for id in games]))
+                if len(pending) > self.lookahead:
+                    commit_oldest()
+
+            while pending:
+                commit_oldest()
         
-        # Ignore all exceptions (i.e. KeyboardInterrupt still supports quicksaving)
+        # KeyboardInterrupt stops the run; every completed date is already saved
         except KeyboardInterrupt:
-            pass
+            self.log.warn("Interrupted. Progress up to the last completed date is saved.")
 
-        # Give user choice to save values
         finally:
-            try: # always prompt whether to save currently stored values
-                inp = input("\nInterrupted. Save current values? [y/N]")
-                save = True if inp == 'y' else False
-            except:
-                save = False
-                print()
-            # save to data folder
-                
-            if save:
-                new_df = pd.DataFrame(features, columns=feature_cols)
-
-                self.log.info(f"Finished processing {new_df.shape[0]} new games.")
-                df = pd.concat([self.data, new_df], ignore_index=True) # get new combined dataframe
-                df.to_csv(os.path.join(data_directory, self.target), index=False)
-                self.log.info(f"Saved to file {self.target}!")
-            else:
-                self.log.info("Discarding changes - exiting")
-
-    def retrieve(self, start_time:str, end_time:str) -> pd.DataFrame:
-        """
-        Retrieves all games from a specific start time to an end time. Requires
-        that data has been generated and exists.
-        """
\ No newline at end of file
+            executor.shutdown(wait=False, cancel_futures=True)
+            if self.journal.last_commit():
+                self.log.info(f"Journal is at {self.journal.last_date()}. Run compact to merge it into {self.target}.")
+            self.session.report()
+            flight.report()
+
+    def compact(self) -> None:
+        """
+        Merges the journal into the season file.
+        """
+        self.journal.compact()
+
+    def rebuild(self, season:str, workers:int=None) -> None:
+        """
+        Regenerates [target] for [season] from the raw archive alone, with the
+        current [parameters/features.json]. No request is sent. Dates are
+        processed in parallel on [workers] processes (one per CPU by default);
+        the file is replaced only once every date is done.
+        """
+        if self.journal.last_commit():
+            self.log.fail(f"{self.target} has uncommitted journal rows. Run compact first.")
+            return
+
+        start = parse_date(seasons[season]['startDate']).strftime('%Y-%m-%d')
+        end = parse_date(seasons[season]['endDate']).strftime('%Y-%m-%d')
+        dates = [datetime.strptime(d, '%Y-%m-%d').strftime("%m/%d/%y")
+                 for d in archive.dates(season) if start <= d <= end]
+        if not dates:
+            self.log.fail(f"Nothing archived for {season}.")
+            return
+
+        feature_cols = self.feature_columns()
+        self.log.info(f"Rebuilding {self.target} from {len(dates)} archived dates...")
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        games = 0
+        try:
+            with os.fdopen(fd, 'w', newline='') as file, \
+                 ProcessPoolExecutor(max_workers=workers, initializer=_rebuild_init,
+                                     initargs=(self.target, self.directory)) as executor:
+                writer = csv.writer(file, lineterminator='\n')
+                writer.writerow(feature_cols)
+                for d, rows in executor.map(_rebuild_date, dates, chunksize=4):
+                    if rows is None:
+                        self.log.warn(f"{d} is not fully archived. Skipping...")
+                        continue
+                    rows = self.checked(rows, feature_cols)
+                    writer.writerows(rows)
+                    games += len(rows)
+            os.replace(tmp, self.journal.target)
+        except BaseException:
+            os.remove(tmp)
+            raise
+        self.log.info(f"Rebuilt {self.target}: {games} games.")
+
+    def retrieve(self, start_time:str, end_time:str, game_ids:list=None) -> pd.DataFrame:
+        """
+        Retrieves all games from a specific start time to an end time, and
+        only [game_ids] if given. Requires that data has been generated and
+        exists. Only the parts of [target] holding those dates are read,
+        through its [SeasonIndex]; rows still in the journal are not.
+        """
+        if self.journal.last_commit():
+            self.log.warn(f"Journal is at {self.journal.last_date()}. Run compact to include it.")
+        return SeasonIndex(self.target, directory=self.directory).query(start_time, end_time, game_ids)
@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+import sys, os
+parent_directory = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(parent_directory)
+
+import numpy as np
+import pandas as pd
+
+def _column(rows:list, i:int) -> np.ndarray:
+    """
+    Projects column [i] of [rows] into a NumPy array. The dtype follows every
+    value: int64 if they are all ints, float64 (with NaN for empty values) if
+    they are all numbers or empty, object otherwise.
+    """
+    n = len(rows)
+    kinds = {type(row[i]) for row in rows}
+    numeric = kinds - {type(None)}
+    if not numeric or not numeric <= {int, float}:
+        return np.fromiter((row[i] for row in rows), dtype=object, count=n)
+    if kinds == {int}:
+        return np.fromiter((row[i] for row in rows), dtype=np.int64, count=n)
+    return np.fromiter((np.nan if row[i] is None else row[i] for row in rows), dtype=np.float64, count=n)
+
+def _cast(column:np.ndarray, dtype) -> np.ndarray:
+    """
+    Casts [column] to [dtype], unless it holds strings, or empty values an
+    integer dtype cannot hold.
+    """
+    if dtype is None or column.dtype == object:
+        return column
+    if np.issubdtype(dtype, np.integer) and column.dtype.kind == 'f' and np.isnan(column).any():
+        return column
+    return column.astype(dtype)
+
+class ColumnarTable:
+    """
+    Feature columns of a stats.nba.com result set, one NumPy array per column,
+    with [ids] as the index. Only the requested columns are ever materialized;
+    [to_frame] builds a pandas view on demand.
+    """
+    def __init__(self, id_col:str, ids:np.ndarray, columns:dict, tiers:np.ndarray=None):
+        self.id_col = id_col
+        self.ids = ids
+        self.columns = columns # name -> array, in feature order
+        self.tiers = tiers if tiers is not None else np.zeros(len(ids), dtype=np.int8)
+        self._order = None
+
+    @classmethod
+    def decode(cls, result_set:dict, features:list, id_col:str, dtypes:dict=None) -> 'ColumnarTable':
+        """
+        Decodes a result set ({'headers', 'rowSet'}), keeping only [features],
+        indexed by the [id_col] column. Columns in [dtypes] are cast to their
+        dtype there.
+        """
+        headers, rows = result_set['headers'], result_set['rowSet']
+        position = {name: i for i, name in enumerate(headers)}
+        dtypes = dtypes or {}
+        columns = {name: _cast(_column(rows, position[name]), dtypes.get(name)) for name in features}
+        ids = columns[id_col] if id_col in columns else _column(rows, position[id_col])
+        return cls(id_col, ids, columns)
+
+    @classmethod
+    def from_frame(cls, df:pd.DataFrame, id_col:str) -> 'ColumnarTable':
+        """
+        Wraps the columns of [df], indexed by its [id_col] column, or by its
+        index if there is no such column.
+        """
+        ids = df[id_col].to_numpy() if id_col in df.columns else df.index.to_numpy()
+        return cls(id_col, ids, {name: df[name].to_numpy() for name in df.columns})
+
+    @classmethod
+    def coalesce(cls, tables:list) -> 'ColumnarTable':
+        """
+        Merges [tables], ordered from most to least preferred, keeping for every
+        id the row of the first table that has it. [tiers] records the index
+        of that table.
+        """
+        ids = np.concatenate([table.ids for table in tables])
+        tiers = np.concatenate([np.full(len(table.ids), k, dtype=np.int8) for k, table in enumerate(tables)])
+        _, first = np.unique(ids, return_index=True)
+        keep = np.sort(first)
+        columns = {name: np.concatenate([table.columns[name] for table in tables])[keep] for name in tables[0].columns}
+        return cls(tables[0].id_col, ids[keep], columns, tiers[keep])
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def nbytes(self) -> int:
+        return self.ids.nbytes + sum(column.nbytes for column in self.columns.values())
+
+    def take(self, positions:np.ndarray) -> 'ColumnarTable':
+        """
+        Returns the rows at [positions], in that order.
+        """
+        columns = {name: column[positions] for name, column in self.columns.items()}
+        return ColumnarTable(self.id_col, self.ids[positions], columns, self.tiers[positions])
+
+    def positions(self, ids:list) -> np.ndarray:
+        """
+        Returns the row of each of [ids], or -1 for ids that are not present.
+        """
+        ids = np.asarray(ids, dtype=self.ids.dtype)
+        if len(self.ids) == 0:
+            return np.full(len(ids), -1)
+        if self._order is None:
+            self._order = np.argsort(self.ids, kind='stable')
+        sorted_ids = self.ids[self._order]
+        found = np.searchsorted(sorted_ids, ids).clip(max=len(sorted_ids) - 1)
+        return np.where(sorted_ids[found] == ids, self._order[found], -1)
+
+    def matrix(self, features:list) -> np.ndarray:
+        """
+        Returns [features] as one object matrix, one row per id, ready for row
+        assembly.
+        """
+        matrix = np.empty((len(self.ids), len(features)), dtype=object)
+        for j, name in enumerate(features):
+            matrix[:, j] = self.columns[name]
+        return matrix
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        Pandas view of the table, indexed by id.
+        """
+        return pd.DataFrame(self.columns, index=self.ids)
@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+"""
+Common request path shared by every scraper. All HTTP traffic goes through
+[fetch], which serves from the on-disk response cache when it can and
+otherwise sends the request under the process-wide rate limiter, over a
+pooled keep-alive session. Identical requests in flight at the same time
+share one network call and one response. Every response received is also
+written to the permanent raw archive, which answers requests about past
+dates and, offline, any request it holds.
+"""
+import sys, os
+parent_directory = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(parent_directory)
+
+from scrape.cache import ResponseCache, CachedResponse, CacheMiss
+from scrape.throttle import limiter
+from scrape.session import PooledSession, get_session
+from scrape.flight import SingleFlight
+from scrape.archive import Archive
+
+cache = ResponseCache()
+archive = Archive(keys=cache)
+flight = SingleFlight("Fetch")
+settings = {
+    'offline': False, # serve purely from the cache, never touch the network
+    'cache': True,
+    'archive': True, # keep every raw response in data/archive/
+    'timeout': 30, # seconds
+    'redirect': {}, # URL prefix -> replacement, e.g. to send requests to a local mock server
+}
+
+def configure(offline:bool=None, ttl:float=None, cache_enabled:bool=None, rate:float=None, burst:int=None,
+              redirect:dict=None, archive_enabled:bool=None) -> None:
+    """
+    Updates the process-wide fetch settings. Arguments left as None are kept.
+    [ttl] is the lifetime in seconds of cache entries for today's data; [rate]
+    and [burst] set the rate limiter's requests per second and burst budget.
+    [redirect] maps URL prefixes (e.g. 'https://stats.nba.com') to the ones
+    requests are actually sent to; the cache still keys on the original URL.
+    [archive_enabled] turns the raw archive on or off.
+    """
+    if offline is not None:
+        settings['offline'] = offline
+    if ttl is not None:
+        cache.ttl = ttl
+    if cache_enabled is not None:
+        settings['cache'] = cache_enabled
+    if rate is not None:
+        limiter.rate = limiter.max_rate = rate
+    if burst is not None:
+        limiter.burst = burst
+    if redirect is not None:
+        settings['redirect'] = dict(redirect)
+    if archive_enabled is not None:
+        settings['archive'] = archive_enabled
+
+def resolve(url:str) -> str:
+    """
+    Returns the URL [url] is actually sent to, after [settings['redirect']].
+    """
+    for prefix, replacement in settings['redirect'].items():
+        if url.startswith(prefix):
+            return replacement + url[len(prefix):]
+    return url
+
+def fetch(url:str, params:dict=None, headers:dict=None, as_of:str=None, session:PooledSession=None) -> CachedResponse:
+    """
+    Gets [url] with [params] and [headers]. [as_of] is the date the request is
+    about, when it cannot be read from [params]; it decides whether the cached
+    response may ever expire. [session] defaults to the shared session.
+
+    Identical requests (same [url] and [params]) already in flight wait for
+    that request and share its response, parsed JSON included.
+
+    Raises [CacheMiss] in offline mode if the response is neither cached nor
+    archived.
+    """
+    params = params or {}
+    if settings['cache']:
+        response = cache.get(url, params, as_of)
+        if response is not None:
+            return response
+
+    # past days never change, so the archive can answer them even online
+    if settings['archive'] and (settings['offline'] or cache.is_permanent(url, params, as_of)):
+        response = archive.get(url, params, as_of)
+        if response is not None:
+            return response
+
+    if settings['offline']:
+        raise CacheMiss(f"Offline and not cached: {url} {params}")
+
+    session = session or get_session()
+    def request() -> CachedResponse:
+        if settings['cache']: # the previous leader may have just cached it; the miss was already counted
+            response = cache.get(url, params, as_of, count=False)
+            if response is not None:
+                return response
+
+        target = resolve(url)
+        raw = limiter.call(lambda: session.get(target, params=params, headers=headers, timeout=settings['timeout']))
+        response = CachedResponse(raw.status_code, raw.content, raw.url)
+
+        if settings['cache'] and response.status_code == 200:
+            cache.put(url, params, response, as_of)
+        if settings['archive'] and response.status_code == 200:
+            archive.put(url, params, response, as_of)
+        return response
+
+    return flight.do(cache.key(url, params), request)
@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+import sys, os
+parent_directory = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(parent_directory)
+
+import threading
+from misc.logger import Logger
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    """
+    Collapses identical calls that are in flight at the same time: the first
+    caller of [do] for a key runs the function, and every caller arriving for
+    the same key before it returns waits and gets the same result (or
+    exception). Nothing is kept once the call returns; caching is left to the
+    layers around it.
+    """
+    def __init__(self, name:str="SingleFlight"):
+        self.calls = {} # key -> _Call in flight
+        self.lock = threading.Lock()
+        self.executed = 0
+        self.collapsed = 0
+        self.logger = Logger(name, indent=1)
+
+    def do(self, key, function):
+        """
+        Returns [function()], sharing the call with any identical [key] call
+        already in flight.
+        """
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = self.calls[key] = _Call()
+                self.executed += 1
+            else:
+                self.collapsed += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = function()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call.done.set()
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {'executed': self.executed, 'collapsed': self.collapsed}
+
+    def report(self) -> None:
+        stats = self.stats()
+        if stats['collapsed']:
+            self.logger.info(f"Calls executed: {stats['executed']}, identical calls collapsed: {stats['collapsed']}")
@@ -0,0 +1,152 @@
+#!/usr/bin/env python
+import sys, os
+parent_directory = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(parent_directory)
+
+import pandas as pd
+from misc.logger import Logger
+from scrape.cache import parse_date
+
+file_directory = os.path.dirname(__file__)
+game_log_directory = os.path.join(file_directory, '../data/gamelog/')
+
+# features.json column -> boxscoretraditionalv3 statistics key
+STATISTICS = {
+    'FGM': 'fieldGoalsMade',
+    'FGA': 'fieldGoalsAttempted',
+    'FG3M': 'threePointersMade',
+    'FG3A': 'threePointersAttempted',
+    'FTM': 'freeThrowsMade',
+    'FTA': 'freeThrowsAttempted',
+    'OREB': 'reboundsOffensive',
+    'DREB': 'reboundsDefensive',
+    'REB': 'reboundsTotal',
+    'AST': 'assists',
+    'TOV': 'turnovers',
+    'STL': 'steals',
+    'BLK': 'blocks',
+    'BLKA': 'blocksReceived',
+    'PF': 'foulsPersonal',
+    'PFD': 'foulsDrawn',
+    'PTS': 'points',
+    'PLUS_MINUS': 'plusMinusPoints',
+}
+
+PLAYER_COLUMNS = ['DATE', 'GAME_ID', 'LOCATION', 'TEAM_ID', 'PLAYER_ID', 'PLAYER_NAME', 'POSITION',
+                  'STARTER', 'W', 'MIN'] + list(STATISTICS)
+TEAM_COLUMNS = ['DATE', 'GAME_ID', 'LOCATION', 'TEAM_ID', 'TEAM_NAME', 'W', 'MIN'] + list(STATISTICS)
+
+def parse_minutes(minutes:str) -> float:
+    """
+    Converts a box score clock such as '34:12' (or 'PT34M12.00S') into minutes.
+    """
+    if not minutes:
+        return 0.0
+    if minutes.startswith('PT'):
+        minutes = minutes[2:].rstrip('S').replace('M', ':')
+    parts = minutes.split(':')
+    return float(parts[0]) + (float(parts[1]) / 60 if len(parts) > 1 and parts[1] else 0.0)
+
+def box_score_rows(json, date:str) -> tuple:
+    """
+    Given a boxscoretraditionalv3 response, returns the player rows and the
+    team rows of the game, as lists matching [PLAYER_COLUMNS] and
+    [TEAM_COLUMNS], with [date] stored as YYYY-MM-DD. Players who did not play
+    are left out. Statistics the box score does not report are left empty.
+    """
+    date = parse_date(date).strftime('%Y-%m-%d')
+    json = json['boxScoreTraditional']
+    home, road = json['homeTeam'], json['awayTeam']
+    home_win = home['statistics']['points'] > road['statistics']['points']
+
+    player_rows, team_rows = [], []
+    for location, team, win in [('Home', home, home_win), ('Road', road, not home_win)]:
+        stats = team['statistics']
+        team_rows.append([date, json['gameId'], location, team['teamId'], f"{team['teamCity']} {team['teamName']}",
+                          int(win), parse_minutes(stats['minutes']) / 5]
+                         + [stats.get(key) for key in STATISTICS.values()])
+
+        for i, player in enumerate(team['players']):
+            stats = player['statistics']
+            minutes = parse_minutes(stats['minutes'])
+            if minutes == 0:
+                continue
+            player_rows.append([date, json['gameId'], location, team['teamId'], player['personId'],
+                                f"{player['firstName']} {player['familyName']}", player['position'],
+                                int(i < 5), int(win), minutes]
+                               + [stats.get(key) for key in STATISTICS.values()])
+
+    return player_rows, team_rows
+
+class GameLog:
+    """
+    Local store of every player's and team's box score line for a season,
+    filled once from per-game box scores. Stored in data/gamelog/.
+    """
+    def __init__(self, season:str, verbose:bool=True, directory:str=game_log_directory):
+        self.season = season
+        self.directory = directory
+        self.player_path = os.path.join(directory, f"{season}_players.csv")
+        self.team_path = os.path.join(directory, f"{season}_teams.csv")
+        self.logger = Logger("GameLog", enabled=verbose)
+
+        if os.path.exists(self.player_path) and os.path.exists(self.team_path):
+            self.players = pd.read_csv(self.player_path, dtype={'GAME_ID': str})
+            self.teams = pd.read_csv(self.team_path, dtype={'GAME_ID': str})
+        else:
+            self.players = pd.DataFrame(columns=PLAYER_COLUMNS)
+            self.teams = pd.DataFrame(columns=TEAM_COLUMNS)
+
+        self.game_ids = set(self.teams['GAME_ID'])
+        self._pending_players, self._pending_teams = [], []
+
+    def __contains__(self, game_id:str) -> bool:
+        return game_id in self.game_ids
+
+    def add(self, player_rows:list, team_rows:list) -> None:
+        """
+        Adds one game's rows, as returned by [box_score_rows]. Rows are kept
+        in memory until [save] is called.
+        """
+        self._pending_players += player_rows
+        self._pending_teams += team_rows
+        self.game_ids.update(row[1] for row in team_rows)
+
+    def save(self) -> None:
+        """
+        Appends pending rows to the in-memory log and rewrites the store.
+        """
+        if not self._pending_teams:
+            return
+        new_players = pd.DataFrame(self._pending_players, columns=PLAYER_COLUMNS)
+        new_teams = pd.DataFrame(self._pending_teams, columns=TEAM_COLUMNS)
+        self.players = pd.concat([self.players, new_players], ignore_index=True).sort_values(['DATE', 'GAME_ID'], kind='stable')
+        self.teams = pd.concat([self.teams, new_teams], ignore_index=True).sort_values(['DATE', 'GAME_ID'], kind='stable')
+        self._pending_players, self._pending_teams = [], []
+
+        os.makedirs(self.directory, exist_ok=True)
+        self.players.to_csv(self.player_path, index=False)
+        self.teams.to_csv(self.team_path, index=False)
+        self.logger.info(f"Game log saved. Games: {len(self.game_ids)}")
+
+    def starters(self, game_id:str) -> pd.DataFrame:
+        """
+        Returns the home and road team, score and starters of [game_id], in the
+        same layout as [GameScraper.extract]. Returns None if the game is not
+        in the log.
+        """
+        teams = self.teams[self.teams['GAME_ID'] == game_id]
+        if teams.shape[0] != 2:
+            return None
+        players = self.players[(self.players['GAME_ID'] == game_id) & (self.players['STARTER'] == 1)]
+
+        columns = ["LOCATION", "TEAM_ID", "SCORE"] + [f"PLAYER_{i}" for i in range(1, 6)]
+        data = []
+        for location, label in [('Home', 'home'), ('Road', 'away')]:
+            team = teams[teams['LOCATION'] == location].iloc[0]
+            starters = players[players['LOCATION'] == location]
+            starters = sorted(zip(starters['POSITION'], starters['PLAYER_ID']), key=lambda x: ("GFC".index(x[0]), x))
+            if len(starters) != 5:
+                return None
+            data.append([label, team['TEAM_ID'], team['PTS']] + [x[1] for x in starters])
+        return pd.DataFrame(data, columns=columns)
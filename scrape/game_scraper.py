@@ -6,7 +6,8 @@ sys.path.append(parent_directory)
 from collections import defaultdict
 from typing import List
 from parameters.info import id_to_team, team_to_id
-import requests
+from scrape.fetch import fetch
+from scrape.session import PooledSession
 from misc.logger import Logger
 
 class GameScraper:
@@ -15,8 +16,9 @@ class GameScraper:
     team, the five starters.
     """
 
-    def __init__(self, verbose:bool=False):
+    def __init__(self, verbose:bool=False, session:PooledSession=None):
 
+        self.session = session
         self.url = "https://stats.nba.com/stats/boxscoretraditionalv3"
 
         self.payload = {
@@ -36,13 +38,16 @@ class GameScraper:
 
         self.log = Logger("TimeScraper", enabled=verbose, indent=1)
   
-    def unpack_teams(self, game_id:str):
+    def unpack_teams(self, game_id:str, date:str=None):
         """
         Given a game [game_id], returns a dictionary with two keys: the 
+
+        If known, [date] is the day the game was played on, which lets the box
+        score be cached permanently.
         """
       
-        self.payload['GameID'] = game_id
-        response = requests.get(self.url, params=self.payload, headers=self.headers)
+        payload = {**self.payload, 'GameID': game_id} # per call, so threads can share the scraper
+        response = fetch(self.url, params=payload, headers=self.headers, session=self.session, as_of=date)
 
         if response.status_code == 200:
 
@@ -0,0 +1,193 @@
+#!/usr/bin/env python
+import sys, os
+parent_directory = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(parent_directory)
+
+import io
+import csv
+import json
+from misc.logger import Logger
+
+file_directory = os.path.dirname(__file__)
+data_directory = os.path.join(file_directory, '../data/')
+
+def _sync(file) -> None:
+    file.flush()
+    os.fsync(file.fileno())
+
+def read_header(path:str) -> list:
+    """
+    Returns the column names of the CSV at [path], or None if it does not exist
+    or is empty.
+    """
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return None
+    with open(path, 'r', newline='') as file:
+        return next(csv.reader(file), None)
+
+def read_last_row(path:str) -> dict:
+    """
+    Returns the last row of the CSV at [path] as a dictionary, reading only the
+    end of the file. Returns None if there are no rows.
+    """
+    header = read_header(path)
+    if header is None:
+        return None
+    with open(path, 'rb') as file:
+        file.seek(0, os.SEEK_END)
+        size = file.tell()
+        block = min(size, 1 << 16)
+        while True:
+            file.seek(size - block)
+            lines = file.read(block).rstrip(b'\r\n').split(b'\n')
+            if len(lines) > 1 or block == size:
+                break
+            block = min(size, block * 2)
+    last = next(csv.reader(io.StringIO(lines[-1].decode('utf-8'))))
+    if last == header:
+        return None
+    return dict(zip(header, last))
+
+class Journal:
+    """
+    Append-only checkpoint journal for a season file [target] in data/.
+
+    Rows are appended to '<target>.journal' as each date completes, followed by
+    a commit record in '<target>.journal.log' with the date, the last game and
+    the journal size. Both are flushed to disk before the next date starts, so a
+    crash loses at most the date in progress. Rows written after the last
+    commit are discarded when the journal is reopened.
+
+    [compact] moves the committed rows to the end of [target] without
+    rewriting it. A marker holding the original size of [target] makes an
+    interrupted compaction safe to repeat.
+    """
+    def __init__(self, target:str, directory:str=data_directory, verbose:bool=True):
+        self.target = os.path.join(directory, target)
+        self.rows_path = self.target + '.journal'
+        self.log_path = self.target + '.journal.log'
+        self.marker_path = self.target + '.compacting'
+        self.logger = Logger("Journal", enabled=verbose)
+        self.commits = self._read_commits()
+        self._recover()
+
+    def _read_commits(self) -> list:
+        commits = []
+        if os.path.exists(self.log_path):
+            with open(self.log_path, 'r') as file:
+                for line in file:
+                    try:
+                        commits.append(json.loads(line))
+                    except json.JSONDecodeError: # torn final record
+                        break
+        return commits
+
+    def _recover(self) -> None:
+        """
+        Rolls back an interrupted compaction and truncates rows written after
+        the last commit.
+        """
+        if os.path.exists(self.marker_path):
+            if os.path.exists(self.rows_path):
+                with open(self.marker_path, 'r') as file:
+                    size = int(file.read())
+                self.logger.warn("Rolling back an interrupted compaction.")
+                with open(self.target, 'r+b') as file:
+                    file.truncate(size)
+            os.remove(self.marker_path)
+
+        committed = self.commits[-1]['offset'] if self.commits else 0
+        if os.path.exists(self.rows_path) and os.path.getsize(self.rows_path) > committed:
+            self.logger.warn("Discarding uncommitted journal rows from an interrupted run.")
+            with open(self.rows_path, 'r+b') as file:
+                file.truncate(committed)
+
+    def last_commit(self) -> dict:
+        """
+        Returns the last commit record: {'date', 'game_id', 'rows', 'offset'},
+        or None if nothing was committed since the last compaction.
+        """
+        return self.commits[-1] if self.commits else None
+
+    def last_position(self) -> tuple:
+        """
+        Returns the (date, game ID) of the last saved game, from the journal if
+        it has commits, otherwise from the last row of [target]. Returns
+        (None, None) if nothing was saved.
+        """
+        for commit in reversed(self.commits):
+            if commit['game_id'] is not None:
+                return commit['date'], commit['game_id']
+        row = read_last_row(self.target)
+        if row is None:
+            return None, None
+        return row.get('DATE'), row.get('GAME_ID')
+
+    def last_date(self) -> str:
+        """
+        Returns the last date known to be complete, or None.
+        """
+        if self.commits:
+            return self.commits[-1]['date']
+        return self.last_position()[0]
+
+    def commit(self, date:str, rows:list, columns:list) -> None:
+        """
+        Appends the [rows] of [date], all of its games, and records the commit.
+        Dates without games are committed too, so they are not retried.
+        """
+        offset = self.commits[-1]['offset'] if self.commits else 0
+        if rows:
+            header = read_header(self.rows_path) or read_header(self.target)
+            if header is not None and list(header) != list(columns):
+                raise ValueError(f"Columns do not match existing data for {self.target}")
+
+            with open(self.rows_path, 'a', newline='') as file:
+                writer = csv.writer(file, lineterminator='\n')
+                if file.tell() == 0:
+                    writer.writerow(columns)
+                writer.writerows(rows)
+                _sync(file)
+                offset = file.tell()
+
+        record = {'date': date, 'game_id': str(rows[-1][columns.index('GAME_ID')]) if rows else None,
+                  'rows': len(rows), 'offset': offset}
+        with open(self.log_path, 'a') as file:
+            file.write(json.dumps(record) + '\n')
+            _sync(file)
+        self.commits.append(record)
+
+    def compact(self) -> int:
+        """
+        Appends every committed row to [target] and clears the journal. Costs
+        O(rows in the journal). Returns the number of rows moved.
+        """
+        if not os.path.exists(self.rows_path) or os.path.getsize(self.rows_path) == 0:
+            self.logger.info("Nothing to compact.")
+            return 0
+
+        with open(self.rows_path, 'r', newline='') as source:
+            header = next(csv.reader(source))
+            body = source.read()
+
+        existing = read_header(self.target)
+        if existing is not None and existing != header:
+            raise ValueError(f"Columns do not match existing data for {self.target}")
+
+        with open(self.marker_path, 'w') as file:
+            file.write(str(os.path.getsize(self.target) if os.path.exists(self.target) else 0))
+            _sync(file)
+
+        with open(self.target, 'a', newline='') as file:
+            if existing is None:
+                csv.writer(file, lineterminator='\n').writerow(header)
+            file.write(body)
+            _sync(file)
+
+        rows = sum(commit['rows'] for commit in self.commits)
+        os.remove(self.rows_path)
+        os.remove(self.log_path)
+        os.remove(self.marker_path)
+        self.commits = []
+        self.logger.info(f"Compacted {rows} rows into {os.path.basename(self.target)}.")
+        return rows
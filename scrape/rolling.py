@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+import sys, os
+parent_directory = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(parent_directory)
+
+import numpy as np
+import pandas as pd
+from datetime import timedelta
+from scrape.game_log import GameLog, STATISTICS
+from scrape.cache import parse_date
+
+# Totals accumulated per player/team; per-game values are derived from these.
+TOTALS = ['GP', 'W', 'MIN'] + list(STATISTICS)
+
+# Percentages are recomputed from the made/attempted totals, like stats.nba.com.
+PERCENTAGES = {
+    'FG_PCT': ('FGM', 'FGA'),
+    'FG3_PCT': ('FG3M', 'FG3A'),
+    'FT_PCT': ('FTM', 'FTA'),
+    'W_PCT': ('W', 'GP'),
+}
+
+class RollingFeatures:
+    """
+    Computes the per-game player and team aggregates that [PlayerScraper] and
+    [TeamScraper] would return, from a local [GameLog] instead of the network.
+
+    Every aggregate is the difference of two prefix sums: the running totals
+    just before the date, minus the running totals just before the start of the
+    window.
+    """
+    def __init__(self, game_log:GameLog, window:int=21):
+        self.game_log = game_log
+        self.window = window
+        self._prefixes = {}
+
+    def _prefix(self, kind:str, location:str) -> pd.DataFrame:
+        """
+        Running totals per player (or team), one row per game played, sorted by
+        date. Cached per [kind] and [location].
+        """
+        key = (kind, location)
+        if key not in self._prefixes:
+            log = self.game_log.players if kind == 'player' else self.game_log.teams
+            id_col = 'PLAYER_ID' if kind == 'player' else 'TEAM_ID'
+            name_col = 'PLAYER_NAME' if kind == 'player' else 'TEAM_NAME'
+            if location:
+                log = log[log['LOCATION'] == location]
+
+            log = log.sort_values('DATE', kind='stable').assign(GP=1)
+            keep = [id_col, name_col, 'DATE'] + (['TEAM_ID'] if kind == 'player' else [])
+            totals = log[TOTALS].astype(float).fillna(0).groupby(log[id_col]).cumsum()
+            self._prefixes[key] = pd.concat([log[keep], totals], axis=1).reset_index(drop=True)
+        return self._prefixes[key]
+
+    def _totals_before(self, prefix:pd.DataFrame, id_col:str, date:str) -> pd.DataFrame:
+        """
+        Running totals of every id over all games strictly before [date].
+        """
+        return prefix[prefix['DATE'] < date].drop_duplicates(id_col, keep='last').set_index(id_col)
+
+    def unreported(self) -> list:
+        """
+        Statistics the box scores of the game log do not report: empty for
+        every player and team.
+        """
+        return [column for column in STATISTICS
+                if self.game_log.players[column].isna().all() and self.game_log.teams[column].isna().all()]
+
+    def snapshot(self, kind:str, date:str, location:str='', window:int=None, features:list=None) -> pd.DataFrame:
+        """
+        Returns per-game averages of every player ([kind] = 'player') or team
+        ([kind] = 'team') over the games before [date], indexed by id.
+
+        [window] is the number of days covered, defaulting to [self.window];
+        0 covers the season to date. [location] is 'Home', 'Road' or '' for
+        both. If [features] is given, only those columns are returned, in that
+        order. Columns the game log cannot provide are left empty.
+        """
+        window = self.window if window is None else window
+        id_col = 'PLAYER_ID' if kind == 'player' else 'TEAM_ID'
+        prefix = self._prefix(kind, location)
+
+        day = parse_date(date)
+        end = self._totals_before(prefix, id_col, day.strftime('%Y-%m-%d'))
+        sums = end[TOTALS]
+        if window:
+            start = self._totals_before(prefix, id_col, (day - timedelta(days=window)).strftime('%Y-%m-%d'))
+            sums = sums.sub(start[TOTALS].reindex(sums.index, fill_value=0))
+        active = sums['GP'] > 0
+        sums, end = sums[active], end[active]
+
+        df = sums.div(sums['GP'], axis=0).round(1).drop(columns='W')
+        df['GP'] = sums['GP'].astype(int)
+        for column, (made, attempted) in PERCENTAGES.items():
+            with np.errstate(divide='ignore', invalid='ignore'):
+                df[column] = np.where(sums[attempted] > 0, sums[made] / sums[attempted], 0.0).round(3)
+
+        log = self.game_log.players if kind == 'player' else self.game_log.teams
+        missing = [column for column in STATISTICS if log[column].isna().all()]
+        df[missing] = np.nan # not reported by the box score
+
+        df = pd.concat([end.drop(columns=TOTALS + ['DATE']), df], axis=1)
+        df.insert(0, id_col, df.index)
+        if features:
+            df = df.reindex(columns=features)
+        return df
@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+import sys, os
+parent_directory = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(parent_directory)
+
+import json
+import tempfile
+from datetime import datetime, timedelta
+from parameters.info import seasons
+from scrape.cache import parse_date
+from scrape.time_scraper import TimeScraper
+from scrape.session import PooledSession
+from misc.logger import Logger
+
+file_directory = os.path.dirname(__file__)
+schedule_directory = os.path.join(file_directory, '../data/schedule/')
+
+ISO_FORMAT = '%Y-%m-%d'
+
+class Schedule:
+    """
+    Persisted index of a season's games, stored in data/schedule/<season>.json:
+    date -> sorted game IDs, and game ID -> (date, home team ID, road team ID).
+
+    Past days are looked up once, ever; today and later days are looked up
+    again when needed since their schedule may still change. Generation then
+    only visits days with games.
+    """
+    def __init__(self, season:str, verbose:bool=True, session:PooledSession=None, directory:str=schedule_directory):
+        self.season = season
+        self.directory = directory
+        self.path = os.path.join(directory, f"{season}.json")
+        self.time_scraper = TimeScraper(verbose=verbose, session=session)
+        self.logger = Logger("Schedule", enabled=verbose)
+
+        self.dates, self.games, self.scanned = {}, {}, set()
+        if os.path.exists(self.path):
+            with open(self.path, 'r') as file:
+                data = json.load(file)
+            self.dates = data['dates']
+            self.games = {game_id: tuple(info) for game_id, info in data['games'].items()}
+            self.scanned = set(data['scanned'])
+
+    def save(self) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        data = {'dates': self.dates, 'games': self.games, 'scanned': sorted(self.scanned)}
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as file:
+            json.dump(data, file)
+        os.replace(tmp, self.path)
+
+    def build(self, start_date:str=None, end_date:str=None) -> None:
+        """
+        Looks up every day from [start_date] to [end_date] (the season's dates
+        in [parameters/info.py] by default) that has not been looked up yet.
+        """
+        start = parse_date(start_date or seasons[self.season]['startDate'])
+        end = parse_date(end_date or seasons[self.season]['endDate'])
+        today = datetime.today().strftime(ISO_FORMAT)
+
+        changed = False
+        day = start
+        while day <= end:
+            iso = day.strftime(ISO_FORMAT)
+            if iso not in self.scanned:
+                games = self.time_scraper.games(day.strftime('%m/%d/%Y'))
+                if games is not None:
+                    if games:
+                        self.dates[iso] = [game[0] for game in games]
+                    else:
+                        self.dates.pop(iso, None)
+                    for game_id, home, road in games:
+                        self.games[game_id] = (iso, home, road)
+                    if iso < today: # future schedules may still change
+                        self.scanned.add(iso)
+                    changed = True
+            day += timedelta(days=1)
+
+        if changed:
+            self.save()
+            self.logger.info(f"Schedule for {self.season} indexed. Game days: {len(self.dates)}, games: {len(self.games)}")
+
+    def game_days(self, start_date:str, end_date:str, date_format:str='%m/%d/%Y') -> list:
+        """
+        Returns every day from [start_date] to [end_date], inclusive, on which
+        games were played, formatted with [date_format].
+        """
+        self.build(start_date, end_date)
+        start = parse_date(start_date).strftime(ISO_FORMAT)
+        end = parse_date(end_date).strftime(ISO_FORMAT)
+        return [datetime.strptime(iso, ISO_FORMAT).strftime(date_format)
+                for iso in sorted(self.dates) if start <= iso <= end]
+
+    def games_on(self, date:str) -> list:
+        """
+        Returns the sorted game IDs played on [date].
+        """
+        iso = parse_date(date).strftime(ISO_FORMAT)
+        if iso not in self.scanned and iso not in self.dates:
+            self.build(date, date)
+        return list(self.dates.get(iso, []))
+
+    def date_of(self, game_id:str, date_format:str=ISO_FORMAT) -> str:
+        """
+        Returns the date [game_id] was played on, or None if it is unknown.
+        """
+        if game_id not in self.games:
+            return None
+        return datetime.strptime(self.games[game_id][0], ISO_FORMAT).strftime(date_format)
+
+    def teams_of(self, game_id:str) -> tuple:
+        """
+        Returns the (home team ID, road team ID) of [game_id].
+        """
+        return self.games[game_id][1:]
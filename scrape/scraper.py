@@ -4,13 +4,23 @@ parent_directory = os.path.abspath(os.path.join(os.path.dirname(__file__), '..')
 sys.path.append(parent_directory)
 
 from abc import ABC, abstractmethod
-import requests
+import asyncio
+import numpy as np
 import pandas as pd
 from misc.logger import Logger
+from scrape.fetch import fetch, flight
+from scrape.session import PooledSession, get_session
+from scrape.cache import CachedResponse
+from scrape.decode import ColumnarTable
+from data.schema import scrape_dtypes
+from data.validate import validate
+from scrape.game_log import GameLog, box_score_rows
+from scrape.rolling import RollingFeatures
+from scrape.journal import Journal, read_header
+from scrape.schedule import Schedule
 import json
 from parameters.info import seasons, id_to_team
 from datetime import datetime, timedelta
-import time
 import traceback
 
 file_directory = os.path.dirname(__file__)
@@ -18,9 +28,10 @@ data_directory = os.path.join(file_directory, '../data/')
 
 class Scraper(ABC):
     """
-    A generic scraper class
+    A generic scraper class. Requests go over [session], the shared pooled
+    session by default.
     """
-    def __init__(self, log_name="Scraper", verbose=True, required_fields=[], **kwargs):
+    def __init__(self, log_name="Scraper", verbose=True, required_fields=[], session:PooledSession=None, **kwargs):
         self.url = ""
         self.payload = {key: str(value) for key, value in kwargs.items()}
         self.headers= {
@@ -28,6 +39,7 @@ class Scraper(ABC):
             'Referer': 'https://www.nba.com/'
         }
         self.required_fields = required_fields
+        self.session = session
         self.logger = Logger(log_name, enabled=verbose, indent=1)
         
     def validate(self, **kwargs) -> True:
@@ -43,12 +55,15 @@ class Scraper(ABC):
             return False
         return True
     
-    def get_request(self, **kwargs) -> requests.Response:
+    def get_request(self, as_of:str=None, **kwargs) -> CachedResponse:
         """
-        Updates necessary values in [self.payload] and gets the request.
+        Builds the payload for this call from [self.payload] and [kwargs] and
+        gets the request. [self.payload] is left untouched, so concurrent calls
+        on the same scraper do not interfere with each other. [as_of] is the
+        date the request is about, used by the response cache.
         """
-        self.payload.update(kwargs)
-        return requests.get(self.url, params=self.payload, headers=self.headers)
+        payload = {**self.payload, **kwargs}
+        return fetch(self.url, params=payload, headers=self.headers, as_of=as_of, session=self.session)
     
     @abstractmethod
     def extract(self, json, **kwargs) -> pd.DataFrame:
@@ -57,9 +72,10 @@ class Scraper(ABC):
         data frame.
         """
 
-    def forward(self, t:int = 1, **kwargs):
+    def forward(self, **kwargs):
         """
-        Gets the request.
+        Gets the request. Throttling and retries are handled by the shared rate
+        limiter.
         Common keyword options: DateFrom, DateTo, Location
         """
         
@@ -68,19 +84,57 @@ class Scraper(ABC):
             raise Exception("Missing Required Keywords")
             
         response = self.get_request(**kwargs)
-        time.sleep(t)
         if response.status_code == 200:
             return self.extract(response.json(), **kwargs)
 
         else:
             raise Exception(f"HTTP Error - {response.status_code}")
 
+    async def aforward(self, semaphore:asyncio.Semaphore = None, **kwargs):
+        """
+        Asynchronous counterpart of [forward]. The blocking request runs in a
+        worker thread; if [semaphore] is given, the request holds one of its
+        slots.
+        """
+        if not self.validate(**kwargs):
+            self.logger.fail("Missing Required Keywords.")
+            raise Exception("Missing Required Keywords")
+
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(1)
+
+        async with semaphore:
+            response = await asyncio.to_thread(self.get_request, **kwargs)
+
+        if response.status_code == 200:
+            return self.extract(response.json(), **kwargs)
+
+        else:
+            raise Exception(f"HTTP Error - {response.status_code}")
+
+async def gather_forward(calls:list, concurrency:int = 8, return_exceptions:bool = False) -> list:
+    """
+    Runs every [(scraper, kwargs)] pair in [calls] through [Scraper.aforward],
+    with at most [concurrency] requests in flight at once. Results are returned
+    in the same order as [calls]. If [return_exceptions], failed calls return
+    their exception instead of cancelling the rest.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    tasks = [scraper.aforward(semaphore=semaphore, **kwargs) for scraper, kwargs in calls]
+    return await asyncio.gather(*tasks, return_exceptions=return_exceptions)
+
+def run_forward(calls:list, concurrency:int = 8, return_exceptions:bool = False) -> list:
+    """
+    Blocking wrapper around [gather_forward] for synchronous callers.
+    """
+    return asyncio.run(gather_forward(calls, concurrency, return_exceptions))
+
 class PlayerScraper(Scraper):
     """
     Obtains the stats of all players.
     """
-    def __init__(self, verbose=True):
-        super().__init__("PlayScraper", verbose, required_fields=['Season'])
+    def __init__(self, verbose=True, session:PooledSession=None):
+        super().__init__("PlayScraper", verbose, required_fields=['Season'], session=session)
         self.url = "https://stats.nba.com/stats/leaguedashplayerstats"
         self.payload = {
             'LastNGames': '0',
@@ -100,31 +154,31 @@ class PlayerScraper(Scraper):
             'TeamID': '0',
         }
     
-    def extract(self, json, **kwargs):
-        headers = json['resultSets'][0]['headers']
-        rows = json['resultSets'][0]['rowSet']
-
-        df = pd.DataFrame(rows, columns=headers)
+    def extract(self, json, **kwargs) -> ColumnarTable:
+        """
+        Decodes the league-wide player table, keeping only the [features]
+        columns (all of them by default), indexed by PLAYER_ID. Use
+        [ColumnarTable.to_frame] for a pandas view.
+        """
+        result_set = json['resultSets'][0]
+        features = kwargs.get('features', result_set['headers'])
+        table = ColumnarTable.decode(result_set, features, 'PLAYER_ID', scrape_dtypes(features))
 
-        if 'features' in kwargs: # filters columns
-            df = df[kwargs['features']]
-        
-        df.set_index('PLAYER_ID', inplace=True, drop=False)
         d_to = kwargs["DateTo"]
         if "DateFrom" in kwargs and len(kwargs["DateFrom"]) > 0:
             d_from = kwargs["DateFrom"]
-            self.logger.info(f"Extracted player statistics from {d_from} to {d_to}. Players: {df.shape[0]}")
+            self.logger.info(f"Extracted player statistics from {d_from} to {d_to}. Players: {len(table)}")
         else:
-            self.logger.info(f"Extracted player statistics from start to {d_to}. Players: {df.shape[0]}")
-        return df
+            self.logger.info(f"Extracted player statistics from start to {d_to}. Players: {len(table)}")
+        return table
 
 class TeamScraper(Scraper):
     """
     Retrieves the stats of a specific team.
     Common keyword options: DateFrom, DateTo, Location
     """
-    def __init__(self, verbose=True):
-        super().__init__("TeamScraper", verbose=verbose, required_fields=['Season'])
+    def __init__(self, verbose=True, session:PooledSession=None):
+        super().__init__("TeamScraper", verbose=verbose, required_fields=['Season'], session=session)
         self.url = 'https://stats.nba.com/stats/leaguedashteamstats'
         self.payload = {
             'LastNGames': '0',
@@ -145,19 +199,18 @@ class TeamScraper(Scraper):
             'TwoWay': '0'
         }
     
-    def extract(self, json, **kwargs):
-        headers = json['resultSets'][0]['headers']
-        rows = json['resultSets'][0]['rowSet']
+    def extract(self, json, **kwargs) -> ColumnarTable:
+        """
+        Decodes the league-wide team table, keeping only the [features]
+        columns (all of them by default), indexed by TEAM_ID.
+        """
+        result_set = json['resultSets'][0]
+        features = kwargs.get('features', result_set['headers'])
+        table = ColumnarTable.decode(result_set, features, 'TEAM_ID', scrape_dtypes(features))
 
-        df = pd.DataFrame(rows, columns=headers)
-        
-        if 'features' in kwargs: # filters columns
-            df = df[kwargs['features']]
-        
-        df.set_index('TEAM_ID', inplace=True, drop=False)
         d_to, d_from = kwargs["DateTo"], kwargs["DateFrom"]
-        self.logger.info(f"Extracted team statistics from {d_from} to {d_to}. Teams: {df.shape[0]}", carriage=True)
-        return df
+        self.logger.info(f"Extracted team statistics from {d_from} to {d_to}. Teams: {len(table)}", carriage=True)
+        return table
 
 class GameScraper(Scraper):
     """
@@ -165,8 +218,8 @@ class GameScraper(Scraper):
     and away team stats / player starter stats.
     """
 
-    def __init__(self, verbose=True):
-        super().__init__("GameScraper", verbose=verbose, required_fields=["GameID"])
+    def __init__(self, verbose=True, session:PooledSession=None):
+        super().__init__("GameScraper", verbose=verbose, required_fields=["GameID"], session=session)
         self.url = "https://stats.nba.com/stats/boxscoretraditionalv3"
         self.payload = {
             'GameID': '0022300445',
@@ -195,12 +248,25 @@ class GameScraper(Scraper):
         df = pd.DataFrame(data, columns=columns)
         return df
         
+class GameLogScraper(GameScraper):
+    """
+    Given a game ID, returns the box score line of every player who played and
+    of both teams, for the local [GameLog].
+    """
+
+    def __init__(self, verbose=True, session:PooledSession=None):
+        super().__init__(verbose=verbose, session=session)
+        self.required_fields = ["GameID", "as_of"]
+
+    def extract(self, json, **kwargs):
+        return box_score_rows(json, kwargs["as_of"])
+
 class TimeScraper(Scraper):
     """
     Given a date, returns all game ids that happened that day.
     """
-    def __init__(self, verbose=True):
-        super().__init__("TimeScraper", verbose=verbose, required_fields=["gamedate"])
+    def __init__(self, verbose=True, session:PooledSession=None):
+        super().__init__("TimeScraper", verbose=verbose, required_fields=["gamedate"], session=session)
         self.url = "https://core-api.nba.com/cp/api/v1.3/feeds/gamecardfeed"
         self.payload = {
             "gamedate": "01/02/2024",
@@ -235,229 +301,278 @@ class SeasonScraper():
     """
     Scrape all data from a season. The season links to '2023-24.csv' in the data
     folder.
+
+    [window] is the length in days of the recent stats window. If [local], the
+    league-wide stats are computed from a local game log of box scores instead
+    of being requested for every date. Everything is stored under [directory],
+    the data folder by default.
     """
 
-    def __init__(self, season='2023-24', verbose=True):
+    def __init__(self, season='2023-24', verbose=True, concurrency:int=8, window:int=21, local:bool=False,
+                 session:PooledSession=None, directory:str=data_directory):
         with open(os.path.join(parent_directory, 'parameters/features.json'), 'r') as file:
             features = json.load(file)
         self.player_features = features['player_features']
         self.team_features = features['team_features']
         self.season = season
-        self.destination = os.path.join(data_directory, f"{season}.csv")
-
-        self.time_scraper = TimeScraper(verbose)
-        self.game_scraper = GameScraper(verbose)
-        self.team_scraper = TeamScraper(verbose)
-        self.player_scraper = PlayerScraper(verbose)
+        self.concurrency = concurrency # maximum number of requests in flight per date
+        self.window = window
+        self.local = local
+        self.destination = os.path.join(directory, f"{season}.csv")
+
+        self.session = session or get_session()
+        self.schedule = Schedule(season, verbose, self.session, os.path.join(directory, 'schedule/'))
+        self.game_scraper = GameScraper(verbose, self.session)
+        self.team_scraper = TeamScraper(verbose, self.session)
+        self.player_scraper = PlayerScraper(verbose, self.session)
         self.logger = Logger("SeasonScraper")
 
-        self.home_player_cols, self.away_player_cols = [], []
-        self.home_team_cols, self.away_team_cols = [], []
+        if local:
+            self.game_log_scraper = GameLogScraper(verbose, self.session)
+            self.game_log = GameLog(season, verbose, os.path.join(directory, 'gamelog/'))
+            self.rolling = RollingFeatures(self.game_log, window)
 
         # Check if loaded values already exist
-        if os.path.exists(self.destination):
-            self.df = pd.read_csv(self.destination, dtype={'GAME_ID': str})
-            self.logger.info(f"Existing file found. Games: {self.df.shape[0]}, Last Date:")
-        else:
-            self.df = pd.DataFrame()
+        self.journal = Journal(f"{season}.csv", directory=directory, verbose=verbose)
+        last_date, _ = self.journal.last_position()
+        if last_date is not None:
+            self.logger.info(f"Existing data found. Last Date: {last_date}")
 
-    def get_player_values(self, ids, df:pd.DataFrame, df_full:pd.DataFrame, df_general:pd.DataFrame,
-                          columns_list:list=[], location:str="") -> list:
+    def resolve(self, home_tables:list, away_tables:list) -> tuple:
         """
-        Given the id of a player, find the features that match in [df]. If not
-        found, find in [df_full]. If not, find in [df_general], which should
-        always be guaranteed.
-
-        If columns_list is initially empty, the list with the column values
-        in-place to [columns_list]. This value is not returned.
-
-        Throws an exception if one player is not found.
+        Coalesces the stats tiers of a date into one table per location.
+        [home_tables] and [away_tables] list the tiers from most to least
+        preferred: the recent window, the season at that location and the
+        locationless season. For every id the first tier that has it wins; the
+        table's [tiers] record which one (0, 1 or 2).
         """
+        return ColumnarTable.coalesce(home_tables), ColumnarTable.coalesce(away_tables)
 
-        lst = []
-
-        populate = not columns_list
-        for player in [f'PLAYER_{i}' for i in range(1, 6)]:
-            if populate:
-                assert location != ""
-                cols = df.columns.tolist()
-                cols = list(map(lambda x : f"{location.upper()}_{player}_{x}", cols))
-                columns_list += cols
-            
-            player_id = ids[player]
-
-            # Goes through each 'cache' and looks for the most recent stats.
-            if player_id in df.index: # past 3 weeks stats
-                lst += df.loc[player_id].tolist()
-
-            elif player_id in df_full.index: # stats from start of season
-                self.logger.warn(f"{player_id} extracted from beginning of season database.")
-                lst += df_full.loc[player_id].tolist()
-
-            elif player_id in df_general.index: # start of season + location invariant
-                self.logger.warn(f"{player_id} extracted from beginning of season, locationless database.")
-                lst += df_general.loc[player_id].tolist()
+    def gather(self, tables:tuple, values:np.ndarray, home_ids:list, away_ids:list) -> np.ndarray:
+        """
+        Looks up every id of [home_ids] and [away_ids] in the resolved home and
+        away [tables] and returns their rows of [values], the two tables'
+        matrices stacked, home ids first. Returns None if any id is missing
+        from every tier.
+        """
+        home, away = tables
+        home_positions, away_positions = home.positions(home_ids), away.positions(away_ids)
+        keys = list(home_ids) + list(away_ids)
+        tiers = np.concatenate([home.tiers[home_positions], away.tiers[away_positions]])
+        positions = np.concatenate([home_positions, np.where(away_positions < 0, -1, away_positions + len(home))])
+        if (positions < 0).any():
+            missing = [key for key, position in zip(keys, positions) if position < 0]
+            self.logger.fail(f"{missing} not found at all. Skipping...")
+            return None
+
+        for i, tier in zip(keys, tiers):
+            if tier == 1:
+                self.logger.warn(f"{i} extracted from beginning of season database.")
+            elif tier == 2:
+                self.logger.warn(f"{i} extracted from beginning of season, locationless database.")
+        return values[positions]
+
+    def local_snapshot(self, scraper:Scraper, date:str, DateFrom:str, Location:str, features:list, **kwargs) -> ColumnarTable:
+        """
+        Computes from the game log the snapshot that [scraper] would return for
+        the same keywords.
+        """
+        kind = 'player' if scraper is self.player_scraper else 'team'
+        window = self.window if DateFrom else 0
+        df = self.rolling.snapshot(kind, date, location=Location, window=window, features=features)
+        return ColumnarTable.from_frame(df, 'PLAYER_ID' if kind == 'player' else 'TEAM_ID')
 
-            else:
-                # for i in df_full.index[10:50]:
-                #     print(i)
-                self.logger.fail(f"Player {player_id} not found at all. Skipping...")
-                return []
-        return lst
-    
-    def get_team_values(self, ids, df:pd.DataFrame, df_full:pd.DataFrame, df_general:pd.DataFrame,
-                            columns_list:list=[], location:str="") -> list:
+    def fill_game_log(self, start_date:str, end_date:str) -> None:
+        """
+        Adds the box score of every game from [start_date] to [end_date] that
+        is not yet in the game log. Only one request per game is ever made.
         """
-        Given the ids of a team, extract the features and labels (score) of the
-        team.
+        try:
+            for date in self.schedule.game_days(start_date, end_date):
+                games = [game_id for game_id in self.schedule.games_on(date) if game_id not in self.game_log]
+                calls = [(self.game_log_scraper, dict(GameID=game_id, as_of=date)) for game_id in games]
+                for game_id, rows in zip(games, run_forward(calls, concurrency=self.concurrency, return_exceptions=True)):
+                    if isinstance(rows, BaseException):
+                        self.logger.fail(f"Failed to obtain game {game_id} box score. Known reasons include postponement.")
+                        continue
+                    self.game_log.add(*rows)
+        finally:
+            self.game_log.save()
 
-        If columns_list is initially empty, the list with the column values
-        in-place to [columns_list]. This value is not returned.
+    def scrape_date(self, date:str, games:list) -> list:
         """
-        lst = []
-        
-        if not columns_list:
-            assert location != ""
-            cols = df.columns.tolist()
-            cols = list(map(lambda x : f"{location.upper()}_{x}", cols)) # Append the features
-            columns_list += cols
-            columns_list.append("SCORE") # Score - TODO: maybe must be different for daily games without score/testing?
-
-        team_id = ids["TEAM_ID"]
-        if team_id in df.index:
-            lst += df.loc[team_id].tolist()
-        
-        elif team_id in df_full.index:
-            self.logger.warn(f"Team {team_id} extracted from beginning of season database.")
-            lst += df_full.loc[team_id].tolist()
-            
-        elif team_id in df_general.index:
-            self.logger.warn(f"Team {team_id} extracted from beginning of season, locationless database.")
-            lst += df_general.loc[team_id].tolist()
-        
+        Scrapes every game in [games] played on [date] and returns their rows.
+        The ten league-wide snapshots and every game's box score do not depend
+        on one another, so they are all requested concurrently.
+        """
+        # Obtain the start and end dates for webscraping
+        date_format = '%m/%d/%Y'
+        date_object = datetime.strptime(date, date_format)
+        yesterday_obj = date_object - timedelta(days=1) # end date is yesterday
+        start_obj = date_object - timedelta(days=self.window)
+        end_date = yesterday_obj.strftime(date_format)
+        start_date = start_obj.strftime(date_format)
+
+        self.logger.info("[RETRIEVING GAMES...]\n")
+
+        snapshot_calls = [
+            # All 6 webscraping dataframes: player and team from [start] to [end_date]
+            (self.team_scraper, dict(DateFrom=start_date, DateTo=end_date, Location='Road', features=self.team_features, Season=self.season, as_of=date)),
+            (self.player_scraper, dict(DateFrom=start_date, DateTo=end_date, Location='Road', features=self.player_features, Season=self.season, as_of=date)),
+            (self.team_scraper, dict(DateFrom=start_date, DateTo=end_date, Location='Home', features=self.team_features, Season=self.season, as_of=date)),
+            (self.player_scraper, dict(DateFrom=start_date, DateTo=end_date, Location='Home', features=self.player_features, Season=self.season, as_of=date)),
+
+            # 3 player reserves: away/home counterparts since the beginning of the season, and locationless since the beginning
+            (self.player_scraper, dict(DateFrom='', DateTo=end_date, Location='Road', features=self.player_features, Season=self.season, as_of=date)),
+            (self.player_scraper, dict(DateFrom='', DateTo=end_date, Location='Home', features=self.player_features, Season=self.season, as_of=date)),
+            (self.player_scraper, dict(DateFrom='', DateTo=end_date, Location='', features=self.player_features, Season=self.season, as_of=date)),
+
+            # 3 team reserves similarly above
+            (self.team_scraper, dict(DateFrom='', DateTo=end_date, Location='Road', features=self.team_features, Season=self.season, as_of=date)),
+            (self.team_scraper, dict(DateFrom='', DateTo=end_date, Location='Home', features=self.team_features, Season=self.season, as_of=date)),
+            (self.team_scraper, dict(DateFrom='', DateTo=end_date, Location='', features=self.team_features, Season=self.season, as_of=date)),
+        ]
+        game_calls = [(self.game_scraper, dict(GameID=game_id, as_of=date)) for game_id in games]
+
+        if self.local:
+            snapshots = [self.local_snapshot(scraper, date, **kwargs) for scraper, kwargs in snapshot_calls]
+            box_scores = [self.game_log.starters(game_id) for game_id in games]
+            box_scores = [TypeError() if box_score is None else box_score for box_score in box_scores]
         else:
-            self.logger.fail(f"Team not found at all (how did this happen?). Skipping...")
-            return []
-            
-        lst.append(ids["SCORE"])
-        assert(len(columns_list) == len(lst))
-        return lst
-    
-    def _generate_dates(self, start_date:str, end_date:str) -> list:
+            results = run_forward(snapshot_calls + game_calls, concurrency=self.concurrency, return_exceptions=True)
+            snapshots, box_scores = results[:len(snapshot_calls)], results[len(snapshot_calls):]
+
+        # a missing snapshot invalidates the whole date
+        for snapshot in snapshots:
+            if isinstance(snapshot, BaseException):
+                raise snapshot
+
+        team_away, player_away, team_home, player_home, \
+            player_away_full, player_home_full, player_general, \
+            team_away_full, team_home_full, team_general = snapshots
+        print()
+
+        # Resolve the fallback tiers once for the whole date
+        players = self.resolve([player_home, player_home_full, player_general], [player_away, player_away_full, player_general])
+        teams = self.resolve([team_home, team_home_full, team_general], [team_away, team_away_full, team_general])
+        player_values = np.concatenate([table.matrix(self.player_features) for table in players])
+        team_values = np.concatenate([table.matrix(self.team_features) for table in teams])
+        starters = [f'PLAYER_{i}' for i in range(1, 6)]
+
+        self.logger.info("[EXTRACTING GAMES...]\n")
+        rows = []
+        for game_id, teams_ids in zip(games, box_scores):
+
+            # checkpoint 1: some games were postponed/cancelled.
+            if isinstance(teams_ids, TypeError):
+                self.logger.fail(f"Failed to obtain game {game_id} attributes. Known reasons include postponement.")
+                continue
+            elif isinstance(teams_ids, BaseException):
+                raise teams_ids
+
+            # checkpoint 2: some special games with teams outside the 30 are skipped.
+            if teams_ids.loc[1]['TEAM_ID'] not in id_to_team or teams_ids.loc[1]['TEAM_ID'] not in id_to_team:
+                self.logger.warn("Skipping game - invalid team found.")
+                continue
+
+            self.logger.info(f"Obtaining game {id_to_team[teams_ids.loc[1]['TEAM_ID']]} @ {id_to_team[teams_ids.loc[0]['TEAM_ID']]}")
+
+            home, away = teams_ids.iloc[0], teams_ids.iloc[1]
+            player_rows = self.gather(players, player_values, home[starters].tolist(), away[starters].tolist())
+            team_rows = self.gather(teams, team_values, [home["TEAM_ID"]], [away["TEAM_ID"]])
+            if player_rows is None or team_rows is None:
+                continue
+
+            # Home and away scores
+            scores = [home["SCORE"], away["SCORE"]]
+
+            rows.append([date, game_id] + team_rows[0].tolist() + [home["SCORE"]] + player_rows[:5].ravel().tolist()
+                        + team_rows[1].tolist() + [away["SCORE"]] + player_rows[5:].ravel().tolist() + scores)
+
+        print()
+        return rows
+
+    def columns(self) -> list:
         """
-        Helper class that generates dates from start_date to end_date,
-        inclusive.
+        Column names of the season file: the existing header if there is one,
+        otherwise the columns built from [features.json].
         """
-        date_format = "%m/%d/%Y"  # Updated date format
-        start = datetime.strptime(start_date, date_format)
-        end = datetime.strptime(end_date, date_format)
+        existing = read_header(self.journal.rows_path) or read_header(self.destination)
+        if existing is not None:
+            return existing
+        return self.schema_columns()
 
-        current_date = start
-        date_list = []
-
-        while current_date <= end:
-            date_list.append(current_date.strftime(date_format))
-            current_date += timedelta(days=1)
+    def schema_columns(self) -> list:
+        """
+        Column names of a season file built from [features.json].
+        """
+        columns = ["DATE", "GAME_ID"]
+        for location in ['HOME', 'AWAY']:
+            columns += [f"{location}_{x}" for x in self.team_features] + ["SCORE"]
+            columns += [f"{location}_PLAYER_{i}_{x}" for i in range(1, 6) for x in self.player_features]
+        return columns + ["HOME_SCORE", "AWAY_SCORE"]
 
-        return date_list
+    def optional_columns(self) -> list:
+        """
+        Columns of the season file the source cannot supply, which are left
+        empty: in [local] mode, the statistics the box scores do not report
+        (see [RollingFeatures.unreported]).
+        """
+        if not self.local:
+            return []
+        unreported = self.rolling.unreported()
+        return [column for column in self.schema_columns() if any(column.endswith(f"_{x}") for x in unreported)]
 
     def generate(self, start_date:str, end_date:str, update:bool=False) -> None:
         """
-        Generates a dataframe from scratch.
+        Generates a dataframe from scratch. Every date is committed to the
+        season's journal as soon as it completes; run [compact] to merge the
+        journal into the season file.
         """
-        # Extract every date in the list
-        date_list = self._generate_dates(start_date, end_date)
-        lst = [] # stores new values generated
+        # Extract every game day in the list
+        date_list = self.schedule.game_days(start_date, end_date)
+        date_format = '%m/%d/%Y'
+        last_date, last_game = None, None
+
+        if self.local: # box scores from the start of the season feed every window
+            self.fill_game_log(seasons[self.season]['startDate'], end_date)
 
         # if we are updating, truncate list to the last saved game's date
         if update:
-            if self.df.empty:
-                self.logger.info("Cannot retrieve last saved game. Starting from scratch.")
+            committed = self.journal.last_commit()
+            if committed: # a committed date is complete
+                self.logger.info(f"Resuming after committed date {committed['date']}...\n")
+                last_committed = datetime.strptime(committed['date'], date_format)
+                date_list = [d for d in date_list if datetime.strptime(d, date_format) > last_committed]
             else:
-                last_date = self.df.iloc[-1]["DATE"]
-                last_game = self.df.iloc[-1]["GAME_ID"]
-                self.logger.info(f"Resuming on date {last_date}...\n")
-                idx = date_list.index(last_date)
-                date_list = date_list[idx:]
+                last_date, last_game = self.journal.last_position()
+                if last_date is None:
+                    self.logger.info("Cannot retrieve last saved game. Starting from scratch.")
+                else:
+                    self.logger.info(f"Resuming on date {last_date}...\n")
+                    resume = datetime.strptime(last_date, date_format)
+                    date_list = [d for d in date_list if datetime.strptime(d, date_format) >= resume]
+        optional = self.optional_columns()
         try:
             for date in date_list:
                 self.logger.info(f"[DATE: {date}]\n")
 
-                # Obtain the start and end dates for webscraping
-                date_format = '%m/%d/%Y'
-                date_object = datetime.strptime(date, date_format)
-                yesterday_obj = date_object - timedelta(days=1) # end date is yesterday
-                start_obj = date_object - timedelta(days=21) # can be tuned, currently set to three weeks
-                end_date = yesterday_obj.strftime(date_format)
-                start_date = start_obj.strftime(date_format)
-
                 # obtain the games
-                games = self.time_scraper.forward(gamedate=date)
+                games = self.schedule.games_on(date)
 
                 # if we are updating, we will resume
-                if update and not self.df.empty and date == last_date:
+                if date == last_date:
                     idx = games.index(last_game)
                     games = games[idx+1:]
                     game_str = ", ".join(games)
                     self.logger.info(f"Updated values: {game_str}")
                 print()
 
-                if not games: continue
-                self.logger.info("[RETRIEVING GAMES...]\n")
-
-                # Obtain all 6 webscraping dataframes: player and team from [start] to [end_date]
-                team_away = self.team_scraper.forward(DateFrom=start_date, DateTo=end_date, Location='Road', features=self.team_features, Season=self.season)
-                player_away = self.player_scraper.forward(DateFrom=start_date, DateTo=end_date, Location='Road', features=self.player_features, Season=self.season)
-                team_home = self.team_scraper.forward(DateFrom=start_date, DateTo=end_date, Location='Home', features=self.team_features, Season=self.season)
-                player_home = self.player_scraper.forward(DateFrom=start_date, DateTo=end_date, Location='Home', features=self.player_features, Season=self.season)
-                
-                # Obtain 3 player reserves: away/home counterparts since the beginning of the season, and locationless since the beginning
-                player_away_full = self.player_scraper.forward(DateFrom='', DateTo=end_date, Location='Road', features=self.player_features, Season=self.season)
-                player_home_full = self.player_scraper.forward(DateFrom='', DateTo=end_date, Location='Home', features=self.player_features, Season=self.season)
-                player_general = self.player_scraper.forward(DateFrom='', DateTo=end_date, Location='', features=self.player_features, Season=self.season)
-
-                # Obtain 3 team reserves similarly above
-                team_away_full = self.team_scraper.forward(DateFrom='', DateTo=end_date, Location='Road', features=self.team_features, Season=self.season)
-                team_home_full = self.team_scraper.forward(DateFrom='', DateTo=end_date, Location='Home', features=self.team_features, Season=self.season)
-                team_general = self.team_scraper.forward(DateFrom='', DateTo=end_date, Location='', features=self.team_features, Season=self.season)
-                print()
-                
-                self.logger.info("[EXTRACTING GAMES...]\n")
-                for game_id in games:
-
-                    # checkpoint 1: some games were postponed/cancelled.
-                    try:
-                        teams_ids = self.game_scraper.forward(GameID=game_id, t=0.5)
-                    except TypeError:
-                        self.logger.fail(f"Failed to obtain game {game_id} attributes. Known reasons include postponement.")
-                        continue
-                        
-                    # checkpoint 2: some special games with teams outside the 30 are skipped.
-                    if teams_ids.loc[1]['TEAM_ID'] not in id_to_team or teams_ids.loc[1]['TEAM_ID'] not in id_to_team:
-                        self.logger.warn("Skipping game - invalid team found.")
-                        continue
-
-                    self.logger.info(f"Obtaining game {id_to_team[teams_ids.loc[1]['TEAM_ID']]} @ {id_to_team[teams_ids.loc[0]['TEAM_ID']]}")
-
-                    # Home team and players
-                    home_player_rows = self.get_player_values(teams_ids.iloc[0], player_home, player_home_full, player_general,
-                                                                         columns_list=self.home_player_cols, location='home')
-                    home_team_rows = self.get_team_values(teams_ids.iloc[0], team_home, team_home_full, team_general,
-                                                          columns_list=self.home_team_cols, location='home')
-
-                    # Away team and players
-                    away_player_rows = self.get_player_values(teams_ids.iloc[1], player_away, player_away_full, player_general,
-                                                                         columns_list=self.away_player_cols, location='away')
-                    away_team_rows = self.get_team_values(teams_ids.iloc[1], team_away, team_away_full, team_general,
-                                                          columns_list=self.away_team_cols, location='away')
-
-                    # Home and away scores
-                    scores = [teams_ids.iloc[0]["SCORE"], teams_ids.iloc[1]["SCORE"]]
-    
-                    if home_player_rows and home_team_rows and away_player_rows and away_team_rows:                   
-                        lst.append([date, game_id] + home_team_rows + home_player_rows + away_team_rows + away_player_rows + scores)
-
-                print()
+                rows = self.scrape_date(date, games) if games else []
+                report = validate(rows, self.columns(), self.schema_columns(), optional)
+                if not report:
+                    report.log(self.logger)
+                self.journal.commit(date, report.keep(rows), self.columns())
 
         except (Exception, KeyboardInterrupt) as e:
             print("j", e)
@@ -465,15 +580,16 @@ class SeasonScraper():
             print("\nInterrupt occurred")
         
         finally:
-            if self.df.empty:
-                columns = ["DATE", "GAME_ID"] + self.home_team_cols + self.home_player_cols + self.away_team_cols + self.away_player_cols + ["HOME_SCORE", "AWAY_SCORE"]
-            else:
-                columns = self.df.columns
-
-            df = pd.DataFrame(lst, columns=columns)
+            if self.journal.last_commit():
+                self.logger.info(f"Journal is at {self.journal.last_date()}. Run compact to merge it into {self.season}.csv.")
+            self.session.report()
+            flight.report()
 
-            self.df = pd.concat([self.df, df], axis=0)
-            self.df.to_csv(self.destination, index=False)
+    def compact(self) -> None:
+        """
+        Merges the journal into the season file.
+        """
+        self.journal.compact()
         
 
 if __name__ == '__main__':
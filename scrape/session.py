@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+import sys, os
+parent_directory = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(parent_directory)
+
+import time
+import threading
+from urllib.parse import urlparse
+import requests
+from requests.adapters import HTTPAdapter
+from misc.logger import Logger
+
+try:
+    import brotli # enables 'br' content decoding in urllib3
+    ENCODINGS = 'gzip, deflate, br'
+except ImportError:
+    ENCODINGS = 'gzip, deflate'
+
+class CountingAdapter(HTTPAdapter):
+    """
+    [HTTPAdapter] counting the connections its pools open, in [opened]. The
+    count is taken in the pools requests actually sends through, whatever
+    keys (e.g. TLS settings) they are stored under.
+    """
+    def __init__(self, *args, **kwargs):
+        self.opened = 0
+        self.count_lock = threading.Lock()
+        super().__init__(*args, **kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        adapter = self
+
+        def counting(pool_class):
+            class CountingPool(pool_class):
+                def _new_conn(self):
+                    with adapter.count_lock:
+                        adapter.opened += 1
+                    return super()._new_conn()
+            return CountingPool
+
+        self.poolmanager.pool_classes_by_scheme = {scheme: counting(pool_class) for scheme, pool_class
+                                                   in self.poolmanager.pool_classes_by_scheme.items()}
+
+class PooledSession:
+    """
+    Keep-alive HTTP session shared by every scraper, so each host costs one
+    TCP+TLS handshake per pooled connection instead of one per request.
+
+    [pool_connections] is the number of hosts with a cached pool,
+    [pool_maxsize] the number of connections kept open per host, and
+    [per_host] the number of requests allowed in flight per host.
+    """
+    def __init__(self, pool_connections:int=4, pool_maxsize:int=16, per_host:int=8):
+        self.adapter = CountingAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, pool_block=True)
+        self.session = requests.Session()
+        self.session.mount('https://', self.adapter)
+        self.session.mount('http://', self.adapter)
+        self.session.headers.update({'Accept-Encoding': ENCODINGS, 'Connection': 'keep-alive'})
+
+        self.per_host = per_host
+        self.host_slots = {}
+        self.lock = threading.Lock()
+        self.logger = Logger("Session", indent=1)
+
+        # handshake accounting
+        self.requests = 0
+        self.opened = 0
+        self.fresh = 0 # requests that opened a connection
+        self.fresh_time = 0.0 # total latency of requests that opened a connection
+        self.reused_time = 0.0 # total latency of requests on a pooled connection
+
+    def _slot(self, host:str) -> threading.BoundedSemaphore:
+        with self.lock:
+            if host not in self.host_slots:
+                self.host_slots[host] = threading.BoundedSemaphore(self.per_host)
+            return self.host_slots[host]
+
+    def get(self, url:str, **kwargs) -> requests.Response:
+        """
+        Same as [requests.get], over the pooled connections.
+        """
+        with self._slot(urlparse(url).netloc):
+            before = self.adapter.opened
+            start = time.perf_counter()
+            response = self.session.get(url, **kwargs)
+            elapsed = time.perf_counter() - start
+            opened = self.adapter.opened - before
+
+        with self.lock:
+            self.requests += 1
+            if opened > 0:
+                self.opened += opened
+                self.fresh += 1
+                self.fresh_time += elapsed
+            else:
+                self.reused_time += elapsed
+        return response
+
+    def stats(self) -> dict:
+        """
+        Returns connection reuse statistics. The handshake time saved is
+        estimated as the extra latency of requests that opened a connection,
+        times the number of requests that did not. Under concurrency a request
+        may be credited with a connection opened by another, so treat it as an
+        estimate.
+        """
+        with self.lock:
+            reused = self.requests - self.fresh
+            fresh_mean = self.fresh_time / self.fresh if self.fresh else 0.0
+            reused_mean = self.reused_time / reused if reused else 0.0
+            return {
+                'requests': self.requests,
+                'connections_opened': self.opened,
+                'connections_reused': reused,
+                'fresh_latency': fresh_mean,
+                'reused_latency': reused_mean,
+                'handshake_saved': max(0.0, fresh_mean - reused_mean) * reused,
+            }
+
+    def report(self) -> None:
+        stats = self.stats()
+        if stats['requests']:
+            self.logger.info(f"Requests: {stats['requests']}, connections opened: {stats['connections_opened']}, "
+                             f"handshake time saved: ~{stats['handshake_saved']:.1f}s")
+
+default_session = PooledSession()
+
+def get_session() -> PooledSession:
+    return default_session
+
+def configure_session(pool_connections:int=4, pool_maxsize:int=16, per_host:int=8) -> PooledSession:
+    """
+    Replaces the shared session with one using the given pool sizes.
+    """
+    global default_session
+    default_session = PooledSession(pool_connections, pool_maxsize, per_host)
+    return default_session
@@ -4,10 +4,15 @@ parent_directory = os.path.abspath(os.path.join(os.path.dirname(__file__), '..')
 sys.path.append(parent_directory)
 
 from parameters.info import team_to_id, id_to_team
-import requests
+from scrape.fetch import fetch
+from scrape.session import PooledSession
+from scrape.decode import ColumnarTable
+from data.schema import scrape_dtypes
 import json
 import pandas as pd
 from misc.logger import Logger
+from misc.lru import LRUCache
+from scrape.flight import SingleFlight
 from datetime import datetime, timedelta
 
 from typing import List, Tuple
@@ -19,8 +24,12 @@ class StatsScraper:
     """
     Given a specific date, return the list of all game IDs
     """
-    def __init__(self, verbose:bool=False):
+    def __init__(self, verbose:bool=False, session:PooledSession=None, memo_bytes:int=256 * 2**20):
 
+        self.session = session
+        # memoized (player table, team table) per request, at most [memo_bytes] in total
+        self.memo = LRUCache(memo_bytes, sizeof=lambda tables: sum(table.nbytes for table in tables))
+        self.flight = SingleFlight("StatsScraper")
         self.url = 'https://stats.nba.com/stats/teamplayerdashboard'
 
         self.payload = {
@@ -49,6 +58,8 @@ class StatsScraper:
             data = json.load(file)
             self.player_features = data['player_features']
             self.team_features = data['team_features']
+        self.player_dtypes = scrape_dtypes(self.player_features)
+        self.team_dtypes = scrape_dtypes(self.team_features)
         
         self.log = Logger("TimeScraper", enabled=verbose, indent=1)
     
@@ -62,6 +73,37 @@ class StatsScraper:
             season = f"{year - 1}-{str(year)[2:]}"
         return season
     
+    def _load(self, key:tuple) -> tuple:
+        """
+        Requests and decodes the (player table, team table) of memo [key], or
+        returns None if the request failed.
+        """
+        cached = self.memo.get(key)
+        if cached is not None: # loaded by a call that just finished
+            return cached
+
+        team_id, location, date_start, date, season = key
+        # Payload for this request only; [self.payload] is shared between threads
+        payload = {**self.payload, 'TeamID': team_id, 'Location': location, 'DateTo': date,
+                   'DateFrom': date_start, 'Season': season}
+
+        # Obtain JSON data
+        response = fetch(self.url, params=payload, headers=self.headers, session=self.session)
+        if response.status_code != 200:
+            print(f"Error: {response.status_code}")
+            print(response.text)
+            return None
+
+        json_data = response.json()
+
+        # Decode only the feature columns of the player and team tables
+        player_table = ColumnarTable.decode(json_data['resultSets'][1], self.player_features, 'PLAYER_ID', self.player_dtypes)
+        team_table = ColumnarTable.decode(json_data['resultSets'][0], self.team_features, 'TEAM_ID', self.team_dtypes)
+
+        cached = (player_table, team_table)
+        self.memo.put(key, cached)
+        return cached
+
     def get_stats(self, team_id:int, location:str='', date:str='', player_ids:List[int]=None, recent=True) -> Tuple[pd.DataFrame]:
         """
         Retrieves statistics for a specific team given location, date, and
@@ -70,6 +112,8 @@ class StatsScraper:
         Location must be 'Home', or 'Road'.
 
         Returns two dataframes: first the player df, then the overall team df.
+        Responses are memoized in [self.memo], so repeated lookups of the same
+        team, location and window cost no request.
         """
 
         if location != 'Road' and location != 'Home' and location != '':
@@ -82,45 +126,26 @@ class StatsScraper:
         else:
             team_id = team_to_id[team_id]
 
-        # Set payload parameters
-        self.payload['TeamID'] = team_id
-        self.payload['Location'] = location
-        self.payload['DateTo'] = date
-        if recent:
-            date_start = (datetime.strptime(date, "%m/%d/%y") - timedelta(weeks=3)).strftime("%m/%d/%y")
-            self.payload['DateFrom'] = date_start
-        self.payload['Season'] = self._generate_season(date)
-
-        # Obtain JSON data
-        response = requests.get(self.url, headers=self.headers, params=self.payload)
-        if response.status_code == 200:
-            json_data = response.json()
-
-            # Obtain player data and convert to pandas dataframe
-            player_data = json_data['resultSets'][1]['rowSet']
-            player_df = pd.DataFrame(player_data, columns=json_data['resultSets'][1]['headers'])
-            player_df = player_df[self.player_features]
-            player_df = player_df.reset_index(drop=True)
+        date_start = (datetime.strptime(date, "%m/%d/%y") - timedelta(weeks=3)).strftime("%m/%d/%y") if recent else ''
+        season = self._generate_season(date)
 
-            # filter players if requested
-            if player_ids != None:
-                player_df = player_df[player_df['PLAYER_ID'].isin(player_ids)]
-                player_df['PLAYER_ID'] = pd.Categorical(player_df['PLAYER_ID'], categories=player_ids, ordered=True)
-                player_df = player_df.sort_values('PLAYER_ID')
+        # Rosters are memoized per team, location and window; the requested
+        # players are picked out afterwards so one roster serves every subset.
+        key = (team_id, location, date_start, date, season)
+        cached = self.memo.get(key)
+        if cached is None: # concurrent lookups of the same roster share one decode
+            cached = self.flight.do(key, lambda: self._load(key))
+            if cached is None:
+                return []
 
+        player_table, team_table = cached
 
-            # Obtain team data and convert to pandas dataframe
-            team_data = json_data['resultSets'][0]['rowSet']
-            team_df = pd.DataFrame(team_data, columns=json_data['resultSets'][0]['headers'])
-            team_df = team_df[self.team_features]
-            team_df = team_df.reset_index(drop=True)
+        # filter players if requested, in the order of [player_ids]
+        if player_ids != None:
+            positions = player_table.positions(player_ids)
+            player_table = player_table.take(positions[positions >= 0])
 
-            return player_df, team_df
-
-        else:
-            print(f"Error: {response.status_code}")
-            print(response.text)
-            return []
+        return player_table.to_frame().reset_index(drop=True), team_table.to_frame().reset_index(drop=True)
 
 
 class PlayerScraper:
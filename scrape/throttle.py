@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+import sys, os
+parent_directory = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(parent_directory)
+
+import time
+import random
+import threading
+import requests
+from misc.logger import Logger
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+RETRY_EXCEPTIONS = (requests.Timeout, requests.ConnectionError)
+
+class RateLimiter:
+    """
+    Process-wide token bucket shared by every scraper. Requests may burst up to
+    [burst] tokens, refilled at [rate] tokens per second.
+
+    The rate adapts to the upstream: it is halved on every 429 and creeps back
+    up by [increase] per successful request, up to [max_rate]. Throttled
+    responses, 5xx responses and timeouts are retried with exponential backoff
+    and jitter. After [failure_threshold] consecutive failures the circuit
+    opens and every request waits [cooldown] seconds before trying again.
+    """
+    def __init__(self, rate:float=2.0, burst:int=5, min_rate:float=0.1, max_rate:float=4.0, increase:float=0.05,
+                 retries:int=5, base_delay:float=1.0, max_delay:float=60.0, failure_threshold:int=8, cooldown:float=120.0):
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.retries = retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.failures = 0 # consecutive
+        self.open_until = 0.0
+        self.lock = threading.Lock()
+        self.logger = Logger("RateLimiter", indent=1)
+
+    def acquire(self) -> None:
+        """
+        Blocks until the circuit is closed and a token is available, then takes
+        it.
+        """
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                if now < self.open_until:
+                    wait = self.open_until - now
+                else:
+                    self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                    self.updated = now
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return
+                    wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def success(self) -> None:
+        with self.lock:
+            self.failures = 0
+            self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def failure(self, throttled:bool=False) -> None:
+        """
+        Records a failed request. [throttled] failures (429) also halve the
+        rate.
+        """
+        with self.lock:
+            if throttled:
+                self.rate = max(self.min_rate, self.rate / 2)
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                self.open_until = time.monotonic() + self.cooldown
+                self.failures = 0
+                self.logger.warn(f"Upstream degraded. Pausing all requests for {self.cooldown:.0f}s.")
+
+    def backoff(self, attempt:int, retry_after:str=None) -> float:
+        """
+        Seconds to wait before retry [attempt]: the server's Retry-After if
+        given, otherwise exponential with full jitter.
+        """
+        if retry_after:
+            try:
+                return min(self.max_delay, float(retry_after))
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def call(self, request):
+        """
+        Calls [request] (a function returning a [requests.Response]) under the
+        rate limit, retrying throttled, 5xx and timed out requests. Returns the
+        last response, or raises the last exception if every attempt raised.
+        """
+        for attempt in range(self.retries + 1):
+            self.acquire()
+            response, error = None, None
+            try:
+                response = request()
+            except RETRY_EXCEPTIONS as e:
+                error = e
+
+            if error is None and response.status_code not in RETRY_STATUSES:
+                self.success()
+                return response
+
+            self.failure(throttled=response is not None and response.status_code == 429)
+            if attempt == self.retries:
+                break
+            reason = type(error).__name__ if error else f"HTTP {response.status_code}"
+            delay = self.backoff(attempt, response.headers.get('Retry-After') if response is not None else None)
+            self.logger.warn(f"{reason}. Retrying in {delay:.1f}s ({attempt + 1}/{self.retries})")
+            time.sleep(delay)
+
+        if error is not None:
+            raise error
+        return response
+
+limiter = RateLimiter()
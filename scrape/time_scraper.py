@@ -6,7 +6,8 @@ sys.path.append(parent_directory)
 from collections import defaultdict
 from typing import List
 from parameters.info import id_to_team, team_to_id
-import requests
+from scrape.fetch import fetch
+from scrape.session import PooledSession
 from misc.logger import Logger
 
 class TimeScraper:
@@ -15,8 +16,9 @@ class TimeScraper:
     that day.
     """
 
-    def __init__(self, verbose:bool=False):
+    def __init__(self, verbose:bool=False, session:PooledSession=None):
 
+        self.session = session
         self.url = "https://core-api.nba.com/cp/api/v1.3/feeds/gamecardfeed"
 
         self.payload = {
@@ -33,26 +35,28 @@ class TimeScraper:
 
         self.log = Logger("TimeScraper", enabled=verbose, indent=1)
 
-    def game_ids(self, date:str) -> List[int]:
+    def games(self, date:str) -> List[tuple]:
         """
-        Given a date in [MM/DD/YYYY] format, returns the list of game IDs
-        (via NBA.com) that occured that day.
+        Given a date in [MM/DD/YYYY] format, returns a (game ID, home team ID,
+        road team ID) tuple for every game that day, sorted by game ID. Team
+        IDs are None if the feed does not list them. Returns None if the
+        request failed.
         """
 
-        self.payload['gamedate'] = date
-        response = requests.get(self.url, params=self.payload, headers=self.headers)
+        payload = {**self.payload, 'gamedate': date}
+        response = fetch(self.url, params=payload, headers=self.headers, session=self.session)
 
         if response.status_code == 200:
 
             json_data = response.json()
-            game_ids = []
+            games = []
             if json_data['modules']:
                 for game in json_data['modules'][0]['cards']:
-                    game_ids.append(game['cardData']['gameId'])
-                self.log.info(f"Retrieved {len(game_ids)} games played.")
-                game_ids.sort(key=lambda x : int(x)) # sort game_ids in increasing order
-                self.log.info(game_ids)
-                return game_ids
+                    card = game['cardData']
+                    games.append((card['gameId'], card.get('homeTeam', {}).get('teamId'), card.get('awayTeam', {}).get('teamId')))
+                self.log.info(f"Retrieved {len(games)} games played.")
+                games.sort(key=lambda x : int(x[0])) # sort game_ids in increasing order
+                return games
             else: # no games played on this day
                 self.log.warn(f"No games found.")
                 return []
@@ -60,7 +64,18 @@ class TimeScraper:
         else:
             print(f"Error: {response.status_code}")
             print(response.text)
-            return []
+            return None
+
+    def game_ids(self, date:str) -> List[int]:
+        """
+        Given a date in [MM/DD/YYYY] format, returns the list of game IDs
+        (via NBA.com) that occured that day.
+        """
+        games = self.games(date) or []
+        game_ids = [game[0] for game in games]
+        if game_ids:
+            self.log.info(game_ids)
+        return game_ids
 
 
 if __name__ == '__main__':
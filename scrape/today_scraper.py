@@ -4,11 +4,13 @@ parent_directory = os.path.abspath(os.path.join(os.path.dirname(__file__), '..')
 sys.path.append(parent_directory)
 
 from data.lib import dataframe_to_csv
+from data.validate import validate
 from collections import defaultdict
 from typing import List
 from scrape.stats_scraper import StatsScraper
 from parameters.info import id_to_team, team_to_id
-import requests
+from scrape.fetch import fetch
+from scrape.session import PooledSession
 from misc.logger import Logger
 from datetime import datetime
 import pandas as pd
@@ -20,9 +22,9 @@ class TodaysGameScraper:
     that day.
     """
 
-    def __init__(self, verbose:bool=False):
+    def __init__(self, verbose:bool=False, session:PooledSession=None):
 
-        self.url = ""
+        self.session = session
 
         self.headers = {
             'Origin': 'https://www.nba.com/',
@@ -30,13 +32,13 @@ class TodaysGameScraper:
             'user-agent': 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
         }
 
-        self.stats_scraper = self.stats_scraper = StatsScraper(verbose=verbose)
+        self.stats_scraper = self.stats_scraper = StatsScraper(verbose=verbose, session=session)
 
         self.log = Logger("TodaysGames", enabled=verbose, indent=1)
 
-    def obtain(self, date:str=None) -> list:
+    def obtain(self, date:str=None, dest:str='daily.csv') -> list:
         """
-        Obtains today's game.
+        Obtains today's game, saved to [dest] in the data folder.
         """
         d = date
         if not date:
@@ -45,9 +47,8 @@ class TodaysGameScraper:
         else:
             date = datetime.strptime(date, "%m/%d/%y").strftime("%Y%m%d")
         
-        # Update url
-        self.url = f"https://stats.nba.com/js/data/leaders/00_daily_lineups_{date}.json"
-        response = requests.get(self.url, headers=self.headers)
+        url = f"https://stats.nba.com/js/data/leaders/00_daily_lineups_{date}.json"
+        response = fetch(url, headers=self.headers, session=self.session)
 
         if response.status_code == 200:
             json_data = response.json()
@@ -99,24 +100,18 @@ class TodaysGameScraper:
                     self.log.fail("Insufficient data. Maybe a player is out?")
                     continue
                 
-                home_players = home_players.stack().to_frame().T
-                road_players = road_players.stack().to_frame().T
 
-                row_data = pd.concat([home_team, home_players, road_team, road_players], axis=1)
-                data = row_data.iloc[0].tolist()
+                # one long row: each team's stats followed by its players' stats, player by player
+                data = home_team.iloc[0].tolist() + home_players.to_numpy(dtype=object).ravel().tolist() \
+                       + road_team.iloc[0].tolist() + road_players.to_numpy(dtype=object).ravel().tolist()
                 data = [str(game['gameId']), d] + data
-                if features:
-                    if not (len(features[-1]) == len(data)):
-                        self.log.fail("Insufficient data... requires inspection.")
-                        continue
-                else:
-                    print(self.log.info(f"Features found: {str(len(data)).strip()}"))
-                
-                features.append(data)            
-                pass
+                features.append(data)
             
-            df = pd.DataFrame(features, columns=feature_cols)
-            dataframe_to_csv(df, dest='daily.csv')           
+            report = validate(features, feature_cols)
+            if not report:
+                report.log(self.log)
+            df = pd.DataFrame(report.keep(features), columns=feature_cols)
+            dataframe_to_csv(df, dest=dest)           
             
         
         else:
@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+import sys, os
+parent_directory = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(parent_directory)
+
+import time
+import pytest
+from datetime import datetime, timedelta
+from scrape.cache import ResponseCache, CachedResponse, CacheMiss
+
+URL = "https://stats.nba.com/stats/leaguedashteamstats"
+
+def day(days_ago:int) -> str:
+    return (datetime.today() - timedelta(days=days_ago)).strftime("%m/%d/%Y")
+
+def later(monkeypatch, seconds:float) -> None:
+    now = time.time() + seconds
+    monkeypatch.setattr(time, 'time', lambda: now)
+
+def test_todays_entries_expire(tmp_path, monkeypatch):
+    cache = ResponseCache(str(tmp_path), ttl=60)
+    params = {'DateTo': day(0)}
+    cache.put(URL, params, CachedResponse(200, b'{"today": 1}', URL))
+    assert not cache.is_permanent(URL, params)
+    assert cache.get(URL, params).json() == {'today': 1}
+
+    later(monkeypatch, 61)
+    assert cache.get(URL, params) is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+def test_past_entries_are_permanent(tmp_path, monkeypatch):
+    cache = ResponseCache(str(tmp_path), ttl=60)
+    params = {'DateTo': day(1)}
+    cache.put(URL, params, CachedResponse(200, b'{"past": 1}', URL))
+    assert cache.is_permanent(URL, params)
+
+    later(monkeypatch, 365 * 24 * 3600)
+    response = cache.get(URL, params)
+    assert response.from_cache and response.json() == {'past': 1}
+
+def test_payload_order_does_not_matter(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    cache.put(URL, {'DateTo': day(1), 'Season': '2023-24'}, CachedResponse(200, b'{}', URL))
+    assert cache.get(URL, {'Season': '2023-24', 'DateTo': day(1)}) is not None
+
+def test_offline_miss(tmp_path, monkeypatch):
+    pytest.importorskip('requests')
+    from scrape import fetch
+
+    monkeypatch.setattr(fetch, 'cache', ResponseCache(str(tmp_path)))
+    fetch.configure(offline=True, cache_enabled=True, archive_enabled=False)
+    try:
+        fetch.cache.put(URL, {'DateTo': day(1)}, CachedResponse(200, b'{"cached": 1}', URL))
+        assert fetch.fetch(URL, {'DateTo': day(1)}).json() == {'cached': 1}
+        with pytest.raises(CacheMiss):
+            fetch.fetch(URL, {'DateTo': day(2)})
+    finally:
+        fetch.configure(offline=False, archive_enabled=True)
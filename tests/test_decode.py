@@ -0,0 +1,38 @@
+#!/usr/bin/env python
+import sys, os
+parent_directory = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(parent_directory)
+
+import pytest
+np = pytest.importorskip('numpy')
+pytest.importorskip('pandas')
+
+from scrape.decode import ColumnarTable
+
+RESULT_SET = {
+    'headers': ['PLAYER_ID', 'PLAYER_NAME', 'GP', 'W_PCT', 'PTS'],
+    'rowSet': [
+        [201939, 'Stephen Curry', 10, 1, 30.5],
+        [2544, 'LeBron James', 9, 0.5, None],
+        [203507, 'Giannis Antetokounmpo', 11, 0.727, 31],
+    ],
+}
+
+def test_mixed_int_float_column_keeps_fractions():
+    table = ColumnarTable.decode(RESULT_SET, ['PLAYER_ID', 'W_PCT', 'PTS'], 'PLAYER_ID')
+    assert table.columns['W_PCT'].dtype == np.float64
+    assert table.columns['W_PCT'].tolist() == [1.0, 0.5, 0.727]
+    assert table.columns['PTS'].dtype == np.float64
+    assert table.columns['PTS'][0] == 30.5 and np.isnan(table.columns['PTS'][1])
+
+def test_int_and_string_columns():
+    table = ColumnarTable.decode(RESULT_SET, ['PLAYER_ID', 'PLAYER_NAME', 'GP'], 'PLAYER_ID')
+    assert table.columns['GP'].dtype == np.int64
+    assert table.columns['PLAYER_NAME'].dtype == object
+    assert table.ids.tolist() == [201939, 2544, 203507]
+
+def test_declared_integer_columns_are_cast():
+    table = ColumnarTable.decode(RESULT_SET, ['PLAYER_ID', 'W_PCT'], 'PLAYER_ID',
+                                 dtypes={'PLAYER_ID': np.int32, 'W_PCT': None})
+    assert table.ids.dtype == np.int32
+    assert table.columns['W_PCT'].tolist() == [1.0, 0.5, 0.727]
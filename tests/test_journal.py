@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+import sys, os
+parent_directory = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(parent_directory)
+
+import csv
+import pytest
+pytest.importorskip('colorama')
+
+from scrape.journal import Journal
+
+COLUMNS = ['DATE', 'GAME_ID', 'HOME_PTS']
+
+def read_rows(path:str) -> list:
+    with open(path, 'r', newline='') as file:
+        return list(csv.reader(file))
+
+def test_commit_and_compact(tmp_path):
+    journal = Journal('2023-24.csv', directory=str(tmp_path), verbose=False)
+    journal.commit('11/14/2023', [['2023-11-14', '0022300001', 110]], COLUMNS)
+    journal.commit('11/15/2023', [], COLUMNS)
+    journal.commit('11/16/2023', [['2023-11-16', '0022300002', 98]], COLUMNS)
+    assert journal.last_commit()['date'] == '11/16/2023'
+    assert journal.last_position() == ('11/16/2023', '0022300002')
+
+    reopened = Journal('2023-24.csv', directory=str(tmp_path), verbose=False)
+    assert reopened.commits == journal.commits
+    assert reopened.compact() == 2
+    assert read_rows(str(tmp_path / '2023-24.csv')) == [COLUMNS, ['2023-11-14', '0022300001', '110'],
+                                                        ['2023-11-16', '0022300002', '98']]
+    assert not os.path.exists(reopened.rows_path)
+    assert reopened.last_commit() is None
+    assert reopened.last_position() == ('2023-11-16', '0022300002') # from the compacted file
+
+def test_recover_torn_write(tmp_path):
+    journal = Journal('2023-24.csv', directory=str(tmp_path), verbose=False)
+    journal.commit('11/14/2023', [['2023-11-14', '0022300001', 110]], COLUMNS)
+    committed = os.path.getsize(journal.rows_path)
+    with open(journal.rows_path, 'a') as file: # crash halfway through the next date
+        file.write('2023-11-15,00223')
+    with open(journal.log_path, 'a') as file:
+        file.write('{"date": "11/15')
+
+    recovered = Journal('2023-24.csv', directory=str(tmp_path), verbose=False)
+    assert os.path.getsize(recovered.rows_path) == committed
+    assert recovered.last_commit()['date'] == '11/14/2023'
+    assert read_rows(recovered.rows_path) == [COLUMNS, ['2023-11-14', '0022300001', '110']]
+
+def test_recover_interrupted_compaction(tmp_path):
+    target = tmp_path / '2023-24.csv'
+    target.write_text('DATE,GAME_ID,HOME_PTS\n2023-11-13,0022300000,101\n')
+    journal = Journal('2023-24.csv', directory=str(tmp_path), verbose=False)
+    journal.commit('11/14/2023', [['2023-11-14', '0022300001', 110]], COLUMNS)
+    with open(journal.marker_path, 'w') as file: # crash after part of the rows were appended
+        file.write(str(os.path.getsize(target)))
+    with open(target, 'a') as file:
+        file.write('2023-11-14,002230')
+
+    recovered = Journal('2023-24.csv', directory=str(tmp_path), verbose=False)
+    assert not os.path.exists(recovered.marker_path)
+    assert recovered.compact() == 1
+    assert read_rows(str(target)) == [COLUMNS, ['2023-11-13', '0022300000', '101'], ['2023-11-14', '0022300001', '110']]
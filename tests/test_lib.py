@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+import sys, os
+parent_directory = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(parent_directory)
+
+import pytest
+np = pytest.importorskip('numpy')
+pd = pytest.importorskip('pandas')
+
+from data import lib
+
+@pytest.fixture
+def data_directory(tmp_path, monkeypatch):
+    monkeypatch.setattr(lib, 'data_directory', str(tmp_path))
+    return tmp_path
+
+def test_matrix_append_writes_only_new_rows(data_directory):
+    first = pd.DataFrame({'a': [1.0, 2.0], 'b': [3.0, 4.0]})
+    lib.write_matrix('m', first, pd.DataFrame({'GAME_ID': ['0022300061', '0022300062'], 'DATE': ['2023-11-01'] * 2}))
+    sidecar = (data_directory / 'm.json').stat().st_size
+
+    second = pd.DataFrame({'a': [5.0], 'b': [6.0]})
+    lib.write_matrix('m', second, pd.DataFrame({'GAME_ID': ['0022300063'], 'DATE': ['2023-11-02']}), append=True)
+    assert (data_directory / 'm.json').stat().st_size == sidecar # no per-row data in the sidecar
+
+    matrix, schema = lib.load_matrix('m')
+    assert schema['rows'] == 3
+    assert matrix.tolist() == [[1.0, 3.0], [2.0, 4.0], [5.0, 6.0]]
+    index = lib.matrix_index('m')
+    assert index['GAME_ID'].tolist() == ['0022300061', '0022300062', '0022300063']
+    assert index['DATE'].tolist() == ['2023-11-01', '2023-11-01', '2023-11-02']
+
+def test_matrix_ignores_interrupted_append(data_directory):
+    lib.write_matrix('m', pd.DataFrame({'a': [1.0]}), pd.DataFrame({'GAME_ID': ['1'], 'DATE': ['2023-11-01']}))
+    with open(data_directory / 'm.index.csv', 'a') as file:
+        file.write('2,2023-11') # a row the sidecar never recorded
+    lib.write_matrix('m', pd.DataFrame({'a': [2.0]}), pd.DataFrame({'GAME_ID': ['3'], 'DATE': ['2023-11-03']}), append=True)
+    assert lib.matrix_index('m')['GAME_ID'].tolist() == ['1', '3']
+
+def test_parquet_append_with_missing_value(tmp_path):
+    pytest.importorskip('pyarrow')
+    backend = lib.ParquetBackend()
+    path = str(tmp_path / 'aggregate.parquet')
+    backend.write(pd.DataFrame({'GAME_ID': ['0022300061'], 'HOME_SCORE': np.array([110], dtype=np.int16)}), path)
+    backend.append(pd.DataFrame({'GAME_ID': ['0022300062', '0022300063'], 'HOME_SCORE': [np.nan, 98.0]}), path)
+
+    df = backend.read(path)
+    assert df['GAME_ID'].tolist() == ['0022300061', '0022300062', '0022300063']
+    assert df['HOME_SCORE'].iloc[0] == 110 and pd.isna(df['HOME_SCORE'].iloc[1]) and df['HOME_SCORE'].iloc[2] == 98
@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+import sys, os
+parent_directory = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(parent_directory)
+
+import pytest
+pytest.importorskip('numpy')
+pytest.importorskip('torch')
+pytest.importorskip('sklearn')
+pytest.importorskip('matplotlib')
+pytest.importorskip('pandas')
+pytest.importorskip('requests')
+
+import torch
+from models.registry import ModelRegistry
+
+CONFIG = {'kind': 'standard', 'input_size': 4, 'hidden_sizes': [3], 'output_size': 1, 'seed': 0}
+
+def dataset(rows:int) -> tuple:
+    generator = torch.Generator().manual_seed(rows)
+    return torch.randn(rows, 4, generator=generator), torch.randn(rows, 1, generator=generator)
+
+class Trainer:
+    """
+    Stand-in for a training run, counting its calls.
+    """
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, model, *args):
+        self.calls.append(args)
+        return {'loss': 0.0}
+
+def test_hit_loads_instead_of_training(tmp_path):
+    registry = ModelRegistry(str(tmp_path), verbose=False)
+    train = Trainer()
+    first = registry.get_or_train(CONFIG, train, *dataset(16))
+    second = registry.get_or_train(CONFIG, train, *dataset(16))
+
+    assert len(train.calls) == 1
+    for name, tensor in first.state_dict().items():
+        assert torch.equal(tensor, second.state_dict()[name])
+
+def test_appended_rows_fine_tune(tmp_path):
+    registry = ModelRegistry(str(tmp_path), verbose=False)
+    train, fine_tune = Trainer(), Trainer()
+    xTr, yTr = dataset(24)
+    registry.get_or_train(CONFIG, train, xTr[:16], yTr[:16], fine_tune=fine_tune)
+    base = registry.key(CONFIG, xTr[:16], yTr[:16])
+
+    registry.get_or_train(CONFIG, train, xTr, yTr, fine_tune=fine_tune)
+    assert len(train.calls) == 1
+    _, lineage, rows = fine_tune.calls[0]
+    assert rows == 16 and lineage == {'full_rows': 16, 'fine_tunes': 0}
+
+    entries = registry.entries()
+    assert list(entries) == [registry.key(CONFIG, xTr, yTr)] # the base was superseded
+    entry = next(iter(entries.values()))
+    assert entry['base'] == base and entry['rows'] == 24
+    assert entry['lineage'] == {'full_rows': 16, 'fine_tunes': 1}
+
+def test_prunes_to_keep(tmp_path):
+    registry = ModelRegistry(str(tmp_path), verbose=False, keep=2)
+    train = Trainer()
+    for rows in [8, 12, 16, 20]:
+        registry.get_or_train(CONFIG, train, *dataset(rows))
+
+    assert len(train.calls) == 4
+    assert sorted(entry['rows'] for entry in registry.entries().values()) == [16, 20]
+    assert len([name for name in os.listdir(tmp_path) if name.endswith('.pt')]) == 2
@@ -0,0 +1,21 @@
+#!/usr/bin/env python
+import sys, os
+parent_directory = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(parent_directory)
+
+import pytest
+pd = pytest.importorskip('pandas')
+
+from data import schema
+
+def test_game_id_keeps_leading_zeros():
+    df = pd.DataFrame({'GAME_ID': ['0022300061', '0022300062'], 'HOME_TEAM_ID': [1610612737, 1610612738],
+                       'HOME_TEAM_NAME': ['Atlanta Hawks', 'Boston Celtics'], 'HOME_PTS': [110.5, 101.0]})
+    stored, names = schema.apply(df, categorical=False)
+    assert stored['GAME_ID'].tolist() == ['0022300061', '0022300062']
+    assert str(stored['HOME_TEAM_ID'].dtype) == 'int32'
+    assert names['NAME'].tolist() == ['Atlanta Hawks', 'Boston Celtics']
+
+    compact, _ = schema.apply(df)
+    assert str(compact['GAME_ID'].dtype) == 'category'
+    assert compact['GAME_ID'].astype(str).tolist() == ['0022300061', '0022300062']
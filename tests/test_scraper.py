@@ -0,0 +1,37 @@
+#!/usr/bin/env python
+import sys, os
+parent_directory = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(parent_directory)
+
+import pytest
+pytest.importorskip('numpy')
+pytest.importorskip('pandas')
+pytest.importorskip('requests')
+
+from bench.mock_server import League, MockServer
+from scrape.fetch import configure
+from scrape.session import PooledSession
+from scrape.scraper import SeasonScraper
+
+@pytest.fixture
+def server():
+    """
+    Mock server whose box scores, like the real ones, do not report blocks
+    received and fouls drawn.
+    """
+    league = League(unreported=('blocksReceived', 'foulsDrawn'))
+    with MockServer(league=league) as server:
+        configure(redirect=server.redirect(), cache_enabled=False, archive_enabled=False, offline=False,
+                  rate=1000.0, burst=100)
+        yield server
+    configure(redirect={}, cache_enabled=True, archive_enabled=True)
+
+def test_local_generate_commits_rows(server, tmp_path):
+    scraper = SeasonScraper('2023-24', verbose=False, local=True, session=PooledSession(), directory=str(tmp_path))
+    scraper.generate('11/14/2023', '11/16/2023')
+    assert scraper.journal.commits
+    assert sum(commit['rows'] for commit in scraper.journal.commits) > 0
+
+    optional = scraper.optional_columns()
+    assert 'HOME_BLKA' in optional and 'AWAY_PLAYER_5_PFD' in optional
+    assert 'HOME_PTS' not in optional and 'HOME_PLAYER_1_PF' not in optional
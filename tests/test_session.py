@@ -0,0 +1,22 @@
+#!/usr/bin/env python
+import sys, os
+parent_directory = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(parent_directory)
+
+import pytest
+pytest.importorskip('requests')
+
+from bench.mock_server import MockServer
+from scrape.session import PooledSession
+
+def test_requests_reuse_one_connection():
+    session = PooledSession()
+    with MockServer() as server:
+        for day in range(1, 6):
+            response = session.get(f"{server.url}/stats/leaguedashteamstats", params={'DateTo': f"11/0{day}/2023"})
+            assert response.status_code == 200
+
+    stats = session.stats()
+    assert stats['requests'] == 5
+    assert stats['connections_opened'] == 1
+    assert stats['connections_reused'] == 4
@@ -0,0 +1,43 @@
+#!/usr/bin/env python
+import sys, os
+parent_directory = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(parent_directory)
+
+import time
+import pytest
+pytest.importorskip('requests')
+
+from types import SimpleNamespace
+from scrape.throttle import RateLimiter
+
+def response(status:int, retry_after:str=None) -> SimpleNamespace:
+    return SimpleNamespace(status_code=status, headers={'Retry-After': retry_after} if retry_after else {})
+
+def test_burst_then_rate():
+    limiter = RateLimiter(rate=20.0, burst=3)
+    start = time.monotonic()
+    for _ in range(3):
+        limiter.acquire()
+    assert time.monotonic() - start < 0.05 # the burst is not throttled
+
+    for _ in range(4):
+        limiter.acquire()
+    assert time.monotonic() - start >= 4 / 20.0 * 0.9 # then one token every 1/[rate]s
+
+def test_retries_429_then_succeeds():
+    limiter = RateLimiter(rate=1000.0, burst=10, increase=0.0)
+    responses = [response(429, retry_after='0'), response(200)]
+    result = limiter.call(lambda: responses.pop(0))
+
+    assert result.status_code == 200
+    assert not responses
+    assert limiter.rate == 500.0 # halved by the 429
+    assert limiter.failures == 0 # reset by the success
+
+def test_gives_up_after_retries():
+    limiter = RateLimiter(rate=1000.0, burst=10, retries=2, base_delay=0.0)
+    calls = []
+    result = limiter.call(lambda: calls.append(1) or response(503))
+
+    assert result.status_code == 503
+    assert len(calls) == 3